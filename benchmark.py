@@ -0,0 +1,356 @@
+import argparse
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from nucleo import (Cuadrado, Triangulo, Circunferencia, Poligono, MotorRaster, RasterizadorParalelo, EscenaColumnar,
+                    IndiceEspacial, bresenham, bresenham_lote, line, punto_medio, circunferencia_punto_medio,
+                    spans_disco, celdas_de_spans, flood_fill_puntos, figura_a_dict, figura_desde_dict,
+                    transformar_figuras, fijar_tamano_celda)
+import nucleo
+
+try:
+    import v9
+except ImportError:
+    # Sin tkinter no se puede importar la aplicación y se omite la medición de FigurasCanvas
+    v9 = None
+
+# Pruebas de rendimiento de las rutas críticas del dibujo, sin Tk: los rasterizadores de líneas y
+# circunferencias, el relleno y la colisión de cada tipo de figura (el polígono, con cientos de
+# vértices), y el redibujado completo y la colisión de mil puntos con escenas de 1 a 10 000
+# figuras (en lote con EscenaColumnar y punto por punto con IndiceEspacial), además de los bytes
+# que ocupa cada figura. El redibujado se mide en MotorRaster y en FigurasCanvas con un canvas sin
+# pantalla (CanvasSinPantalla), que incluye armar los rectángulos etiquetados del modo Tk.
+# Todas las entradas salen de semillas fijas, así que dos corridas miden exactamente el mismo
+# trabajo. Los resultados se escriben en JSON y se pueden comparar con una corrida anterior:
+#
+#     python benchmark.py --salida base.json
+#     python benchmark.py --comparar base.json
+
+ANCHO, ALTO = 800, 600
+TAMANOS_ESCENA = (1, 10, 100, 1000, 10000)
+
+def escena_aleatoria(cantidad, semilla, ancho=ANCHO, alto=ALTO):
+    # """
+    # Escena reproducible con cuadrados, círculos y triángulos del tamaño que crea la aplicación,
+    # en posiciones, escalas, rotaciones y tipos de línea aleatorios.
+
+    # :param cantidad: Número de figuras.
+    # :param semilla: Semilla del generador.
+    # :return: Lista de figuras.
+    # """
+    rnd = random.Random(semilla)
+    colores = ["Blue", "Yellow", "Green", "red", "orange", "purple"]
+    figuras = []
+    for _ in range(cantidad):
+        x, y = rnd.randrange(0, ancho, 10), rnd.randrange(0, alto, 10)
+        tipo = rnd.choice(("cuadrado", "circulo", "triangulo"))
+        if tipo == "cuadrado":
+            figura = Cuadrado(x, y, x + 90, y, x + 90, y + 90, x, y + 90, color=rnd.choice(colores))
+        elif tipo == "circulo":
+            figura = Circunferencia(x, y, 45, rnd.choice(colores))
+        else:
+            figura = Triangulo(x - 50, y + 80, x, y - 10, x + 50, y + 80, rnd.choice(colores))
+        figura.escalar(rnd.choice((0.6, 1, 1, 1.4, 2.2)))
+        figura.rotar(rnd.choice((0, 0, 15, 45, 90)))
+        figura.tipo_linea = rnd.choice(("solid", "dashed"))
+        figuras.append(figura)
+    return figuras
+
+def poligono_estrella(x, y, radio, lados=360, color="Purple"):
+    # Polígono de muchos vértices con forma de estrella (radio alternado), no convexo.
+    angulos = np.arange(lados) * 2 * np.pi / lados
+    radios = np.where(np.arange(lados) % 2 == 0, radio, radio * 0.6)
+    return Poligono(np.column_stack((x + radios * np.cos(angulos), y + radios * np.sin(angulos))), color)
+
+def segmentos_aleatorios(cantidad, semilla, ancho=ANCHO, alto=ALTO):
+    # Segmentos (x1, y1, x2, y2) con extremos en la cuadrícula de 10 píxeles.
+    rnd = random.Random(semilla)
+    return [(rnd.randrange(0, ancho, 10), rnd.randrange(0, alto, 10),
+             rnd.randrange(0, ancho, 10), rnd.randrange(0, alto, 10)) for _ in range(cantidad)]
+
+def medir(funcion, repeticiones):
+    # Ejecuta la función las veces indicadas (más una de calentamiento) y devuelve los tiempos en segundos.
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return tiempos
+
+if v9 is not None:
+    class CanvasSinPantalla(v9.FigurasCanvas):
+        # """
+        # FigurasCanvas en modo Tk sin ventana: create_rectangle y delete guardan y borran los
+        # rectángulos en una lista en lugar de crearlos en Tk, así que redibujar mide todo el trabajo
+        # del lado de Python (limpiar, rasterizar, unir celdas en tramos y armar cada rectángulo con
+        # su etiqueta) pero no el de Tk.
+
+        # :param ancho: Ancho del canvas en píxeles.
+        # :param alto: Alto del canvas en píxeles.
+        # """
+        def __init__(self, ancho, alto):
+            self._iniciar_estado(MotorRaster(ancho, alto, con_framebuffer=False))
+            self.rectangulos = []
+
+        def create_rectangle(self, *coordenadas, **opciones):
+            self.rectangulos.append((coordenadas, opciones))
+            return len(self.rectangulos)
+
+        def delete(self, etiqueta):
+            if etiqueta == "all":
+                self.rectangulos.clear()
+            else:
+                self.rectangulos = [(coordenadas, opciones) for coordenadas, opciones in self.rectangulos
+                                    if opciones.get("tags") != etiqueta]
+
+        def after_idle(self, funcion):
+            pass
+
+def casos(semilla, tamanos, procesos=1):
+    # Genera los casos de prueba como tuplas (nombre, parámetros, función).
+    segmentos = segmentos_aleatorios(1000, semilla)
+    arreglo_segmentos = np.array(segmentos)
+    yield "bresenham", {"segmentos": len(segmentos)}, lambda: [bresenham(*s, line_style="dashed") for s in segmentos]
+    yield "bresenham_lote", {"segmentos": len(segmentos)}, lambda: bresenham_lote(arreglo_segmentos, "dashed")
+    yield "line", {"segmentos": len(segmentos)}, lambda: [line(*s, line_style="dashed") for s in segmentos]
+
+    for radio in (45, 450, 4500):
+        yield "punto_medio", {"radio": radio}, lambda radio=radio: punto_medio(400, 300, radio)
+        yield ("circunferencia_punto_medio", {"radio": radio},
+               lambda radio=radio: circunferencia_punto_medio(400, 300, radio))
+
+    # Relleno de cada tipo de figura, con el mismo algoritmo que usa rasterizar_figura
+    for escala in (1, 4, 16):
+        cuadrado = Cuadrado(300, 200, 390, 200, 390, 290, 300, 290, color="Blue")
+        triangulo = Triangulo(250, 380, 300, 290, 350, 380, "Green")
+        poligono = poligono_estrella(400, 300, 100)
+        for figura in (cuadrado, triangulo, poligono):
+            figura.escalar(escala)
+            figura.rotar(15)
+        radio = round(45 * escala / 10) * 10
+        yield ("relleno_cuadrado", {"escala": escala},
+               lambda figura=cuadrado: celdas_de_spans(*figura.spans_relleno()))
+        yield ("relleno_triangulo", {"escala": escala},
+               lambda figura=triangulo: celdas_de_spans(*figura.spans_relleno()))
+        yield ("relleno_poligono", {"escala": escala, "vertices": len(poligono.puntos)},
+               lambda figura=poligono: celdas_de_spans(*figura.spans_relleno()))
+        yield ("relleno_circulo", {"escala": escala},
+               lambda radio=radio: celdas_de_spans(*spans_disco(400, 300, radio)))
+
+    # Relleno por difusión sobre la rejilla del motor, con el borde de un círculo ya dibujado
+    motor_relleno = MotorRaster(ANCHO, ALTO)
+    circulo = Circunferencia(400, 300, 45, "Yellow")
+    circulo.escalar(4)
+    motor_relleno.dibujar_figura(circulo)
+    yield ("flood_fill_puntos", {"escala": 4},
+           lambda: flood_fill_puntos(motor_relleno, circulo.x, circulo.y, circulo.color))
+
+    rnd = random.Random(semilla)
+    puntos = [(rnd.randrange(0, ANCHO), rnd.randrange(0, ALTO)) for _ in range(1000)]
+    xs_puntos, ys_puntos = np.array(puntos).T
+    figuras_colision = {
+        "cuadrado": Cuadrado(300, 200, 390, 200, 390, 290, 300, 290),
+        "triangulo": Triangulo(250, 380, 300, 290, 350, 380),
+        "circulo": Circunferencia(400, 300, 45),
+        "poligono": poligono_estrella(400, 300, 100),
+    }
+    for nombre, figura in figuras_colision.items():
+        figura.rotar(15)
+        yield ("colisiona_con_punto_" + nombre, {"puntos": len(puntos)},
+               lambda figura=figura: [figura.colisiona_con_punto(x, y) for x, y in puntos])
+
+    # Equivalente sin Tk de delete("all") más dibujar todas las figuras
+    for cantidad in tamanos:
+        figuras = escena_aleatoria(cantidad, semilla)
+        motor = MotorRaster(ANCHO, ALTO)
+        yield "redibujar_escena", {"figuras": cantidad, "cache": "caliente"}, lambda motor=motor, figuras=figuras: motor.renderizar(figuras)
+
+        def en_frio(motor=motor, figuras=figuras):
+            motor.cache_raster.limpiar()
+            motor.renderizar(figuras)
+        yield "redibujar_escena", {"figuras": cantidad, "cache": "fria"}, en_frio
+
+        # El redibujado de la aplicación en modo Tk: delete("all") y un create_rectangle por tramo
+        if v9 is not None:
+            canvas = CanvasSinPantalla(ANCHO, ALTO)
+            canvas.figuras = figuras
+            yield "redibujar_canvas_tk", {"figuras": cantidad}, canvas.redibujar
+
+        def transformar(figuras=figuras):
+            # Reasignar la rotación descarta los vértices memorizados, así se mide el cálculo completo
+            for figura in figuras:
+                figura.rotacion = figura.rotacion
+            transformar_figuras(figuras)
+        yield "transformar_figuras", {"figuras": cantidad}, transformar
+
+        # Colisión de muchos puntos contra toda la escena: en lote sobre la copia columnar, y punto por
+        # punto con el índice espacial, como seleccionar_figura
+        yield "escena_columnar", {"figuras": cantidad}, lambda figuras=figuras: EscenaColumnar(figuras)
+        columnar = EscenaColumnar(figuras)
+        yield ("primera_figura_columnar", {"figuras": cantidad, "puntos": len(puntos)},
+               lambda columnar=columnar: columnar.primera_figura(xs_puntos, ys_puntos))
+        indice = IndiceEspacial()
+        for figura in figuras:
+            indice.actualizar(figura, figura.caja_delimitadora())
+
+        def primera_figura_indice(indice=indice):
+            return [next((figura for figura in indice.candidatos(x, y) if figura.colisiona_con_punto(x, y)), None)
+                    for x, y in puntos]
+        yield "primera_figura_indice", {"figuras": cantidad, "puntos": len(puntos)}, primera_figura_indice
+
+        if procesos > 1:
+            rasterizador = RasterizadorParalelo(MotorRaster(ANCHO, ALTO), procesos)
+            try:
+                yield ("redibujar_escena_paralelo", {"figuras": cantidad, "procesos": procesos},
+                       lambda rasterizador=rasterizador, figuras=figuras: rasterizador.dibujar(figuras))
+            finally:
+                rasterizador.cerrar()
+
+class FiguraConDiccionario:
+    # """
+    # Disposición de las figuras antes de __slots__, para comparar la memoria: cada instancia guarda
+    # sus atributos en su propio __dict__, en el mismo orden que los constructores originales, y el
+    # primer vértice de los polígonos va dos veces (x, y y x1, y1). Sólo guarda datos, no dibuja.
+
+    # :param datos: Descripción de la figura, como la de figura_a_dict.
+    # """
+    def __init__(self, datos):
+        self.x = datos["x"]
+        self.y = datos["y"]
+        self.color = datos["color"]
+        self.grosor = datos["grosor"]
+        self.tipo_linea = datos["tipo_linea"]
+        self.escala = 1
+        self.borde_seleccionado = False
+        self.rotacion = 0
+        for numero, (x, y) in enumerate(datos.get("vertices", ()), 1):
+            setattr(self, "x{}".format(numero), x)
+            setattr(self, "y{}".format(numero), y)
+        if "radio" in datos:
+            self.radio = datos["radio"]
+        self.escala = datos["escala"]
+        self.rotacion = datos["rotacion"]
+
+# Una clase por tipo, como antes, para que cada una comparta las claves de sus diccionarios
+FIGURAS_CON_DICCIONARIO = {tipo: type(tipo.__name__ + "ConDiccionario", (FiguraConDiccionario,), {})
+                           for tipo in (Cuadrado, Triangulo, Circunferencia)}
+
+def memoria_por_figura(cantidad=10000, semilla=0):
+    # """
+    # Bytes que ocupa cada figura según tracemalloc, con __slots__ y con la disposición anterior en
+    # diccionarios (FiguraConDiccionario). Por cada tipo se crean las figuras de una escena aleatoria
+    # a partir de su descripción (como al cargar un archivo) y se divide la memoria que quedan
+    # ocupando, incluida la lista que las contiene, entre el número de figuras.
+
+    # :return: Diccionario {tipo de figura: {"slots": bytes, "diccionario": bytes, "ahorro": bytes}}.
+    # """
+    def medir_memoria(crear, descripciones):
+        tracemalloc.start()
+        copias = [crear(datos) for datos in descripciones]
+        ocupado = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return round(ocupado / len(copias), 1)
+
+    figuras = escena_aleatoria(cantidad, semilla)
+    resultado = {}
+    for tipo, con_diccionario in FIGURAS_CON_DICCIONARIO.items():
+        descripciones = [figura_a_dict(figura) for figura in figuras if type(figura) is tipo]
+        slots = medir_memoria(figura_desde_dict, descripciones)
+        diccionario = medir_memoria(con_diccionario, descripciones)
+        resultado[tipo.__name__] = {"slots": slots, "diccionario": diccionario, "ahorro": round(diccionario - slots, 1)}
+    return resultado
+
+def ejecutar(semilla=0, repeticiones=5, tamanos=TAMANOS_ESCENA, procesos=1, mostrar=None):
+    # Corre todos los casos y devuelve el informe como diccionario listo para json.dump.
+    resultados = []
+    for nombre, parametros, funcion in casos(semilla, tamanos, procesos):
+        # Las escenas grandes se repiten menos para que la corrida completa siga siendo corta
+        veces = repeticiones if parametros.get("figuras", 0) < 1000 else max(1, repeticiones // 3)
+        tiempos = medir(funcion, veces)
+        resultado = {"nombre": nombre, "parametros": parametros, "repeticiones": veces,
+                     "mejor_s": min(tiempos), "mediana_s": statistics.median(tiempos)}
+        resultados.append(resultado)
+        if mostrar is not None:
+            mostrar("{:<30} {:<40} {:>12.6f} s".format(nombre, json.dumps(parametros), resultado["mejor_s"]))
+    memoria = memoria_por_figura(semilla=semilla)
+    if mostrar is not None:
+        for tipo, bytes_figura in memoria.items():
+            mostrar("{:<30} {:<40} {:>12.1f} B (con diccionario {:.1f} B, ahorro {:.1f} B)".format(
+                "memoria_por_figura", tipo, bytes_figura["slots"], bytes_figura["diccionario"], bytes_figura["ahorro"]))
+    return {
+        "semilla": semilla,
+        "tamano_celda": nucleo.TAMANO_CELDA,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "resultados": resultados,
+        "bytes_por_figura": memoria,
+    }
+
+def comparar(base, actual, tolerancia):
+    # """
+    # Compara dos informes caso por caso usando el mejor tiempo.
+
+    # :param tolerancia: Cociente actual/base a partir del cual un caso cuenta como regresión.
+    # :return: Lista de (nombre, parámetros, cociente) de los casos que empeoraron.
+    # """
+    def clave(resultado):
+        return resultado["nombre"], json.dumps(resultado["parametros"], sort_keys=True)
+
+    tiempos_base = {clave(resultado): resultado["mejor_s"] for resultado in base["resultados"]}
+    regresiones = []
+    for resultado in actual["resultados"]:
+        anterior = tiempos_base.get(clave(resultado))
+        if anterior:
+            cociente = resultado["mejor_s"] / anterior
+            print("{:<30} {:<40} {:>8.2f}x".format(resultado["nombre"], json.dumps(resultado["parametros"]), cociente))
+            if cociente > tolerancia:
+                regresiones.append((resultado["nombre"], resultado["parametros"], cociente))
+    return regresiones
+
+def main(argumentos=None):
+    parser = argparse.ArgumentParser(description="Pruebas de rendimiento del núcleo de dibujo.")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--tamanos", default=",".join(str(tamano) for tamano in TAMANOS_ESCENA),
+                        help="Número de figuras de cada escena, separados por comas.")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Con más de uno, también se mide el redibujado con RasterizadorParalelo.")
+    parser.add_argument("--celda", type=int, default=10,
+                        help="Tamaño de celda en píxeles con el que se mide todo; 1 es resolución completa.")
+    parser.add_argument("--salida", help="Archivo donde escribir el informe JSON (por defecto, la salida estándar).")
+    parser.add_argument("--comparar", help="Informe JSON anterior con el que comparar esta corrida.")
+    parser.add_argument("--tolerancia", type=float, default=1.2,
+                        help="Cociente de tiempos a partir del cual un caso cuenta como regresión.")
+    opciones = parser.parse_args(argumentos)
+
+    tamanos = [int(tamano) for tamano in opciones.tamanos.split(",") if tamano]
+    fijar_tamano_celda(opciones.celda)
+    informe = ejecutar(opciones.semilla, opciones.repeticiones, tamanos, opciones.procesos,
+                       mostrar=lambda texto: print(texto, file=sys.stderr))
+    if opciones.salida:
+        with open(opciones.salida, "w") as archivo:
+            json.dump(informe, archivo, indent=2)
+    elif not opciones.comparar:
+        json.dump(informe, sys.stdout, indent=2)
+        print()
+
+    if opciones.comparar:
+        with open(opciones.comparar) as archivo:
+            base = json.load(archivo)
+        regresiones = comparar(base, informe, opciones.tolerancia)
+        for nombre, parametros, cociente in regresiones:
+            print("Regresión: {} {} {:.2f}x".format(nombre, json.dumps(parametros), cociente), file=sys.stderr)
+        return 1 if regresiones else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
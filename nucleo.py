@@ -0,0 +1,2160 @@
+import json
+import math
+import multiprocessing
+import operator
+import struct
+import time
+import zlib
+from collections import OrderedDict, deque
+from multiprocessing import shared_memory
+import numpy as np
+
+# Núcleo de geometría y rasterización de las figuras, sin dependencias de Tk: se puede importar y
+# usar para dibujar escenas en procesos sin pantalla. FigurasCanvas (v9.py) es la capa de Tk encima
+# de MotorRaster.
+
+# Tamaño en píxeles de las celdas de la cuadrícula. Las figuras ajustan sus vértices a esta cuadrícula
+# y se rasterizan en celdas de este tamaño; con 1 se dibuja a resolución completa. Se cambia con
+# fijar_tamano_celda.
+TAMANO_CELDA = 10
+
+def fijar_tamano_celda(tamano, figuras=()):
+    # """
+    # Cambia el tamaño de celda de todo el núcleo. Los vértices y cajas memorizados dependen de él,
+    # así que se descartan los de las figuras indicadas; las demás deben crearse después del cambio.
+
+    # :param tamano: Tamaño en píxeles de cada celda (entero positivo).
+    # :param figuras: Figuras ya creadas que se seguirán usando.
+    # """
+    global TAMANO_CELDA
+    if int(tamano) != tamano or tamano < 1:
+        raise ValueError("tamaño de celda no válido: {}".format(tamano))
+    TAMANO_CELDA = int(tamano)
+    for figura in figuras:
+        figura._vertices = figura._caja = None
+
+def flood_fill_puntos(canvas, x, y, color_reemplazo, color_borde1="#dddfef", color_borde2="black", etiqueta=None):
+    # Implementa el algoritmo de relleno por difusión (flood fill) para pintar un área delimitada por
+    # un color de borde en un objeto canvas. La función toma como entrada un objeto canvas, las
+    # coordenadas (x, y) del punto de inicio, el color de reemplazo para llenar el área y dos colores
+    # de borde.
+    # El recorrido avanza celda por celda en capas, y los colores de cada capa de vecinos se consultan
+    # de una vez con canvas.obtener_colores_pixeles, que lee la rejilla de colores del canvas. Las
+    # celdas fuera del canvas se tratan como borde.
+
+    # canvas: El objeto canvas en el que se realizará el relleno.
+    # x: Coordenada x del punto de inicio.
+    # y: Coordenada y del punto de inicio.
+    # color_reemplazo: Color con el que se llenará el área.
+    # color_borde1: Primer color de borde del área a rellenar.
+    # color_borde2: Segundo color de borde del área a rellenar.
+    # etiqueta: Etiqueta de Tk para los elementos creados (la de la figura que se rellena).
+    rejilla = canvas.rejilla
+    tamano = rejilla.tamano_celda
+    visitados = np.zeros((rejilla.filas, rejilla.columnas), dtype=bool)
+
+    frontera_x = np.array([int(x // tamano) * tamano])
+    frontera_y = np.array([int(y // tamano) * tamano])
+    if not rejilla.dentro(frontera_x, frontera_y)[0]:
+        return
+    visitados[frontera_y // tamano, frontera_x // tamano] = True
+    pintados_x, pintados_y = [], []
+
+    while len(frontera_x):
+        pintados_x.append(frontera_x)
+        pintados_y.append(frontera_y)
+
+        # Vecinos de toda la capa actual
+        vecinos_x = np.concatenate((frontera_x - tamano, frontera_x + tamano, frontera_x, frontera_x))
+        vecinos_y = np.concatenate((frontera_y, frontera_y, frontera_y - tamano, frontera_y + tamano))
+        dentro = rejilla.dentro(vecinos_x, vecinos_y)
+        vecinos_x, vecinos_y = vecinos_x[dentro], vecinos_y[dentro]
+        filas, columnas = vecinos_y // tamano, vecinos_x // tamano
+        nuevos = ~visitados[filas, columnas]
+        vecinos_x, vecinos_y, filas, columnas = vecinos_x[nuevos], vecinos_y[nuevos], filas[nuevos], columnas[nuevos]
+        _, unicos = np.unique(filas * rejilla.columnas + columnas, return_index=True)
+        vecinos_x, vecinos_y, filas, columnas = vecinos_x[unicos], vecinos_y[unicos], filas[unicos], columnas[unicos]
+        visitados[filas, columnas] = True
+
+        # Verifica que el vecino no sea un borde
+        colores = canvas.obtener_colores_pixeles(vecinos_x, vecinos_y)
+        libres = (colores != color_borde1) & (colores != color_borde2)
+        frontera_x, frontera_y = vecinos_x[libres], vecinos_y[libres]
+
+    canvas.pintar_celdas(np.concatenate(pintados_x), np.concatenate(pintados_y), color_reemplazo, etiqueta)
+    return
+
+def bresenham(x1, y1, x2, y2, line_style='dashed', tamano=None):
+    
+    # Implementa el algoritmo de Bresenham para trazar una línea entre dos puntos en un espacio discreto
+    # de coordenadas. La función toma como entrada las coordenadas de los puntos inicial y final, y un
+    # estilo de línea opcional (línea continua o discontinua).
+
+    # :param x1: Coordenada x del punto inicial.
+    # :param y1: Coordenada y del punto inicial.
+    # :param x2: Coordenada x del punto final.
+    # :param y2: Coordenada y del punto final.
+    # :param line_style: Estilo de línea, 'dashed' para línea discontinua o cualquier otro valor para línea continua.
+    # :param tamano: Tamaño en píxeles de cada celda; por defecto TAMANO_CELDA.
+    # :return: Lista de puntos que forman la línea trazada.
+    
+    tamano = tamano or TAMANO_CELDA
+    dx = abs(x2 - x1)
+    dy = abs(y2 - y1)
+    sx = tamano if x1 < x2 else -tamano
+    sy = tamano if y1 < y2 else -tamano
+    err = dx - dy
+    x, y = x1, y1
+    puntos = []
+
+    segment_length = 1
+    current_length = 0
+    current_color = "black"
+
+    while True:
+        color = current_color if line_style == 'dashed' else 'black'
+        puntos.append((x, y, color))
+
+        if x == x2 and y == y2:
+            break
+
+        e2 = 2 * err
+        # Mueve el punto en el eje x
+        if e2 > -dy:
+            err -= dy
+            x += sx
+        # Mueve el punto en el eje y
+        if e2 < dx:
+            err += dx
+            y += sy
+
+        # Cambia el color para simular una línea discontinua
+        if line_style == 'dashed':
+            current_length += 1
+            if current_length % 4 == 1 or current_length % 4 == 2 or current_length % 4 == 3:
+                current_color = "black"
+            else:
+                current_color = "#dddfef"
+
+    return puntos
+
+def bresenham_lote(segmentos, line_style='solid', tamano=None):
+    # """
+    # Versión por lotes de bresenham: traza todos los segmentos a la vez con NumPy, sin un ciclo de
+    # Python por celda. Para cada segmento, el paso k sobre el eje dominante avanza una celda y el eje
+    # secundario avanza floor((2*k*menor + mayor - 1) / (2*mayor)) celdas, que es exactamente lo que
+    # hace el ciclo de bresenham (incluido cómo desempata). El patrón discontinuo también es el mismo:
+    # cada cuarta celda después de la primera va con "#dddfef".
+
+    # :param segmentos: Arreglo (N, 4) con (x1, y1, x2, y2) de cada segmento; las diferencias entre
+    #                   extremos deben ser múltiplos de tamano, igual que en bresenham.
+    # :param line_style: 'dashed' para línea discontinua o cualquier otro valor para línea continua.
+    # :param tamano: Tamaño en píxeles de cada celda; por defecto TAMANO_CELDA.
+    # :return: Arreglos (xs, ys, colores) con los puntos de todos los segmentos, en el mismo orden en
+    #          que bresenham los devolvería segmento por segmento.
+    # """
+    tamano = tamano or TAMANO_CELDA
+    segmentos = np.asarray(segmentos, dtype=float).reshape(-1, 4)
+    x1, y1, x2, y2 = segmentos.T
+    celdas_x = np.rint(np.abs(x2 - x1) / tamano).astype(np.int64)
+    celdas_y = np.rint(np.abs(y2 - y1) / tamano).astype(np.int64)
+    mayor = np.maximum(celdas_x, celdas_y)
+    menor = np.minimum(celdas_x, celdas_y)
+
+    # Índice del segmento y número de paso k de cada punto
+    cantidad = mayor + 1
+    segmento = np.repeat(np.arange(len(segmentos)), cantidad)
+    k = np.arange(cantidad.sum()) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+
+    divisor = np.maximum(mayor, 1)[segmento]
+    paso_menor = (2 * k * menor[segmento] + divisor - 1) // (2 * divisor)
+    eje_x = (celdas_x >= celdas_y)[segmento]
+    pasos_x = np.where(eje_x, k, paso_menor)
+    pasos_y = np.where(eje_x, paso_menor, k)
+    sx = np.where(x1 < x2, tamano, -tamano)[segmento]
+    sy = np.where(y1 < y2, tamano, -tamano)[segmento]
+    xs = x1[segmento] + sx * pasos_x
+    ys = y1[segmento] + sy * pasos_y
+
+    colores = np.full(len(k), "black", dtype=object)
+    if line_style == 'dashed':
+        colores[(k > 0) & (k % 4 == 0)] = "#dddfef"
+    return xs, ys, colores
+
+# !
+def line(x1, y1, x2, y2, color='black', segment_length=1, line_style='solid', tamano=None):
+    puntos = []
+    square_size = tamano or TAMANO_CELDA
+
+    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
+
+    a = y2 - y1
+    b = x1 - x2
+    c = x2*y1 - x1*y2
+
+    if abs(b) > abs(a):
+        if x2 < x1:
+            x1, x2 = x2, x1
+        current_length = 0
+        current_color = color
+        for x in range(x1, x2+1, square_size):
+            y = round((-a*x - c) / b)
+            y = (y // square_size) * square_size + square_size // 2
+            if line_style == 'dashed':
+                if current_length == 0:
+                    current_color = color if current_color != color else 'white'
+                    current_length = segment_length
+                else:
+                    current_length -= 1
+            puntos.append((x, y, current_color))
+        if x2 % square_size != 0:
+            y = round((-a*x2 - c) / b)
+            y = (y // square_size) * square_size + square_size // 2
+            puntos.append((x2, y, current_color))
+    else:
+        if y2 < y1:
+            y1, y2 = y2, y1
+        current_length = 0
+        current_color = color
+        for y in range(y1, y2+1, square_size):
+            x = round((-b*y - c) / a)
+            x = (x // square_size) * square_size + square_size // 2
+            if line_style == 'dashed':
+                if current_length == 0:
+                    current_color = color if current_color != color else 'white'
+                    current_length = segment_length
+                else:
+                    current_length -= 1
+            puntos.append((x, y, current_color))
+        if y2 % square_size != 0:
+            x = round((-b*y2 - c) / a)
+            x = (x // square_size) * square_size + square_size // 2
+            puntos.append((x, y2, current_color))
+
+    return puntos
+# !
+def octantes_punto_medio(radio, tamano=None):
+    # """
+    # Pasos del algoritmo del punto medio para un radio dado, calculados de una vez. En el ciclo de
+    # punto_medio, y baja en uno justo cuando (x + 1)^2 + y(y - 1) >= r^2, así que el y de cada x es el
+    # mayor entero con x^2 + y(y - 1) < r^2 (y r para x = 0). El ciclo sigue mientras x <= y.
+
+    # :param radio: Radio en píxeles (se redondea hacia arriba a celdas, igual que punto_medio).
+    # :param tamano: Tamaño en píxeles de cada celda; por defecto TAMANO_CELDA.
+    # :return: Arreglos (x, y) en celdas del primer octante, en el orden del ciclo.
+    # """
+    r = math.ceil(radio / (tamano or TAMANO_CELDA))
+    x = np.arange(max(r, 0) + 1, dtype=np.int64)
+    resto = r * r - x * x
+    y = np.floor((1 + np.sqrt(np.maximum(1 + 4 * resto, 0))) / 2).astype(np.int64)
+    # Corrige el error de la raíz en punto flotante
+    y = np.where(y * (y - 1) >= resto, y - 1, y)
+    y = np.where((y + 1) * y < resto, y + 1, y)
+    y[0] = r
+    continua = x <= y
+    cantidad = len(continua) if continua.all() else int(np.argmin(continua))
+    return x[:cantidad], y[:cantidad]
+
+def circunferencia_punto_medio(x0, y0, radio, tamano=None):
+    # Puntos de la circunferencia del punto medio con centro (x0, y0) como arreglos (xs, ys): ocho por
+    # cada paso de octantes_punto_medio, en el mismo orden que punto_medio.
+    tamano = tamano or TAMANO_CELDA
+    x, y = octantes_punto_medio(radio, tamano)
+    dx = np.stack((x, y, -y, -x, -x, -y, y, x), axis=1).ravel() * tamano
+    dy = np.stack((y, x, x, y, -y, -x, -x, -y), axis=1).ravel() * tamano
+    return x0 + dx, y0 + dy
+
+# !
+def punto_medio(x0, y0, radio, tamano=None):
+    xs, ys = circunferencia_punto_medio(x0, y0, radio, tamano)
+    return list(zip(xs.tolist(), ys.tolist()))
+
+def spans_disco(x0, y0, radio, tamano=None):
+    # """
+    # Tramos interiores del círculo que traza punto_medio, sin recorrer el canvas: en cada fila se
+    # rellenan las celdas más cercanas al centro que la celda de borde más interior de esa fila, que es
+    # lo mismo que deja un relleno por difusión desde el centro.
+
+    # :param x0: Coordenada x del centro.
+    # :param y0: Coordenada y del centro.
+    # :param radio: Radio en píxeles.
+    # :param tamano: Tamaño en píxeles de cada celda; por defecto TAMANO_CELDA.
+    # :return: Arreglos (ys, xs_inicio, xs_fin) de los tramos, alineados a la cuadrícula.
+    # """
+    tamano = tamano or TAMANO_CELDA
+    x, y = octantes_punto_medio(radio, tamano)
+    if len(y) == 0:
+        # Con radio negativo punto_medio no traza nada, así que tampoco hay interior
+        vacio = np.empty(0, dtype=np.int64)
+        return vacio, vacio, vacio
+    r = int(y[0])
+    # Distancia al centro de la celda de borde más interior de cada fila 0..r
+    interior = np.full(r + 1, r + 1, dtype=np.int64)
+    np.minimum.at(interior, y, x)
+    np.minimum.at(interior, x, y)
+    filas = np.concatenate((-np.arange(r, 0, -1), np.arange(r + 1)))
+    media = interior[np.abs(filas)] - 1
+    validos = media >= 0
+    filas, media = filas[validos], media[validos]
+    columna_centro, fila_centro = int(x0 // tamano), int(y0 // tamano)
+    return ((fila_centro + filas) * tamano, (columna_centro - media) * tamano, (columna_centro + media) * tamano)
+# !
+def area(x1, y1, x2, y2, x3, y3):
+    return abs((x1 * (y2 - y3) + x2 * (y3 - y1) + x3 * (y1 - y2)) / 2.0)
+
+def punto_en_poligono(vertices, x, y):
+    # """
+    # Ray casting vectorizado: la misma regla que Cuadrado.colisiona_con_punto (un rayo horizontal
+    # hacia la derecha y paridad de cruces), evaluada de una vez sobre todas las aristas y, si se
+    # pasan arreglos, sobre todos los puntos.
+
+    # :param vertices: Arreglo (n, 2) de vértices del polígono.
+    # :param x: Coordenada x del punto, o arreglo de coordenadas.
+    # :param y: Coordenada y del punto, o arreglo de coordenadas.
+    # :return: True si el punto queda dentro del polígono, o una máscara con la forma de x.
+    # """
+    x = np.asarray(x, dtype=float)[..., None]
+    y = np.asarray(y, dtype=float)[..., None]
+    p1_x, p1_y = vertices[:, 0], vertices[:, 1]
+    p2_x, p2_y = np.roll(p1_x, -1), np.roll(p1_y, -1)
+    cruza = (y > np.minimum(p1_y, p2_y)) & (y <= np.maximum(p1_y, p2_y)) & (x <= np.maximum(p1_x, p2_x))
+    # Las aristas horizontales nunca cruzan (y > min e y <= max no pueden cumplirse a la vez)
+    alto = np.where(p1_y != p2_y, p2_y - p1_y, 1)
+    x_intersect = (y - p1_y) * (p2_x - p1_x) / alto + p1_x
+    dentro = np.count_nonzero(cruza & ((p1_x == p2_x) | (x <= x_intersect)), axis=-1) % 2 == 1
+    return dentro if dentro.ndim else bool(dentro)
+
+def spans_scanline(puntos, tamano=None):
+    # """
+    # Relleno por líneas de barrido (scanline) de un polígono a partir de sus vértices. Se arma una
+    # tabla de aristas y cada arista aporta una intersección sólo a las filas de la cuadrícula que
+    # cruza (regla semiabierta [y_min, y_max)), así que no hace falta consultar ningún píxel.
+    # Las intersecciones de cada fila se ordenan y se emparejan para formar los tramos interiores.
+
+    # :param puntos: Secuencia de vértices (x, y) del polígono, ya escalados y rotados.
+    # :param tamano: Tamaño en píxeles de cada celda; por defecto TAMANO_CELDA.
+    # :return: Arreglos (ys, xs_inicio, xs_fin) con la fila y las celdas inicial y final de cada tramo.
+    # """
+    tamano = tamano or TAMANO_CELDA
+    puntos = np.asarray(puntos, dtype=float)
+    inicio = puntos
+    fin = np.roll(puntos, -1, axis=0)
+
+    # Tabla de aristas: se descartan las horizontales y se orienta cada arista de arriba hacia abajo
+    no_horizontal = inicio[:, 1] != fin[:, 1]
+    inicio, fin = inicio[no_horizontal], fin[no_horizontal]
+    invertir = inicio[:, 1] > fin[:, 1]
+    arriba = np.where(invertir[:, None], fin, inicio)
+    abajo = np.where(invertir[:, None], inicio, fin)
+    pendiente_inversa = (abajo[:, 0] - arriba[:, 0]) / (abajo[:, 1] - arriba[:, 1])
+
+    # Filas que cruza cada arista
+    fila_inicio = np.ceil(arriba[:, 1] / tamano).astype(np.int64)
+    fila_fin = np.ceil(abajo[:, 1] / tamano).astype(np.int64)
+    cantidad = np.maximum(fila_fin - fila_inicio, 0)
+    vacio = np.empty(0, dtype=np.int64)
+    if cantidad.sum() == 0:
+        return vacio, vacio, vacio
+
+    arista = np.repeat(np.arange(len(cantidad)), cantidad)
+    desplazamiento = np.arange(cantidad.sum()) - np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+    filas = fila_inicio[arista] + desplazamiento
+    xs = arriba[arista, 0] + (filas * tamano - arriba[arista, 1]) * pendiente_inversa[arista]
+
+    # Ordena por fila y luego por x; las intersecciones de cada fila se emparejan de dos en dos
+    orden = np.lexsort((xs, filas))
+    filas, xs = filas[orden], xs[orden]
+    filas, xs_inicio, xs_fin = filas[0::2], xs[0::2], xs[1::2]
+
+    columna_inicio = np.ceil(xs_inicio / tamano - 1e-9).astype(np.int64)
+    columna_fin = np.floor(xs_fin / tamano + 1e-9).astype(np.int64)
+    validos = columna_fin >= columna_inicio
+    return filas[validos] * tamano, columna_inicio[validos] * tamano, columna_fin[validos] * tamano
+
+def celdas_de_spans(ys, xs_inicio, xs_fin, tamano=None):
+    # Expande tramos (ys, xs_inicio, xs_fin) a las coordenadas (xs, ys) de cada celda.
+    tamano = tamano or TAMANO_CELDA
+    ys, xs_inicio, xs_fin = np.asarray(ys), np.asarray(xs_inicio), np.asarray(xs_fin)
+    cantidad = ((xs_fin - xs_inicio) // tamano + 1).astype(np.int64)
+    inicio_tramo = np.repeat(np.cumsum(cantidad) - cantidad, cantidad)
+    xs = np.repeat(xs_inicio, cantidad) + (np.arange(cantidad.sum()) - inicio_tramo) * tamano
+    return xs, np.repeat(ys, cantidad)
+
+def cajas_se_intersectan(caja1, caja2):
+    # Indica si dos cajas (x0, y0, x1, y1), con x1 e y1 exclusivos, comparten al menos un píxel.
+    return caja1[0] < caja2[2] and caja2[0] < caja1[2] and caja1[1] < caja2[3] and caja2[1] < caja1[3]
+
+def intersectar_cajas(caja1, caja2):
+    # Parte común de dos cajas, o None si no comparten ningún píxel.
+    if not cajas_se_intersectan(caja1, caja2):
+        return None
+    return (max(caja1[0], caja2[0]), max(caja1[1], caja2[1]), min(caja1[2], caja2[2]), min(caja1[3], caja2[3]))
+
+def unir_cajas(caja1, caja2):
+    # Caja mínima que contiene a las dos cajas dadas; cualquiera de ellas puede ser None.
+    if caja1 is None:
+        return caja2
+    if caja2 is None:
+        return caja1
+    return (min(caja1[0], caja2[0]), min(caja1[1], caja2[1]), max(caja1[2], caja2[2]), max(caja1[3], caja2[3]))
+
+class Figura:
+    # Clase base para representar figuras geométricas en un espacio bidimensional. Esta clase contiene
+    # atributos comunes a todas las figuras, como coordenadas, color, grosor, tipo de línea, escala y rotación.
+
+    # :param x: Coordenada x de la figura.
+    # :param y: Coordenada y de la figura.
+    # :param color: Color de la figura.
+    # :param grosor: Grosor del borde de la figura.
+    # :param tipo_linea: Tipo de línea para el borde de la figura ('solid' u otros).
+
+    # Las figuras usan __slots__ en lugar de un diccionario por instancia, para que escenas de cientos
+    # de miles de figuras ocupen menos memoria (ver memoria_por_figura en benchmark.py). Los vértices
+    # transformados y la caja se memorizan: las coordenadas, la escala y la rotación son propiedades
+    # que los descartan al escribirse, así que también una edición directa como figura.x1 += dx los
+    # invalida.
+    __slots__ = ("_x", "_y", "color", "grosor", "tipo_linea", "_escala", "borde_seleccionado", "_rotacion",
+                 "_vertices", "_caja")
+
+    def __init__(self, x, y, color='White', grosor=10, tipo_linea='solid'):
+        self.x = x
+        self.y = y
+        self.color = color
+        self.grosor = grosor
+        self.tipo_linea = tipo_linea
+        self.escala = 1
+        self.borde_seleccionado = False
+        self.rotacion = 0
+
+    def set_rotacion(self, angulo):
+        # Establece la rotación de la figura en grados.
+        self.rotacion = angulo % 360
+
+    def escalar(self, factor):
+        # Establece el factor de escala de la figura.
+        self.escala = factor
+
+    def get_escala(self):
+        # Obtiene el factor de escala de la figura.
+        return self.escala
+
+    def get_rotacion(self):
+        # Obtiene la rotación de la figura en grados.
+        return self.rotacion
+
+    def rotar(self, rotacion):
+        # Rota la figura en grados.
+        self.rotacion = rotacion
+
+    def cambiar_color(self, color):
+        # Cambia el color de la figura.
+        self.color = color
+
+    def trasladar(self, dx, dy):
+        # Traslada la figura en el eje x e y.
+        self.x += dx
+        self.y += dy
+
+    def imprimir_atributos(self):
+        # Imprime los atributos de la figura.
+        pass
+
+    def spans_relleno(self):
+        # Tramos (ys, xs_inicio, xs_fin) del relleno de la figura; la figura base no tiene relleno.
+        vacio = np.empty(0, dtype=np.int64)
+        return vacio, vacio, vacio
+
+    def colorear(self, canvas):
+        # Colorea la figura en un objeto canvas (FigurasCanvas o MotorRaster) con los tramos de
+        # spans_relleno, los mismos que rasterizar_figura usa para el relleno.
+        canvas.pintar_spans(*self.spans_relleno(), self.color, canvas.etiqueta_de(self))
+
+    def vertices_transformados(self):
+        # Vértices de la figura ya escalados, rotados y ajustados a la cuadrícula, como arreglo (n, 2)
+        # de sólo lectura. Se calculan la primera vez y se reutilizan hasta que la figura cambie.
+        if self._vertices is None:
+            vertices = self._calcular_vertices()
+            vertices.flags.writeable = False
+            self._vertices = vertices
+        return self._vertices
+
+    def caja_delimitadora(self):
+        # Caja (x0, y0, x1, y1) que contiene todas las celdas que dibuja la figura, memorizada igual
+        # que los vértices.
+        if self._caja is None:
+            self._caja = self._calcular_caja()
+        return self._caja
+
+    def _calcular_vertices(self):
+        return np.array([[self.x, self.y]], dtype=float)
+
+    def _calcular_caja(self):
+        return None
+
+def _coordenada(nombre):
+    # Propiedad sobre el slot "_" + nombre que descarta los vértices y la caja memorizados de la
+    # figura cada vez que se escribe.
+    slot = "_" + nombre
+    def escribir(figura, valor):
+        setattr(figura, slot, valor)
+        figura._vertices = figura._caja = None
+    return property(operator.attrgetter(slot), escribir)
+
+Figura.x = _coordenada("x")
+Figura.y = _coordenada("y")
+Figura.escala = _coordenada("escala")
+Figura.rotacion = _coordenada("rotacion")
+
+class Cuadrado(Figura):
+    
+    # Clase que representa un cuadrado en un espacio bidimensional. Hereda de la clase Figura.
+
+    # :param color: Color del cuadrado.
+    # :param grosor: Grosor del borde del cuadrado.
+    # :param tipo_linea: Tipo de línea para el borde del cuadrado ('solid' u otros).
+
+    # El primer vértice (x1, y1) se guarda en x e y de Figura en lugar de duplicarse.
+    __slots__ = ("_x2", "_y2", "_x3", "_y3", "_x4", "_y4")
+    x1, y1 = Figura.x, Figura.y
+    x2, y2, x3, y3, x4, y4 = (_coordenada(nombre) for nombre in ("x2", "y2", "x3", "y3", "x4", "y4"))
+
+    def __init__(self, x1, y1, x2, y2, x3, y3, x4, y4, color='black', grosor=1, tipo_linea='solid'):
+        super().__init__(x1, y1, color, grosor, tipo_linea)
+        self.x2 = x2
+        self.y2 = y2
+        self.x3 = x3
+        self.y3 = y3
+        self.x4 = x4
+        self.y4 = y4
+
+    def colisiona_con_punto(self, x, y):
+        # """
+        # Determina si un punto dado (x, y) colisiona con la figura utilizando el algoritmo de ray casting.
+        # Este algoritmo traza un rayo horizontal desde el punto (x, y) hacia la derecha y cuenta cuántas
+        # veces cruza los bordes de la figura. Si el número de cruces es impar, el punto está dentro de la
+        # figura, de lo contrario, está fuera.
+
+        # :param x: Coordenada x del punto.
+        # :param y: Coordenada y del punto.
+        # :return: Verdadero (True) si el punto colisiona con la figura, Falso (False) en caso contrario.
+        # """
+        puntos = self.vertices_transformados().tolist()
+        n_puntos = len(puntos)
+
+        intersecciones = 0
+        p1_x, p1_y = puntos[0]
+
+        # Recorre los lados de la figura
+        for i in range(1, n_puntos + 1):
+            p2_x, p2_y = puntos[i % n_puntos]
+
+            # Verifica si el punto está dentro de la región acotada por el par de puntos (lado) actual
+            if y > min(p1_y, p2_y) and y <= max(p1_y, p2_y) and x <= max(p1_x, p2_x):
+                if p1_y != p2_y:
+                    x_intersect = (y - p1_y) * (p2_x - p1_x) / (p2_y - p1_y) + p1_x
+                if p1_x == p2_x or x <= x_intersect:
+                    intersecciones += 1
+
+            p1_x, p1_y = p2_x, p2_y
+
+        return intersecciones % 2 == 1
+    
+    def coordenadas_escaladas(self):
+        # """
+        # Calcula y devuelve las coordenadas escaladas de la figura en función del factor de escala.
+        # La función escala la figura alrededor del punto superior izquierdo, es decir, el punto con la
+        # coordenada x más pequeña y la coordenada y más pequeña.
+
+        # :return: Las 8 coordenadas escaladas de la figura.
+        # """
+        x1, y1, x2, y2, x3, y3, x4, y4 = self.x1, self.y1, self.x2, self.y2, self.x3, self.y3, self.x4, self.y4
+
+        # Identifica el punto superior izquierdo (el que tiene la coordenada x más pequeña y la coordenada y más pequeña)
+        puntos = np.array([[x1, y1], [x2, y2], [x3, y3], [x4, y4]])
+        punto_superior_izquierdo = np.argmin(puntos, axis=0)[0]
+
+        # Calcula la matriz de escalado
+        escala_matriz = np.array([[self.escala, 0], [0, self.escala]])
+
+        # Escala las coordenadas
+        puntos_escalados = puntos - puntos[punto_superior_izquierdo]  # Resta el punto superior izquierdo
+        puntos_escalados = np.dot(puntos_escalados, escala_matriz)    # Multiplica por la matriz de escalado
+        puntos_escalados = puntos_escalados + puntos[punto_superior_izquierdo]  # Suma el punto superior izquierdo
+
+        # Redondea las coordenadas escaladas
+        puntos_escalados = np.round(puntos_escalados / TAMANO_CELDA) * TAMANO_CELDA
+
+        # Devuelve las 8 coordenadas escaladas
+        x1_escalado, y1_escalado = puntos_escalados[0]
+        x2_escalado, y2_escalado = puntos_escalados[1]
+        x3_escalado, y3_escalado = puntos_escalados[2]
+        x4_escalado, y4_escalado = puntos_escalados[3]
+        return x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado
+    
+    def puntos_rotados(self, x1, y1, x2, y2, x3, y3, x4, y4):
+        # """
+        # Calcula y devuelve las coordenadas de los puntos de la figura después de aplicar la rotación.
+        # La función rota la figura alrededor de su centro. El centro se calcula como el punto medio
+        # entre las coordenadas (x1, y1) y (x3, y3).
+
+        # :return: Las 8 coordenadas de los puntos rotados.
+        # """
+        puntos = np.array([[x1, y1], [x2, y2], [x3, y3], [x4, y4]])
+
+        # Calcula el centro de la figura
+        centro_x = (x1 + x3) / 2
+        centro_y = (y1 + y3) / 2
+
+        # Calcula el ángulo de rotación en radianes
+        rad = math.radians(self.rotacion)
+        cos_rad = math.cos(rad)
+        sin_rad = math.sin(rad)
+
+        # Crea la matriz de rotación
+        rotacion_matriz = np.array([[cos_rad, sin_rad], [-sin_rad, cos_rad]])
+
+        # Aplica la rotación a los puntos
+        puntos_rotados = puntos - np.array([centro_x, centro_y])  # Resta el centro de la figura
+        puntos_rotados = np.dot(puntos_rotados, rotacion_matriz)  # Multiplica por la matriz de rotación
+        puntos_rotados = puntos_rotados + np.array([centro_x, centro_y])  # Suma el centro de la figura
+
+        # Redondea las coordenadas de los puntos rotados
+        puntos_rotados = np.round(puntos_rotados / TAMANO_CELDA) * TAMANO_CELDA
+
+        x1_rotado, y1_rotado = puntos_rotados[0]
+        x2_rotado, y2_rotado = puntos_rotados[1]
+        x3_rotado, y3_rotado = puntos_rotados[2]
+        x4_rotado, y4_rotado = puntos_rotados[3]
+
+        return x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado, x4_rotado, y4_rotado
+   
+    def spans_relleno(self):
+        # """
+        # Calcula los tramos de relleno del cuadrado con spans_scanline a partir de los vértices
+        # escalados y rotados, sin semilla y sin consultar el canvas.
+
+        # :return: Arreglos (ys, xs_inicio, xs_fin) de los tramos interiores.
+        # """
+        return spans_scanline(self.vertices_transformados())
+
+    def _calcular_vertices(self):
+        return np.array(self.puntos_rotados(*self.coordenadas_escaladas()), dtype=float).reshape(4, 2)
+
+    def _calcular_caja(self):
+        # Caja de las celdas del cuadrado escalado y rotado; x1 e y1 son exclusivos.
+        vertices = self.vertices_transformados()
+        x0, y0 = vertices.min(axis=0)
+        x1, y1 = vertices.max(axis=0)
+        return (x0, y0, x1 + TAMANO_CELDA, y1 + TAMANO_CELDA)
+
+    def trasladar(self, dx, dy):
+        self.x1 += dx
+        self.y1 += dy
+        self.x2 += dx
+        self.y2 += dy
+        self.x3 += dx
+        self.y3 += dy
+        self.x4 += dx
+        self.y4 += dy
+
+
+
+class Triangulo(Figura):
+    # """
+    # Clase Triangulo que hereda de Figura. Representa un triángulo en un plano 2D con
+    # puntos (x1, y1), (x2, y2) y (x3, y3). Permite cambiar el color, el grosor y
+    # el tipo de línea, así como realizar transformaciones de escala y traslación.
+
+    # :param color: Color del triángulo (por defecto 'black').
+    # :param grosor: Grosor de la línea del triángulo (por defecto 1).
+    # :param tipo_linea: Tipo de línea del triángulo (por defecto 'solid').
+    # """
+    __slots__ = ("_x2", "_y2", "_x3", "_y3")
+    x1, y1 = Figura.x, Figura.y
+    x2, y2, x3, y3 = (_coordenada(nombre) for nombre in ("x2", "y2", "x3", "y3"))
+
+    def __init__(self, x1, y1, x2, y2, x3, y3, color='black', grosor=1, tipo_linea='solid'):
+        super().__init__(x1, y1, color, grosor, tipo_linea)
+        self.x2 = x2
+        self.y2 = y2
+        self.x3 = x3
+        self.y3 = y3
+    
+    def coordenadas_escaladas(self):
+        # """
+        # Calcula las coordenadas escaladas del triángulo, manteniendo la proporción
+        # original y escalándolo desde el punto superior (el vértice con la coordenada y más pequeña).
+
+        # :return: Seis coordenadas escaladas (x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado).
+        # """
+        x1, y1, x2, y2, x3, y3 = self.x1, self.y1, self.x2, self.y2, self.x3, self.y3
+
+        # Identifica el punto superior (el que tiene la coordenada y más pequeña)
+        puntos = np.array([[x1, y1], [x2, y2], [x3, y3]])
+        punto_superior = np.argmin(puntos, axis=0)[1]
+
+        # Calcula la matriz de escalado
+        escala_matriz = np.array([[self.escala, 0], [0, self.escala]])
+
+        # Escala las coordenadas
+        puntos_escalados = puntos - puntos[punto_superior]
+        puntos_escalados = np.dot(puntos_escalados, escala_matriz)
+        puntos_escalados = puntos_escalados + puntos[punto_superior]
+
+        # Redondea las coordenadas escaladas
+        puntos_escalados = np.round(puntos_escalados / TAMANO_CELDA) * TAMANO_CELDA
+
+        # Devuelve las 6 coordenadas escaladas
+        x1_escalado, y1_escalado = puntos_escalados[0]
+        x2_escalado, y2_escalado = puntos_escalados[1]
+        x3_escalado, y3_escalado = puntos_escalados[2]
+        return x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado
+
+    def puntos_rotados(self, x1, y1, x2, y2, x3, y3):
+        # """
+        # Rota los puntos del triángulo alrededor de su centroide según el ángulo de rotación.
+
+        # :param x1: Coordenada x del primer vértice del triángulo.
+        # :param y1: Coordenada y del primer vértice del triángulo.
+        # :param x2: Coordenada x del segundo vértice del triángulo.
+        # :param y2: Coordenada y del segundo vértice del triángulo.
+        # :param x3: Coordenada x del tercer vértice del triángulo.
+        # :param y3: Coordenada y del tercer vértice del triángulo.
+        # :return: Coordenadas rotadas de los vértices del triángulo.
+        # """
+        puntos = [[x1, y1], [x2, y2], [x3, y3]]
+
+        # Calcular el centroide del triángulo
+        centro_x, centro_y = Triangulo.punto_medio_triangulo(x1, y1, x2, y2, x3, y3)
+
+        # Convertir el ángulo de rotación en radianes y calcular sus valores de seno y coseno
+        rad = math.radians(self.rotacion)
+        cos_rad = math.cos(rad)
+        sin_rad = math.sin(rad)
+
+        puntos_rotados = []
+        for punto in puntos:
+            x, y = punto
+            # Aplicar la matriz de rotación a las coordenadas
+            x_rotado = cos_rad * (x - centro_x) - sin_rad * (y - centro_y) + centro_x
+            y_rotado = sin_rad * (x - centro_x) + cos_rad * (y - centro_y) + centro_y
+            # Redondear las coordenadas a múltiplos del tamaño de celda
+            x_rounded = round(x_rotado / TAMANO_CELDA) * TAMANO_CELDA
+            y_rounded = round(y_rotado / TAMANO_CELDA) * TAMANO_CELDA
+            puntos_rotados.append([x_rounded, y_rounded])
+
+        x1_rotado, y1_rotado = puntos_rotados[0]
+        x2_rotado, y2_rotado = puntos_rotados[1]
+        x3_rotado, y3_rotado = puntos_rotados[2]
+
+        return x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado
+
+
+    def punto_medio_triangulo(x1, y1, x2, y2, x3, y3):
+        x_medio = (x1 + x2 + x3) / 3
+        y_medio = (y1 + y2 + y3) / 3
+        return x_medio, y_medio   
+    def colisiona_con_punto(self, x, y):
+        (x1_rotado, y1_rotado), (x2_rotado, y2_rotado), (x3_rotado, y3_rotado) = self.vertices_transformados().tolist()
+
+        area_total = area(x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado)
+        area1 = area(x, y, x2_rotado, y2_rotado, x3_rotado, y3_rotado)
+        area2 = area(x1_rotado, y1_rotado, x, y, x3_rotado, y3_rotado)
+        area3 = area(x1_rotado, y1_rotado, x2_rotado, y2_rotado, x, y)
+        return abs(area_total - (area1 + area2 + area3)) < 0.1
+    def trasladar(self, dx, dy):
+        self.x1 += dx
+        self.y1 += dy
+        self.x2 += dx
+        self.y2 += dy
+        self.x3 += dx
+        self.y3 += dy
+    def imprimir_atributos(self):
+        super().imprimir_atributos()
+    def spans_relleno(self):
+        # Tramos de relleno del triángulo escalado y rotado (ver spans_scanline).
+        return spans_scanline(self.vertices_transformados())
+    def _calcular_vertices(self):
+        return np.array(self.puntos_rotados(*self.coordenadas_escaladas()), dtype=float).reshape(3, 2)
+    def _calcular_caja(self):
+        vertices = self.vertices_transformados()
+        x0, y0 = vertices.min(axis=0)
+        x1, y1 = vertices.max(axis=0)
+        return (x0, y0, x1 + TAMANO_CELDA, y1 + TAMANO_CELDA)
+class Circunferencia(Figura):
+    __slots__ = ("_radio",)
+    radio = _coordenada("radio")
+
+    def __init__(self, x, y, radio, color='yellow', grosor=1, tipo_linea='solid'):
+        super().__init__(x, y, color, grosor, tipo_linea)
+        self.radio = radio
+    def colisiona_con_punto(self, x, y):
+        distancia_centro = math.sqrt((x - self.x) ** 2 + (y - self.y) ** 2)
+        return distancia_centro <= self.radio * self.escala
+    def imprimir_atributos(self):
+        super().imprimir_atributos()
+        print(f"Radio: {self.radio}")
+    def spans_relleno(self):
+        # Tramos de relleno del disco con el radio ajustado a la cuadrícula (ver spans_disco).
+        return spans_disco(self.x, self.y, round(self.radio * self.escala / TAMANO_CELDA) * TAMANO_CELDA)
+    def _calcular_caja(self):
+        # Con radio negativo no se dibuja nada; la caja queda en la celda del centro
+        radio = max(round(self.radio * self.escala / TAMANO_CELDA) * TAMANO_CELDA, 0)
+        return (self.x - radio, self.y - radio, self.x + radio + TAMANO_CELDA, self.y + radio + TAMANO_CELDA)
+
+class Poligono(Figura):
+    # """
+    # Polígono de cualquier número de vértices. (x, y) es el primer vértice y los demás se guardan
+    # relativos a él en un arreglo (n, 2) de sólo lectura, así que trasladar no depende del número
+    # de vértices. Se escala respecto al primer vértice y se rota respecto al promedio de los
+    # vértices escalados, con operaciones sobre todo el arreglo; el relleno es el de spans_scanline.
+
+    # :param vertices: Secuencia de al menos tres vértices (x, y), en orden.
+    # :param color: Color del polígono.
+    # :param grosor: Grosor del borde del polígono.
+    # :param tipo_linea: Tipo de línea para el borde del polígono ('solid' u otros).
+    # """
+    __slots__ = ("_puntos",)
+    puntos = _coordenada("puntos")
+
+    def __init__(self, vertices, color='Purple', grosor=1, tipo_linea='solid'):
+        vertices = np.array(vertices, dtype=float)
+        if vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 3:
+            raise ValueError("Un polígono necesita al menos tres vértices (x, y)")
+        super().__init__(*vertices[0].tolist(), color, grosor, tipo_linea)
+        self.fijar_vertices(vertices)
+
+    @property
+    def vertices(self):
+        # Vértices originales (sin escalar ni rotar) en coordenadas absolutas.
+        return self.puntos + (self.x, self.y)
+
+    def fijar_vertices(self, vertices):
+        # Reemplaza los vértices; el primero pasa a ser (x, y).
+        vertices = np.array(vertices, dtype=float)
+        self.x, self.y = vertices[0].tolist()
+        puntos = vertices - vertices[0]
+        puntos.flags.writeable = False
+        self.puntos = puntos
+
+    def colisiona_con_punto(self, x, y):
+        # Descarta primero por la caja, que se calcula una vez, y sólo entonces recorre las aristas.
+        x0, y0, x1, y1 = self.caja_delimitadora()
+        if not (x0 <= x < x1 and y0 <= y < y1):
+            return False
+        return punto_en_poligono(self.vertices_transformados(), x, y)
+
+    def imprimir_atributos(self):
+        super().imprimir_atributos()
+        print(f"Vértices: {len(self.puntos)}")
+
+    def spans_relleno(self):
+        # Tramos de relleno del polígono escalado y rotado (ver spans_scanline).
+        return spans_scanline(self.vertices_transformados())
+
+    def _calcular_vertices(self):
+        escalados = np.round((self.puntos * self.escala + (self.x, self.y)) / TAMANO_CELDA) * TAMANO_CELDA
+        centro = escalados.mean(axis=0)
+        rad = math.radians(self.rotacion)
+        cos_rad, sin_rad = math.cos(rad), math.sin(rad)
+        rotacion_matriz = np.array([[cos_rad, sin_rad], [-sin_rad, cos_rad]])
+        return np.round((np.dot(escalados - centro, rotacion_matriz) + centro) / TAMANO_CELDA) * TAMANO_CELDA
+
+    def _calcular_caja(self):
+        vertices = self.vertices_transformados()
+        x0, y0 = vertices.min(axis=0)
+        x1, y1 = vertices.max(axis=0)
+        return (x0, y0, x1 + TAMANO_CELDA, y1 + TAMANO_CELDA)
+
+def transformar_figuras(figuras):
+    # """
+    # Calcula en lote los vértices transformados de los cuadrados y triángulos que no los tienen
+    # memorizados y los deja memorizados en cada figura. Es la misma transformación de
+    # coordenadas_escaladas y puntos_rotados, en dos pasos afines apilados para todas las figuras de
+    # un tipo: escala respecto al ancla de cada figura y redondeo a la cuadrícula, luego rotación
+    # respecto al centro de la figura ya escalada y otro redondeo. No se compone una sola matriz
+    # porque el redondeo intermedio cambia el resultado. Cada paso repite la aritmética del método
+    # de la figura (np.dot con matrices 2x2 apiladas en np.matmul, o las operaciones escalares de
+    # Triangulo.puntos_rotados), porque una diferencia de redondeo en el último bit basta para
+    # cambiar de celda un vértice que cae justo en la mitad.
+
+    # :param figuras: Figuras de la escena; las demás se ignoran.
+    # """
+    for tipo, eje_ancla in ((Cuadrado, 0), (Triangulo, 1)):
+        grupo = [figura for figura in figuras if figura._vertices is None and isinstance(figura, tipo)]
+        if not grupo:
+            continue
+        if tipo is Cuadrado:
+            puntos = np.array([(figura.x, figura.y, figura.x2, figura.y2, figura.x3, figura.y3, figura.x4, figura.y4)
+                               for figura in grupo], dtype=float).reshape(-1, 4, 2)
+        else:
+            puntos = np.array([(figura.x, figura.y, figura.x2, figura.y2, figura.x3, figura.y3)
+                               for figura in grupo], dtype=float).reshape(-1, 3, 2)
+        filas = np.arange(len(grupo))
+
+        # Escala respecto al vértice de menor x (cuadrado) o menor y (triángulo)
+        anclas = puntos[filas, np.argmin(puntos[:, :, eje_ancla], axis=1)][:, None, :]
+        matrices = np.zeros((len(grupo), 2, 2))
+        matrices[:, 0, 0] = matrices[:, 1, 1] = [figura.escala for figura in grupo]
+        escalados = np.round((np.matmul(puntos - anclas, matrices) + anclas) / TAMANO_CELDA) * TAMANO_CELDA
+
+        # Rota respecto al punto medio de la diagonal (cuadrado) o al centroide (triángulo)
+        if tipo is Cuadrado:
+            centros = (escalados[:, 0] + escalados[:, 2]) / 2
+        else:
+            centros = (escalados[:, 0] + escalados[:, 1] + escalados[:, 2]) / 3
+        centros = centros[:, None, :]
+        radianes = [math.radians(figura.rotacion) for figura in grupo]
+        cosenos = np.array([math.cos(angulo) for angulo in radianes])
+        senos = np.array([math.sin(angulo) for angulo in radianes])
+        relativos = escalados - centros
+        if tipo is Cuadrado:
+            matrices = np.empty((len(grupo), 2, 2))
+            matrices[:, 0, 0] = matrices[:, 1, 1] = cosenos
+            matrices[:, 0, 1] = senos
+            matrices[:, 1, 0] = -senos
+            rotados = np.matmul(relativos, matrices)
+        else:
+            cosenos, senos = cosenos[:, None], senos[:, None]
+            rotados = np.empty_like(relativos)
+            rotados[:, :, 0] = cosenos * relativos[:, :, 0] - senos * relativos[:, :, 1]
+            rotados[:, :, 1] = senos * relativos[:, :, 0] + cosenos * relativos[:, :, 1]
+        vertices = np.round((rotados + centros) / TAMANO_CELDA) * TAMANO_CELDA
+
+        vertices.flags.writeable = False
+        for figura, propios in zip(grupo, vertices):
+            figura._vertices = propios
+
+def agrupar_por_color(xs, ys, colores):
+    # Agrupa puntos (xs, ys, colores) en capas (color, xs, ys) con arreglos de NumPy, conservando el
+    # orden en que aparece cada color.
+    xs, ys, colores = np.asarray(xs), np.asarray(ys), np.asarray(colores, dtype=object)
+    if len(colores) == 0:
+        return []
+    distintos, primera, inversa = np.unique(colores.astype(str), return_index=True, return_inverse=True)
+    capas = []
+    for grupo in np.argsort(primera):
+        mascara = inversa.ravel() == grupo
+        capas.append((colores[primera[grupo]], xs[mascara], ys[mascara]))
+    return capas
+
+def rasterizar_figura(figura, estadisticas=None):
+    # """
+    # Rasteriza una figura en celdas de la cuadrícula sin dibujar nada en el canvas: el borde se traza
+    # con bresenham_lote (o circunferencia_punto_medio) y el relleno sale de spans_scanline (o
+    # spans_disco), sin consultar el canvas.
+
+    # :param figura: Figura a rasterizar.
+    # :param estadisticas: EstadisticasDibujo donde registrar el tiempo de cada fase, o None.
+    # :return: Lista de capas (color, xs, ys) en el orden en que deben pintarse.
+    # """
+    tipo = type(figura).__name__
+    inicio = time.perf_counter() if estadisticas is not None else 0
+    if isinstance(figura, (Cuadrado, Triangulo, Poligono)):
+        vertices = figura.vertices_transformados()
+        if estadisticas is not None:
+            inicio = estadisticas.marcar("transformacion", tipo, inicio)
+        segmentos = np.hstack((vertices, np.roll(vertices, -1, axis=0)))
+        contorno = bresenham_lote(segmentos, line_style=figura.tipo_linea)
+        if estadisticas is not None:
+            inicio = estadisticas.marcar("contorno", tipo, inicio)
+        relleno = celdas_de_spans(*spans_scanline(vertices))
+    elif isinstance(figura, Circunferencia):
+        radio = round(figura.radio * figura.escala / TAMANO_CELDA) * TAMANO_CELDA
+        if estadisticas is not None:
+            inicio = estadisticas.marcar("transformacion", tipo, inicio)
+        xs_borde, ys_borde = circunferencia_punto_medio(figura.x, figura.y, radio)
+        contorno = (xs_borde, ys_borde, np.full(len(xs_borde), "black", dtype=object))
+        if estadisticas is not None:
+            inicio = estadisticas.marcar("contorno", tipo, inicio)
+        relleno = celdas_de_spans(*spans_disco(figura.x, figura.y, radio))
+    else:
+        return []
+    if estadisticas is not None:
+        estadisticas.marcar("relleno", tipo, inicio)
+
+    # El relleno va primero para que el borde quede siempre encima
+    return [(figura.color, *relleno)] + agrupar_por_color(*contorno)
+
+def clave_raster(figura):
+    # """
+    # Clave con la que se guarda el raster de una figura en CacheRaster, y el origen respecto al que
+    # se guardan sus celdas. La forma se toma de los vértices ya escalados y rotados, relativos al
+    # primero: el redondeo de puntos_rotados no siempre conmuta con la traslación, así que la forma
+    # intrínseca más escala y rotación no bastaría para que un acierto sea exacto.
+
+    # :param figura: Figura a rasterizar.
+    # :return: Tupla (clave, (origen_x, origen_y)), o (None, None) si la figura no se puede guardar.
+    # """
+    if isinstance(figura, (Cuadrado, Triangulo, Poligono)):
+        vertices = figura.vertices_transformados()
+        origen_x, origen_y = vertices[0]
+        forma = tuple((vertices - vertices[0]).ravel().tolist())
+    elif isinstance(figura, Circunferencia):
+        origen_x, origen_y = figura.x, figura.y
+        # Un centro fuera de la cuadrícula desplaza todas las celdas, así que su resto forma parte de la forma
+        forma = (round(figura.radio * figura.escala / TAMANO_CELDA) * TAMANO_CELDA, figura.x % TAMANO_CELDA,
+                 figura.y % TAMANO_CELDA)
+    else:
+        return None, None
+    return (type(figura).__name__, forma, figura.tipo_linea, figura.color, TAMANO_CELDA), (origen_x, origen_y)
+
+def indices_de_celdas(xs, ys, tamano, filas, columnas, origen_x=0, origen_y=0):
+    # Convierte coordenadas en píxeles a índices (filas, columnas) de una cuadrícula cuya primera
+    # celda está en (origen_x, origen_y), múltiplos de tamano, y devuelve también la máscara de las
+    # que caen dentro de ella.
+    xs, ys = np.asarray(xs), np.asarray(ys)
+    if tamano == 1 and xs.dtype.kind == "i" and ys.dtype.kind == "i":
+        # Con celdas de un píxel y coordenadas enteras (como las de CacheRaster) no hace falta dividir
+        columnas_celda = xs - int(origen_x)
+        filas_celda = ys - int(origen_y)
+    else:
+        columnas_celda = (xs // tamano).astype(np.int64) - origen_x // tamano
+        filas_celda = (ys // tamano).astype(np.int64) - origen_y // tamano
+    dentro = (columnas_celda >= 0) & (columnas_celda < columnas) & (filas_celda >= 0) & (filas_celda < filas)
+    return filas_celda, columnas_celda, dentro
+
+def rebanadas_de_caja(caja, tamano, filas, columnas, origen_x=0, origen_y=0):
+    # Convierte una caja en píxeles a las rebanadas (filas, columnas) de las celdas que toca,
+    # recortadas a los límites de la cuadrícula. Una caja que queda toda fuera da rebanadas vacías
+    # (un fin negativo contaría desde el final del arreglo).
+    x0, y0, x1, y1 = caja[0] - origen_x, caja[1] - origen_y, caja[2] - origen_x, caja[3] - origen_y
+    rebanada_filas = slice(max(int(y0 // tamano), 0), max(min(int(-(-y1 // tamano)), filas), 0))
+    rebanada_columnas = slice(max(int(x0 // tamano), 0), max(min(int(-(-x1 // tamano)), columnas), 0))
+    return rebanada_filas, rebanada_columnas
+
+class Framebuffer:
+    # Framebuffer RGB en memoria para el modo raster de FigurasCanvas. Cada elemento del arreglo es
+    # una celda de la cuadrícula, así que el costo de dibujar depende del número de celdas y no del
+    # número de elementos de Tk.
+
+    # :param ancho: Ancho del canvas en píxeles.
+    # :param alto: Alto del canvas en píxeles.
+    # :param tamano_celda: Tamaño en píxeles de cada celda; por defecto TAMANO_CELDA.
+    # :param origen_x: Coordenada x (del mundo) de la primera columna, múltiplo de tamano_celda.
+    # :param origen_y: Coordenada y (del mundo) de la primera fila, múltiplo de tamano_celda.
+    def __init__(self, ancho, alto, tamano_celda=None, origen_x=0, origen_y=0):
+        tamano_celda = tamano_celda or TAMANO_CELDA
+        self.tamano_celda = tamano_celda
+        self.columnas = -(-ancho // tamano_celda)
+        self.filas = -(-alto // tamano_celda)
+        self.origen_x = origen_x
+        self.origen_y = origen_y
+        self.pixeles = np.zeros((self.filas, self.columnas, 3), dtype=np.uint8)
+
+    def rebanadas(self, caja):
+        # Rebanadas de self.pixeles que cubren la caja (ver rebanadas_de_caja).
+        return rebanadas_de_caja(caja, self.tamano_celda, self.filas, self.columnas, self.origen_x, self.origen_y)
+
+    def limpiar(self, rgb, caja=None):
+        # Pinta con el color de fondo todo el framebuffer, o sólo las celdas de la caja indicada.
+        if caja is None:
+            self.pixeles[:, :] = rgb
+        else:
+            self.pixeles[self.rebanadas(caja)] = rgb
+
+    def pintar_celdas(self, xs, ys, rgb):
+        # Pinta las celdas cuyas esquinas superiores izquierdas son (xs, ys), ignorando las que
+        # quedan fuera del framebuffer.
+        filas, columnas, dentro = indices_de_celdas(xs, ys, self.tamano_celda, self.filas, self.columnas,
+                                                    self.origen_x, self.origen_y)
+        self.pintar_posiciones(filas[dentro], columnas[dentro], rgb)
+
+    def pintar_posiciones(self, filas, columnas, rgb):
+        # Pinta celdas dadas por sus índices, que deben estar dentro del framebuffer. Cada celda se
+        # ve como un solo elemento de 3 bytes, así que se escribe con un único índice lineal, bastante
+        # más rápido que indexar con dos arreglos y repetir el color en cada fila.
+        celdas = self.pixeles.reshape(-1, 3).view("V3").reshape(-1)
+        celdas[filas * self.columnas + columnas] = np.array(rgb, dtype=np.uint8).view("V3")[0]
+
+    def a_ppm(self):
+        # Devuelve el contenido como imagen PPM binaria (una celda por píxel).
+        encabezado = "P6 {} {} 255 ".format(self.columnas, self.filas).encode()
+        return encabezado + self.pixeles.tobytes()
+
+class RejillaColores:
+    # """
+    # Índice de colores por celda que FigurasCanvas mantiene sincronizado con todo lo que dibuja.
+    # Cada celda guarda la posición de su color en una paleta, así que consultar el color de un punto
+    # es una sola lectura del arreglo, sin importar cuántos elementos haya en el canvas.
+
+    # :param ancho: Ancho del canvas en píxeles.
+    # :param alto: Alto del canvas en píxeles.
+    # :param tamano_celda: Tamaño en píxeles de cada celda; por defecto TAMANO_CELDA.
+    # :param origen_x: Coordenada x (del mundo) de la primera columna, múltiplo de tamano_celda.
+    # :param origen_y: Coordenada y (del mundo) de la primera fila, múltiplo de tamano_celda.
+    # """
+    def __init__(self, ancho, alto, tamano_celda=None, origen_x=0, origen_y=0):
+        tamano_celda = tamano_celda or TAMANO_CELDA
+        self.tamano_celda = tamano_celda
+        self.columnas = -(-ancho // tamano_celda)
+        self.filas = -(-alto // tamano_celda)
+        self.origen_x = origen_x
+        self.origen_y = origen_y
+        self.indices = np.zeros((self.filas, self.columnas), dtype=np.int32)
+        # El índice 0 es el fondo (None)
+        self.paleta = np.array([None], dtype=object)
+        self._posicion_color = {None: 0}
+
+    def limpiar(self, caja=None):
+        # Deja con el color de fondo todas las celdas, o sólo las de la caja indicada.
+        if caja is None:
+            self.indices[:, :] = 0
+        else:
+            self.indices[self.rebanadas(caja)] = 0
+
+    def rebanadas(self, caja):
+        # Rebanadas de self.indices que cubren la caja (ver rebanadas_de_caja).
+        return rebanadas_de_caja(caja, self.tamano_celda, self.filas, self.columnas, self.origen_x, self.origen_y)
+
+    def _indices_de_celdas(self, xs, ys):
+        return indices_de_celdas(xs, ys, self.tamano_celda, self.filas, self.columnas, self.origen_x, self.origen_y)
+
+    def posicion_color(self, color):
+        # Posición del color en la paleta, agregándolo si todavía no está.
+        posicion = self._posicion_color.get(color)
+        if posicion is None:
+            posicion = len(self.paleta)
+            self._posicion_color[color] = posicion
+            self.paleta = np.append(self.paleta, np.array([color], dtype=object))
+        return posicion
+
+    def pintar_celdas(self, xs, ys, color):
+        # Registra el color de las celdas (xs, ys), ignorando las que quedan fuera.
+        filas, columnas, dentro = self._indices_de_celdas(xs, ys)
+        self.pintar_posiciones(filas[dentro], columnas[dentro], color)
+
+    def pintar_posiciones(self, filas, columnas, color):
+        # Registra el color de celdas dadas por sus índices, que deben estar dentro de la rejilla.
+        self.indices.reshape(-1)[filas * self.columnas + columnas] = self.posicion_color(color)
+
+    def dentro(self, xs, ys):
+        # Máscara de los puntos (xs, ys) que caen dentro de la rejilla.
+        return self._indices_de_celdas(xs, ys)[2]
+
+    def color_en(self, x, y):
+        # Color de la celda que contiene el punto (x, y); None si es fondo o está fuera.
+        columna = int((x - self.origen_x) // self.tamano_celda)
+        fila = int((y - self.origen_y) // self.tamano_celda)
+        if 0 <= columna < self.columnas and 0 <= fila < self.filas:
+            return self.paleta[self.indices[fila, columna]]
+        return None
+
+    def colores_en(self, xs, ys):
+        # Versión por lotes de color_en: devuelve un arreglo de colores (objetos) para todos los puntos.
+        filas, columnas, dentro = self._indices_de_celdas(xs, ys)
+        posiciones = np.zeros(len(filas), dtype=np.int32)
+        posiciones[dentro] = self.indices[filas[dentro], columnas[dentro]]
+        return self.paleta[posiciones]
+
+class EstadisticasDibujo:
+    # """
+    # Tiempos y número de llamadas de cada fase del dibujo ("transformacion", "contorno", "relleno",
+    # "cache", "pintado" en la rejilla y el framebuffer, y en FigurasCanvas "emision_tk" y
+    # "presentacion"), por tipo de figura, más un registro de cada redibujado
+    # con lo que tardó cada fase dentro de él. Sólo se mide cuando hay un objeto de estos activo: con
+    # estadisticas=None cada punto de medición es una comparación con None.
+
+    # :param max_redibujados: Cuántos redibujados recientes se conservan.
+    # """
+    def __init__(self, max_redibujados=1000):
+        self.tiempos = {}
+        self.llamadas = {}
+        self.redibujados = deque(maxlen=max_redibujados)
+        self._actual = None
+        self._profundidad = 0
+
+    def reiniciar(self):
+        self.tiempos.clear()
+        self.llamadas.clear()
+        self.redibujados.clear()
+        self._actual = None
+        self._profundidad = 0
+
+    def registrar(self, fase, tipo, segundos, llamadas=1):
+        clave = (fase, tipo)
+        self.tiempos[clave] = self.tiempos.get(clave, 0.0) + segundos
+        self.llamadas[clave] = self.llamadas.get(clave, 0) + llamadas
+        if self._actual is not None:
+            fases = self._actual["fases"]
+            fases[fase] = fases.get(fase, 0.0) + segundos
+
+    def marcar(self, fase, tipo, inicio):
+        # Registra el tiempo transcurrido desde inicio y devuelve el instante actual, para encadenar fases.
+        ahora = time.perf_counter()
+        self.registrar(fase, tipo, ahora - inicio)
+        return ahora
+
+    def iniciar_redibujado(self, operacion):
+        # Abre el registro de un redibujado; los anidados se cuentan dentro del más externo.
+        self._profundidad += 1
+        if self._profundidad == 1:
+            self._actual = {"operacion": operacion, "inicio": time.perf_counter(), "fases": {}}
+
+    def terminar_redibujado(self):
+        self._profundidad -= 1
+        if self._profundidad == 0 and self._actual is not None:
+            actual = self._actual
+            self._actual = None
+            self.redibujados.append({"operacion": actual["operacion"],
+                                     "segundos": time.perf_counter() - actual["inicio"],
+                                     "fases": actual["fases"]})
+
+    def resumen(self):
+        # Diccionario con los totales por fase y tipo de figura y los redibujados registrados.
+        fases = {}
+        for (fase, tipo), segundos in sorted(self.tiempos.items()):
+            fases.setdefault(fase, {})[tipo] = {"segundos": segundos, "llamadas": self.llamadas[(fase, tipo)]}
+        return {"fases": fases, "redibujados": list(self.redibujados)}
+
+    def volcar(self, archivo):
+        # Escribe el resumen como JSON en un archivo abierto o en la ruta indicada.
+        if isinstance(archivo, str):
+            with open(archivo, "w") as salida:
+                json.dump(self.resumen(), salida, indent=2)
+        else:
+            json.dump(self.resumen(), archivo, indent=2)
+
+class CacheRaster:
+    # """
+    # Caché LRU de rasters de figuras. Cada raster se guarda con sus celdas relativas al origen que
+    # da clave_raster, así que volver a dibujar una figura sin cambios (o sólo trasladada) es sumar
+    # ese origen a las celdas guardadas en lugar de volver a ejecutar bresenham y el relleno.
+    # Cuando los rasters guardados superan memoria_maxima se descartan los usados hace más tiempo.
+
+    # :param memoria_maxima: Bytes máximos que pueden ocupar los arreglos guardados.
+    # """
+    def __init__(self, memoria_maxima=16 * 1024 * 1024):
+        self.memoria_maxima = memoria_maxima
+        self.memoria = 0
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self._rasters = OrderedDict()
+
+    def limpiar(self):
+        # Descarta todos los rasters guardados (los contadores se conservan).
+        self._rasters.clear()
+        self.memoria = 0
+
+    def raster(self, figura, estadisticas=None):
+        # Igual que rasterizar_figura, pero usando el raster guardado si ya se calculó uno con la misma
+        # clave. Con estadisticas, un acierto cuenta como fase "cache" (incluye calcular la clave).
+        inicio = time.perf_counter() if estadisticas is not None else 0
+        clave, origen = clave_raster(figura)
+        if clave is None:
+            return rasterizar_figura(figura, estadisticas)
+        # Con un origen entero las celdas guardadas como enteros siguen siéndolo al trasladarlas
+        origen_x, origen_y = (int(valor) if float(valor).is_integer() else valor for valor in origen)
+        guardado = self._rasters.get(clave)
+        if guardado is not None:
+            self.aciertos += 1
+            self._rasters.move_to_end(clave)
+            capas = [(color, xs + origen_x, ys + origen_y) for color, xs, ys in guardado[0]]
+            if estadisticas is not None:
+                estadisticas.marcar("cache", type(figura).__name__, inicio)
+            return capas
+
+        self.fallos += 1
+        capas = rasterizar_figura(figura, estadisticas)
+        # Celdas en enteros de 32 bits cuando se puede: ocupan la mitad y se indexan sin dividir
+        relativas = [(color, _columna_compacta(xs - origen_x), _columna_compacta(ys - origen_y)) for color, xs, ys in capas]
+        tamano = sum(xs.nbytes + ys.nbytes for _, xs, ys in relativas)
+        if tamano <= self.memoria_maxima:
+            self._rasters[clave] = (relativas, tamano)
+            self.memoria += tamano
+            while self.memoria > self.memoria_maxima:
+                _, (_, tamano_viejo) = self._rasters.popitem(last=False)
+                self.memoria -= tamano_viejo
+                self.desalojos += 1
+        return capas
+
+class IndiceEspacial:
+    # """
+    # Índice de figuras sobre una cuadrícula uniforme de cubetas. Cada figura se registra en todas
+    # las cubetas que toca su caja (ampliada con un margen, porque colisiona_con_punto puede aceptar
+    # puntos un poco fuera de las celdas dibujadas), así que para un punto sólo hay que revisar las
+    # figuras de su cubeta. También recuerda el orden en que se registró cada figura para devolver
+    # los candidatos en el mismo orden que self.figuras.
+
+    # :param tamano_cubeta: Lado en píxeles de cada cubeta.
+    # :param margen: Píxeles que se agregan a cada lado de las cajas registradas.
+    # """
+    def __init__(self, tamano_cubeta=100, margen=10):
+        self.tamano_cubeta = tamano_cubeta
+        self.margen = margen
+        self._cubetas = {}
+        self._entradas = {}
+        self._siguiente_orden = 0
+
+    def limpiar(self):
+        self._cubetas = {}
+        self._entradas = {}
+        self._siguiente_orden = 0
+
+    def _cubetas_de_caja(self, caja):
+        x0, y0, x1, y1 = caja
+        tamano = self.tamano_cubeta
+        columnas = range(int((x0 - self.margen) // tamano), int((x1 + self.margen) // tamano) + 1)
+        filas = range(int((y0 - self.margen) // tamano), int((y1 + self.margen) // tamano) + 1)
+        return [(columna, fila) for columna in columnas for fila in filas]
+
+    def actualizar(self, figura, caja):
+        # Registra la figura con su caja nueva; si ya estaba, conserva su orden.
+        anterior = self._entradas.get(id(figura))
+        if anterior is None:
+            orden = self._siguiente_orden
+            self._siguiente_orden += 1
+        else:
+            orden = anterior[1]
+            self.quitar(figura)
+        if caja is None:
+            return
+        cubetas = self._cubetas_de_caja(caja)
+        for cubeta in cubetas:
+            self._cubetas.setdefault(cubeta, set()).add(id(figura))
+        self._entradas[id(figura)] = (figura, orden, cubetas, caja)
+
+    def quitar(self, figura):
+        entrada = self._entradas.pop(id(figura), None)
+        if entrada is None:
+            return
+        for cubeta in entrada[2]:
+            ids = self._cubetas[cubeta]
+            ids.discard(id(figura))
+            if not ids:
+                del self._cubetas[cubeta]
+
+    def candidatos(self, x, y):
+        # Figuras cuya caja (con margen) puede contener el punto (x, y), en orden de registro.
+        cubeta = (int(x // self.tamano_cubeta), int(y // self.tamano_cubeta))
+        margen = self.margen
+        entradas = []
+        for id_figura in self._cubetas.get(cubeta, ()):
+            entrada = self._entradas[id_figura]
+            x0, y0, x1, y1 = entrada[3]
+            if x0 - margen <= x < x1 + margen and y0 - margen <= y < y1 + margen:
+                entradas.append(entrada)
+        return [entrada[0] for entrada in sorted(entradas, key=lambda entrada: entrada[1])]
+
+    def en_caja(self, caja):
+        # Figuras cuya caja intersecta la caja dada, en orden de registro. Sólo se recorren las
+        # cubetas que cubren la caja, así que el costo depende del tamaño de la región y de lo que
+        # hay en ella, no del total de figuras.
+        x0, y0, x1, y1 = caja
+        tamano = self.tamano_cubeta
+        vistos = set()
+        entradas = []
+        for columna in range(int(x0 // tamano), int(x1 // tamano) + 1):
+            for fila in range(int(y0 // tamano), int(y1 // tamano) + 1):
+                for id_figura in self._cubetas.get((columna, fila), ()):
+                    if id_figura in vistos:
+                        continue
+                    vistos.add(id_figura)
+                    entrada = self._entradas[id_figura]
+                    if cajas_se_intersectan(entrada[3], caja):
+                        entradas.append(entrada)
+        return [entrada[0] for entrada in sorted(entradas, key=lambda entrada: entrada[1])]
+
+    def apiladas_encima(self, figuras):
+        # """
+        # Las figuras dadas y las que deben quedar encima de ellas: cada figura registrada después de
+        # otra de la lista, o de otra encontrada así, cuya caja toca la de esa otra. Son las que hay
+        # que volver a apilar, en orden, cuando las figuras dadas se dibujan de nuevo encima de todo.
+        # Sólo se consultan las cubetas de las cajas que se van encontrando.
+
+        # :param figuras: Figuras registradas en el índice.
+        # :return: Figuras en orden de registro, incluidas las dadas.
+        # """
+        entradas = [self._entradas[id(figura)] for figura in figuras]
+        vistas = set(id(figura) for figura in figuras)
+        pendientes = list(entradas)
+        while pendientes:
+            _, orden, _, caja = pendientes.pop()
+            for figura in self.en_caja(caja):
+                entrada = self._entradas[id(figura)]
+                if entrada[1] > orden and id(figura) not in vistas:
+                    vistas.add(id(figura))
+                    entradas.append(entrada)
+                    pendientes.append(entrada)
+        return [entrada[0] for entrada in sorted(entradas, key=lambda entrada: entrada[1])]
+
+class EscenaColumnar:
+    # """
+    # Copia columnar (estructura de arreglos) de una escena, para consultas sobre muchas figuras y
+    # muchos puntos a la vez sin recorrer objetos de Python: selección por rectángulo, análisis o
+    # pruebas de carga. Los cuadrados, triángulos y círculos se guardan en arreglos contiguos de
+    # NumPy con sus vértices ya escalados y rotados (los mismos que usa colisiona_con_punto), y las
+    # pruebas de contención replican el ray casting de Cuadrado y el test de áreas de Triangulo.
+    # Los polígonos, con distinta cantidad de vértices cada uno, se guardan en una lista junto a un
+    # arreglo con sus extremos: sólo los puntos dentro de esos extremos pasan por punto_en_poligono.
+    # No reemplaza a las clases de figuras: hay que llamar a actualizar cuando una figura cambia.
+
+    # :param figuras: Figuras de la escena, en orden de dibujo.
+    # """
+    def __init__(self, figuras=()):
+        self.figuras = []
+        self._filas = {}
+        filas = {Cuadrado: [], Triangulo: [], Circunferencia: [], Poligono: []}
+        orden = {Cuadrado: [], Triangulo: [], Circunferencia: [], Poligono: []}
+        for figura in figuras:
+            tipo = type(figura)
+            if tipo not in filas:
+                raise TypeError("EscenaColumnar no admite figuras de tipo {}".format(tipo.__name__))
+            self._filas[id(figura)] = (tipo, len(filas[tipo]))
+            filas[tipo].append(self._columnas(figura))
+            orden[tipo].append(len(self.figuras))
+            self.figuras.append(figura)
+        self.cuadrados = np.array(filas[Cuadrado], dtype=float).reshape(-1, 4, 2)
+        self.triangulos = np.array(filas[Triangulo], dtype=float).reshape(-1, 3, 2)
+        self.circulos = np.array(filas[Circunferencia], dtype=float).reshape(-1, 3)
+        self.poligonos = filas[Poligono]
+        # Extremos (x0, y0, x1, y1) de los vértices de cada polígono
+        self.extremos_poligonos = np.array([self._extremos(vertices) for vertices in self.poligonos],
+                                           dtype=float).reshape(-1, 4)
+        # Posición en la escena de cada fila de los arreglos anteriores
+        self._orden = {tipo: np.array(posiciones, dtype=np.int64) for tipo, posiciones in orden.items()}
+
+    @staticmethod
+    def _columnas(figura):
+        if isinstance(figura, Circunferencia):
+            return [figura.x, figura.y, figura.radio * figura.escala]
+        return figura.vertices_transformados()
+
+    @staticmethod
+    def _extremos(vertices):
+        return (*vertices.min(axis=0), *vertices.max(axis=0))
+
+    def actualizar(self, figura):
+        # Vuelve a copiar los datos de una figura que ya está en la escena y que cambió.
+        tipo, fila = self._filas[id(figura)]
+        if tipo is Poligono:
+            self.poligonos[fila] = self._columnas(figura)
+            self.extremos_poligonos[fila] = self._extremos(self.poligonos[fila])
+            return
+        arreglos = {Cuadrado: self.cuadrados, Triangulo: self.triangulos, Circunferencia: self.circulos}
+        arreglos[tipo][fila] = self._columnas(figura)
+
+    def contiene(self, xs, ys):
+        # """
+        # Prueba de contención por lotes.
+
+        # :param xs: Coordenadas x de los puntos.
+        # :param ys: Coordenadas y de los puntos.
+        # :return: Matriz booleana (puntos, figuras), con las figuras en el orden de la escena.
+        # """
+        xs = np.asarray(xs, dtype=float).reshape(-1, 1)
+        ys = np.asarray(ys, dtype=float).reshape(-1, 1)
+        resultado = np.zeros((len(xs), len(self.figuras)), dtype=bool)
+        resultado[:, self._orden[Cuadrado]] = self._contiene_cuadrados(xs, ys)
+        resultado[:, self._orden[Triangulo]] = self._contiene_triangulos(xs, ys)
+        resultado[:, self._orden[Circunferencia]] = self._contiene_circulos(xs, ys)
+        resultado[:, self._orden[Poligono]] = self._contiene_poligonos(xs, ys)
+        return resultado
+
+    def primera_figura(self, xs, ys, lote=1024):
+        # Índice en self.figuras de la primera figura que contiene cada punto (la que elegiría
+        # seleccionar_figura), o -1 si ninguna. Procesa los puntos en lotes para acotar la memoria.
+        xs, ys = np.asarray(xs, dtype=float).ravel(), np.asarray(ys, dtype=float).ravel()
+        indices = np.full(len(xs), -1, dtype=np.int64)
+        for inicio in range(0, len(xs), lote):
+            choques = self.contiene(xs[inicio:inicio + lote], ys[inicio:inicio + lote])
+            if choques.shape[1] == 0:
+                break
+            hay = choques.any(axis=1)
+            indices[inicio:inicio + lote][hay] = np.argmax(choques[hay], axis=1)
+        return indices
+
+    def en_caja(self, caja):
+        # Máscara de las figuras cuyos vértices (o círculo) intersectan la caja (x0, y0, x1, y1), para
+        # selección por rectángulo.
+        x0, y0, x1, y1 = caja
+        resultado = np.zeros(len(self.figuras), dtype=bool)
+        for tipo, vertices in ((Cuadrado, self.cuadrados), (Triangulo, self.triangulos)):
+            minimos, maximos = vertices.min(axis=1), vertices.max(axis=1)
+            resultado[self._orden[tipo]] = ((minimos[:, 0] < x1) & (x0 < maximos[:, 0])
+                                            & (minimos[:, 1] < y1) & (y0 < maximos[:, 1]))
+        cx, cy, radio = self.circulos.T
+        resultado[self._orden[Circunferencia]] = ((cx - radio < x1) & (x0 < cx + radio)
+                                                  & (cy - radio < y1) & (y0 < cy + radio))
+        px0, py0, px1, py1 = self.extremos_poligonos.T
+        resultado[self._orden[Poligono]] = (px0 < x1) & (x0 < px1) & (py0 < y1) & (y0 < py1)
+        return resultado
+
+    def _contiene_cuadrados(self, x, y):
+        # Ray casting de Cuadrado.colisiona_con_punto sobre todos los cuadrados a la vez.
+        p1 = self.cuadrados
+        p2 = np.roll(self.cuadrados, -1, axis=1)
+        intersecciones = np.zeros((len(x), len(p1)), dtype=np.int64)
+        for lado in range(p1.shape[1]):
+            p1_x, p1_y = p1[:, lado, 0], p1[:, lado, 1]
+            p2_x, p2_y = p2[:, lado, 0], p2[:, lado, 1]
+            cruza = (y > np.minimum(p1_y, p2_y)) & (y <= np.maximum(p1_y, p2_y)) & (x <= np.maximum(p1_x, p2_x))
+            # En los lados horizontales cruza siempre es falso, así que la división no importa
+            alto = np.where(p1_y != p2_y, p2_y - p1_y, 1)
+            x_intersect = (y - p1_y) * (p2_x - p1_x) / alto + p1_x
+            intersecciones += cruza & ((p1_x == p2_x) | (x <= x_intersect))
+        return intersecciones % 2 == 1
+
+    def _contiene_triangulos(self, x, y):
+        # Test de áreas de Triangulo.colisiona_con_punto sobre todos los triángulos a la vez.
+        (x1, y1), (x2, y2), (x3, y3) = [self.triangulos[:, vertice].T for vertice in range(3)]
+        area_total = area(x1, y1, x2, y2, x3, y3)
+        area1 = area(x, y, x2, y2, x3, y3)
+        area2 = area(x1, y1, x, y, x3, y3)
+        area3 = area(x1, y1, x2, y2, x, y)
+        return np.abs(area_total - (area1 + area2 + area3)) < 0.1
+
+    def _contiene_circulos(self, x, y):
+        cx, cy, radio = self.circulos.T
+        return np.sqrt((x - cx) ** 2 + (y - cy) ** 2) <= radio
+
+    def _contiene_poligonos(self, x, y):
+        # Descarta por los extremos de todos los polígonos a la vez y hace el ray casting sólo con los
+        # puntos que quedan dentro de los de cada uno.
+        x0, y0, x1, y1 = self.extremos_poligonos.T
+        candidatos = (x0 <= x) & (x <= x1) & (y0 <= y) & (y <= y1)
+        resultado = np.zeros_like(candidatos)
+        x, y = x.ravel(), y.ravel()
+        for columna in np.flatnonzero(candidatos.any(axis=0)):
+            puntos = candidatos[:, columna]
+            resultado[puntos, columna] = punto_en_poligono(self.poligonos[columna], x[puntos], y[puntos])
+        return resultado
+
+# Nombres de color de Tk que usa la aplicación, con los valores RGB de Tk 8.6
+COLORES_NOMBRADOS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "lime": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "navy": (0, 0, 128),
+    "yellow": (255, 255, 0),
+    "orange": (255, 165, 0),
+    "purple": (128, 0, 128),
+    "magenta": (255, 0, 255),
+    "cyan": (0, 255, 255),
+    "teal": (0, 128, 128),
+    "olive": (128, 128, 0),
+    "maroon": (128, 0, 0),
+    "brown": (165, 42, 42),
+    "pink": (255, 192, 203),
+    "gray": (128, 128, 128),
+    "grey": (128, 128, 128),
+    "silver": (192, 192, 192),
+}
+
+def color_a_rgb(color):
+    # """
+    # Convierte un color de Tk a una tupla RGB de 8 bits sin necesitar una ventana: acepta "#rgb",
+    # "#rrggbb", "#rrrgggbbb", "#rrrrggggbbbb" y los nombres de COLORES_NOMBRADOS (sin importar
+    # mayúsculas).
+
+    # :param color: Color a convertir.
+    # :return: Tupla (r, g, b).
+    # """
+    if color.startswith("#") and len(color) in (4, 7, 10, 13):
+        # Como en Tk, los dígitos son los bits más significativos de cada componente de 16 bits
+        digitos = (len(color) - 1) // 3
+        componentes = [int(color[1 + k * digitos:1 + (k + 1) * digitos], 16) for k in range(3)]
+        return tuple((componente << (16 - 4 * digitos)) >> 8 for componente in componentes)
+    rgb = COLORES_NOMBRADOS.get(color.lower())
+    if rgb is None:
+        raise ValueError("Color desconocido: {}".format(color))
+    return rgb
+
+class MotorRaster:
+    # """
+    # Motor de dibujo de escenas sin Tk. Rasteriza figuras en una RejillaColores y, si se pide, en un
+    # Framebuffer, y lleva la caja dibujada de cada figura, el índice espacial y la caché de rasters.
+    # La rejilla y el framebuffer cubren una ventana del mundo, que empieza en (0, 0) y se puede
+    # mover y cambiar de tamaño con fijar_ventana; sólo se rasterizan las figuras cuya caja toca la
+    # ventana, pero se guarda la caja de todas.
+    # Ofrece la misma interfaz de dibujo que FigurasCanvas (pintar_celdas, pintar_spans, etiqueta_de,
+    # obtener_colores_pixeles), así que Figura.colorear y flood_fill_puntos funcionan sobre él.
+
+    # :param ancho: Ancho de la escena en píxeles.
+    # :param alto: Alto de la escena en píxeles.
+    # :param fondo: Color de fondo.
+    # :param tamano_celda: Tamaño en píxeles de cada celda; por defecto TAMANO_CELDA, que es el
+    #                      único con el que se rasterizan las figuras (ver fijar_tamano_celda).
+    # :param con_framebuffer: Si es False sólo se mantiene la rejilla de colores (el modo Tk de
+    #                         FigurasCanvas dibuja los píxeles por su cuenta).
+    # :param memoria_cache_raster: Bytes máximos de la caché de rasters.
+    # :param convertir_color: Función que convierte un color a (r, g, b); por defecto color_a_rgb.
+    # """
+    def __init__(self, ancho, alto, fondo="#dde0ef", tamano_celda=None, con_framebuffer=True,
+                 memoria_cache_raster=16 * 1024 * 1024, convertir_color=color_a_rgb):
+        tamano_celda = tamano_celda or TAMANO_CELDA
+        if tamano_celda != TAMANO_CELDA:
+            raise ValueError("el tamaño de celda del motor ({}) no es TAMANO_CELDA ({}); usar fijar_tamano_celda".format(
+                tamano_celda, TAMANO_CELDA))
+        self.ancho = ancho
+        self.alto = alto
+        self.origen_x = 0
+        self.origen_y = 0
+        self.fondo = fondo
+        self.rejilla = RejillaColores(ancho, alto, tamano_celda)
+        self.framebuffer = Framebuffer(ancho, alto, tamano_celda) if con_framebuffer else None
+        self.convertir_color = convertir_color
+        self._colores_rgb = {}
+        # Última caja dibujada de cada figura, por id, para saber qué región ensucia un cambio
+        self.cajas = {}
+        # Índice espacial de esas mismas cajas para seleccionar figuras con un clic
+        self.indice = IndiceEspacial()
+        self.cache_raster = CacheRaster(memoria_cache_raster)
+        # EstadisticasDibujo activas, o None para no medir nada
+        self.estadisticas = None
+        # Copia (indices, pixeles) de la escena sin la figura en interacción (ver fijar_fondo)
+        self.fondo_estatico = None
+        self.limpiar()
+
+    def ventana(self):
+        # Caja (x0, y0, x1, y1) del mundo que cubren la rejilla y el framebuffer.
+        return (self.origen_x, self.origen_y, self.origen_x + self.ancho, self.origen_y + self.alto)
+
+    def visible(self, caja):
+        # Indica si una caja toca la ventana.
+        return caja is not None and cajas_se_intersectan(caja, self.ventana())
+
+    def fijar_ventana(self, origen_x, origen_y, ancho=None, alto=None):
+        # """
+        # Mueve la ventana al origen dado (ajustado a la cuadrícula) y, si se indica, le cambia el
+        # tamaño; en ese caso la rejilla y el framebuffer se crean de nuevo. No redibuja nada: después
+        # hay que llamar a dibujar_visibles.
+
+        # :return: True si la rejilla y el framebuffer son arreglos nuevos.
+        # """
+        tamano = self.rejilla.tamano_celda
+        self.origen_x = int(origen_x // tamano) * tamano
+        self.origen_y = int(origen_y // tamano) * tamano
+        self.fondo_estatico = None
+        nuevos = (ancho is not None and ancho != self.ancho) or (alto is not None and alto != self.alto)
+        if nuevos:
+            self.ancho = ancho if ancho is not None else self.ancho
+            self.alto = alto if alto is not None else self.alto
+            self.rejilla = RejillaColores(self.ancho, self.alto, tamano, self.origen_x, self.origen_y)
+            if self.framebuffer is not None:
+                self.framebuffer = Framebuffer(self.ancho, self.alto, tamano, self.origen_x, self.origen_y)
+        for arreglo in (self.rejilla, self.framebuffer):
+            if arreglo is not None:
+                arreglo.origen_x, arreglo.origen_y = self.origen_x, self.origen_y
+        return nuevos
+
+    def cambiar_tamano_celda(self, con_framebuffer=None):
+        # """
+        # Vuelve a crear la rejilla (y el framebuffer) con el TAMANO_CELDA actual, después de un
+        # fijar_tamano_celda, y deja la escena vacía; las figuras se vuelven a dibujar después.
+
+        # :param con_framebuffer: Si se indica, agrega o quita el framebuffer al mismo tiempo.
+        # """
+        if con_framebuffer is None:
+            con_framebuffer = self.framebuffer is not None
+        tamano = TAMANO_CELDA
+        self.origen_x = self.origen_x // tamano * tamano
+        self.origen_y = self.origen_y // tamano * tamano
+        self.rejilla = RejillaColores(self.ancho, self.alto, tamano, self.origen_x, self.origen_y)
+        self.framebuffer = Framebuffer(self.ancho, self.alto, tamano, self.origen_x, self.origen_y) if con_framebuffer else None
+        self.cache_raster.limpiar()
+        self.limpiar()
+
+    def rgb(self, color):
+        # Convierte un color a una tupla RGB de 8 bits, con memoria de los ya vistos.
+        rgb = self._colores_rgb.get(color)
+        if rgb is None:
+            rgb = self.convertir_color(color)
+            self._colores_rgb[color] = rgb
+        return rgb
+
+    def obtener_color_pixel(self, x, y):
+        return self.rejilla.color_en(x, y)
+
+    def obtener_colores_pixeles(self, xs, ys):
+        return self.rejilla.colores_en(xs, ys)
+
+    def etiqueta_de(self, figura):
+        # Etiqueta con la que FigurasCanvas agrupa los elementos de Tk de una figura.
+        return "figura{}".format(id(figura))
+
+    def pintar_celdas(self, xs, ys, color, etiqueta=None):
+        # Pinta celdas sueltas en la rejilla y en el framebuffer. La etiqueta sólo tiene sentido en
+        # Tk y aquí se ignora. Los dos cubren la misma ventana, así que los índices se calculan una vez.
+        filas, columnas, dentro = self.rejilla._indices_de_celdas(xs, ys)
+        filas, columnas = filas[dentro], columnas[dentro]
+        self.rejilla.pintar_posiciones(filas, columnas, color)
+        if self.framebuffer is not None:
+            self.framebuffer.pintar_posiciones(filas, columnas, self.rgb(color))
+
+    def pintar_spans(self, ys, xs_inicio, xs_fin, color, etiqueta=None):
+        # Pinta tramos horizontales de celdas (ver celdas_de_spans).
+        self.pintar_celdas(*celdas_de_spans(ys, xs_inicio, xs_fin), color)
+
+    def limpiar(self):
+        # Deja la escena vacía: fondo en la rejilla y el framebuffer, sin cajas ni índice.
+        self.fondo_estatico = None
+        self.rejilla.limpiar()
+        self.cajas.clear()
+        self.indice.limpiar()
+        if self.framebuffer is not None:
+            self.framebuffer.limpiar(self.rgb(self.fondo))
+
+    def raster(self, figura):
+        # Capas (color, xs, ys) de la figura, pasando por la caché de rasters.
+        return self.cache_raster.raster(figura, self.estadisticas)
+
+    def guardar_caja(self, figura, caja):
+        # Guarda la caja dibujada de una figura (o la olvida si es None) y actualiza el índice espacial.
+        if caja is None:
+            self.cajas.pop(id(figura), None)
+            self.indice.quitar(figura)
+        else:
+            self.cajas[id(figura)] = caja
+            self.indice.actualizar(figura, caja)
+
+    def dibujar_figura(self, figura):
+        # Rasteriza la figura (relleno y borde) y la pinta encima de lo que ya hay. Si queda fuera
+        # de la ventana sólo se guarda su caja.
+        caja = figura.caja_delimitadora()
+        if not self.visible(caja):
+            self.guardar_caja(figura, caja)
+            return
+        capas = self.raster(figura)
+        inicio = time.perf_counter() if self.estadisticas is not None else 0
+        for color, xs, ys in capas:
+            self.pintar_celdas(xs, ys, color)
+        if self.estadisticas is not None:
+            self.estadisticas.marcar("pintado", type(figura).__name__, inicio)
+        self.guardar_caja(figura, caja)
+
+    def dibujar_visibles(self):
+        # """
+        # Vuelve a pintar la ventana con las figuras cuyas cajas guardadas la tocan, en orden, sin
+        # recorrer el resto de la escena. Sirve después de mover la ventana o cambiarle el tamaño.
+
+        # :return: Figuras pintadas, en orden.
+        # """
+        self.fondo_estatico = None
+        self.rejilla.limpiar()
+        if self.framebuffer is not None:
+            self.framebuffer.limpiar(self.rgb(self.fondo))
+        visibles = self.indice.en_caja(self.ventana())
+        for figura in visibles:
+            for color, xs, ys in self.raster(figura):
+                self.pintar_celdas(xs, ys, color)
+        return visibles
+
+    def repintar_region(self, caja, rasters=None, excluida=None):
+        # """
+        # Limpia la caja y vuelve a pintar, en orden y recortadas a ella, las figuras que la
+        # intersectan. Las figuras salen del índice espacial, así que el costo depende de lo que hay
+        # en la caja y no del total de la escena.
+
+        # :param caja: Región (x0, y0, x1, y1) en píxeles, con x1 e y1 exclusivos.
+        # :param rasters: Rasters ya calculados, por id de figura, para no repetirlos.
+        # :param excluida: Figura que no se pinta aunque toque la caja, o None.
+        # """
+        caja = intersectar_cajas(caja, self.ventana())
+        if caja is None:
+            return
+        rasters = rasters or {}
+        self.rejilla.limpiar(caja)
+        if self.framebuffer is not None:
+            self.framebuffer.limpiar(self.rgb(self.fondo), caja)
+        x0, y0, x1, y1 = caja
+        for figura in self.indice.en_caja(caja):
+            if figura is excluida:
+                continue
+            raster = rasters.get(id(figura))
+            if raster is None:
+                raster = self.raster(figura)
+            inicio = time.perf_counter() if self.estadisticas is not None else 0
+            for color, xs, ys in raster:
+                dentro = (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1)
+                self.pintar_celdas(xs[dentro], ys[dentro], color)
+            if self.estadisticas is not None:
+                self.estadisticas.marcar("pintado", type(figura).__name__, inicio)
+
+    def fijar_fondo(self, figura):
+        # """
+        # Congela como capa de fondo la escena sin la figura indicada: se quita la figura de su caja
+        # repintando las demás y se guarda una copia de la rejilla y del framebuffer. Mientras la
+        # figura cambia, restaurar_fondo repone el fondo de la zona que ocupaba sin rasterizar nada.
+
+        # :param figura: Figura que queda fuera del fondo.
+        # """
+        caja = self.cajas.get(id(figura))
+        if caja is not None:
+            self.repintar_region(caja, excluida=figura)
+        pixeles = self.framebuffer.pixeles.copy() if self.framebuffer is not None else None
+        self.fondo_estatico = (self.rejilla.indices.copy(), pixeles)
+
+    def restaurar_fondo(self, caja):
+        # Copia la capa de fondo de fijar_fondo sobre las celdas de la caja.
+        indices, pixeles = self.fondo_estatico
+        rebanadas = self.rejilla.rebanadas(caja)
+        self.rejilla.indices[rebanadas] = indices[rebanadas]
+        if pixeles is not None:
+            self.framebuffer.pixeles[rebanadas] = pixeles[rebanadas]
+
+    def soltar_fondo(self):
+        # Descarta la capa de fondo.
+        self.fondo_estatico = None
+
+    def renderizar(self, figuras):
+        # Dibuja desde cero las figuras dadas y devuelve la imagen resultante (ver imagen).
+        if self.estadisticas is not None:
+            self.estadisticas.iniciar_redibujado("renderizar")
+        self.limpiar()
+        transformar_figuras(figuras)
+        for figura in figuras:
+            self.dibujar_figura(figura)
+        if self.estadisticas is not None:
+            self.estadisticas.terminar_redibujado()
+        return self.imagen()
+
+    def imagen(self, por_celda=False):
+        # """
+        # Contenido del framebuffer como arreglo RGB uint8.
+
+        # :param por_celda: Si es True se devuelve un píxel por celda, (filas, columnas, 3); si no, la
+        #                   imagen ampliada al tamaño real de la escena, (alto, ancho, 3).
+        # """
+        if self.framebuffer is None:
+            raise ValueError("El motor se creó sin framebuffer")
+        pixeles = self.framebuffer.pixeles
+        if por_celda:
+            return pixeles.copy()
+        tamano = self.framebuffer.tamano_celda
+        return np.repeat(np.repeat(pixeles, tamano, axis=0), tamano, axis=1)[:self.alto, :self.ancho]
+
+def renderizar_figuras(figuras, ancho, alto, fondo="#dde0ef", tamano_celda=None):
+    # Dibuja una lista de figuras sin Tk y devuelve la imagen RGB (alto, ancho, 3) resultante.
+    return MotorRaster(ancho, alto, fondo, tamano_celda).renderizar(figuras)
+
+# Códigos de tipo de figura en los archivos de escena
+TIPOS_ESCENA = (Cuadrado, Triangulo, Circunferencia, Poligono)
+
+def _columna_compacta(valores):
+    # Guarda como enteros las columnas cuyos valores son todos enteros, para no convertir a float las
+    # coordenadas de la cuadrícula al cargar.
+    if np.all(np.isfinite(valores)) and np.all(valores == np.round(valores)) and np.all(np.abs(valores) < 2 ** 31):
+        return valores.astype(np.int32)
+    return valores
+
+def guardar_escena(archivo, figuras, comprimir=False):
+    # """
+    # Guarda figuras en un archivo .npz columnar: un arreglo por atributo (tipo, vértices, centro,
+    # radio, escala, rotación, grosor) y los colores y tipos de línea como índices a una paleta.
+    # Los vértices son los originales, sin escalar ni rotar, así que al cargar la escena las figuras
+    # quedan exactamente igual. Los de los polígonos, que tienen distinta cantidad, van todos
+    # seguidos en vertices_poligonos y lados_poligonos dice cuántos tiene cada uno.
+
+    # :param archivo: Ruta o archivo abierto en modo binario.
+    # :param figuras: Figuras a guardar (Cuadrado, Triangulo, Circunferencia o Poligono).
+    # :param comprimir: Si es True se usa np.savez_compressed (más chico, más lento).
+    # """
+    cantidad = len(figuras)
+    tipos = np.empty(cantidad, dtype=np.uint8)
+    vertices = np.zeros((cantidad, 4, 2))
+    centros = np.empty((cantidad, 2))
+    radios = np.zeros(cantidad)
+    escalas = np.empty(cantidad)
+    rotaciones = np.empty(cantidad)
+    grosores = np.empty(cantidad)
+    vertices_poligonos = []
+    paleta_colores, colores = np.unique(np.array([str(figura.color) for figura in figuras] or [""]), return_inverse=True)
+    paleta_lineas, lineas = np.unique(np.array([str(figura.tipo_linea) for figura in figuras] or [""]), return_inverse=True)
+    for posicion, figura in enumerate(figuras):
+        tipo = type(figura)
+        if tipo not in TIPOS_ESCENA:
+            raise TypeError("No se puede guardar una figura de tipo {}".format(tipo.__name__))
+        tipos[posicion] = TIPOS_ESCENA.index(tipo)
+        if tipo is Cuadrado:
+            vertices[posicion] = ((figura.x1, figura.y1), (figura.x2, figura.y2), (figura.x3, figura.y3), (figura.x4, figura.y4))
+        elif tipo is Triangulo:
+            vertices[posicion, :3] = ((figura.x1, figura.y1), (figura.x2, figura.y2), (figura.x3, figura.y3))
+        elif tipo is Circunferencia:
+            radios[posicion] = figura.radio
+        else:
+            vertices_poligonos.append(figura.vertices)
+        centros[posicion] = (figura.x, figura.y)
+        escalas[posicion] = figura.escala
+        rotaciones[posicion] = figura.rotacion
+        grosores[posicion] = figura.grosor
+    lados_poligonos = np.array([len(propios) for propios in vertices_poligonos], dtype=np.int64)
+    vertices_poligonos = np.concatenate(vertices_poligonos) if vertices_poligonos else np.zeros((0, 2))
+    guardar = np.savez_compressed if comprimir else np.savez
+    guardar(archivo, version=np.array(1), tipos=tipos, vertices=_columna_compacta(vertices),
+            centros=_columna_compacta(centros), radios=_columna_compacta(radios), escalas=_columna_compacta(escalas),
+            rotaciones=_columna_compacta(rotaciones), grosores=_columna_compacta(grosores),
+            colores=colores.ravel()[:cantidad].astype(np.int32), paleta_colores=paleta_colores,
+            lineas=lineas.ravel()[:cantidad].astype(np.int32), paleta_lineas=paleta_lineas,
+            vertices_poligonos=_columna_compacta(vertices_poligonos), lados_poligonos=lados_poligonos)
+
+def cargar_escena(archivo):
+    # """
+    # Carga las figuras guardadas con guardar_escena, sin dibujarlas. Para que cargar cientos de
+    # miles de figuras sea rápido, los atributos se asignan directamente en lugar de pasar por los
+    # constructores.
+
+    # :param archivo: Ruta o archivo abierto en modo binario.
+    # :return: Lista de figuras en el mismo orden en que se guardaron.
+    # """
+    with np.load(archivo) as datos:
+        columnas = {nombre: datos[nombre] for nombre in datos.files}
+    paleta_colores = columnas["paleta_colores"].tolist()
+    paleta_lineas = columnas["paleta_lineas"].tolist()
+    # Se pasa a listas de Python de una vez para no convertir valor por valor dentro del ciclo
+    tipos = columnas["tipos"].tolist()
+    vertices = columnas["vertices"].reshape(-1, 8).tolist()
+    centros = columnas["centros"].tolist()
+    radios = columnas["radios"].tolist()
+    escalas = columnas["escalas"].tolist()
+    rotaciones = columnas["rotaciones"].tolist()
+    grosores = columnas["grosores"].tolist()
+    colores = [paleta_colores[color] for color in columnas["colores"].tolist()]
+    lineas = [paleta_lineas[linea] for linea in columnas["lineas"].tolist()]
+    # Los archivos anteriores a Poligono no tienen estas columnas
+    vertices_poligonos = columnas.get("vertices_poligonos", np.zeros((0, 2)))
+    lados_poligonos = columnas.get("lados_poligonos", np.zeros(0, dtype=np.int64))
+    inicios_poligonos = (np.cumsum(lados_poligonos) - lados_poligonos).tolist()
+    lados_poligonos = lados_poligonos.tolist()
+    poligono = 0
+    nuevo = object.__new__
+    figuras = []
+    for posicion, tipo in enumerate(tipos):
+        if tipo == 0:
+            figura = nuevo(Cuadrado)
+            figura.x, figura.y, figura.x2, figura.y2, figura.x3, figura.y3, figura.x4, figura.y4 = vertices[posicion]
+        elif tipo == 1:
+            figura = nuevo(Triangulo)
+            figura.x, figura.y, figura.x2, figura.y2, figura.x3, figura.y3 = vertices[posicion][:6]
+        elif tipo == 2:
+            figura = nuevo(Circunferencia)
+            figura.x, figura.y = centros[posicion]
+            figura.radio = radios[posicion]
+        else:
+            figura = nuevo(Poligono)
+            inicio = inicios_poligonos[poligono]
+            figura.fijar_vertices(vertices_poligonos[inicio:inicio + lados_poligonos[poligono]])
+            poligono += 1
+        figura.color = colores[posicion]
+        figura.grosor = grosores[posicion]
+        figura.tipo_linea = lineas[posicion]
+        figura.escala = escalas[posicion]
+        figura.borde_seleccionado = False
+        figura.rotacion = rotaciones[posicion]
+        figuras.append(figura)
+    return figuras
+
+def figura_a_dict(figura):
+    # Atributos de una figura como diccionario serializable a JSON (vértices originales, sin transformar).
+    datos = {"tipo": type(figura).__name__, "x": figura.x, "y": figura.y, "color": figura.color,
+             "grosor": figura.grosor, "tipo_linea": figura.tipo_linea, "escala": figura.escala,
+             "rotacion": figura.rotacion}
+    if isinstance(figura, Cuadrado):
+        datos["vertices"] = [[figura.x1, figura.y1], [figura.x2, figura.y2], [figura.x3, figura.y3], [figura.x4, figura.y4]]
+    elif isinstance(figura, Triangulo):
+        datos["vertices"] = [[figura.x1, figura.y1], [figura.x2, figura.y2], [figura.x3, figura.y3]]
+    elif isinstance(figura, Circunferencia):
+        datos["radio"] = figura.radio
+    elif isinstance(figura, Poligono):
+        datos["vertices"] = figura.vertices.tolist()
+    else:
+        raise TypeError("No se puede guardar una figura de tipo {}".format(type(figura).__name__))
+    return datos
+
+def figura_desde_dict(datos):
+    # Crea la figura descrita por un diccionario de figura_a_dict.
+    color, grosor, tipo_linea = datos["color"], datos.get("grosor", 1), datos.get("tipo_linea", "solid")
+    if datos["tipo"] == "Cuadrado":
+        (x1, y1), (x2, y2), (x3, y3), (x4, y4) = datos["vertices"]
+        figura = Cuadrado(x1, y1, x2, y2, x3, y3, x4, y4, color, grosor, tipo_linea)
+    elif datos["tipo"] == "Triangulo":
+        (x1, y1), (x2, y2), (x3, y3) = datos["vertices"]
+        figura = Triangulo(x1, y1, x2, y2, x3, y3, color, grosor, tipo_linea)
+    elif datos["tipo"] == "Circunferencia":
+        figura = Circunferencia(datos["x"], datos["y"], datos["radio"], color, grosor, tipo_linea)
+    elif datos["tipo"] == "Poligono":
+        figura = Poligono(datos["vertices"], color, grosor, tipo_linea)
+    else:
+        raise ValueError("Tipo de figura desconocido: {}".format(datos["tipo"]))
+    figura.escala = datos.get("escala", 1)
+    figura.rotacion = datos.get("rotacion", 0)
+    return figura
+
+def guardar_figuras_jsonl(archivo, figuras):
+    # Escribe una figura por línea en formato JSON (ver figura_a_dict).
+    with open(archivo, "w") as salida:
+        for figura in figuras:
+            salida.write(json.dumps(figura_a_dict(figura)) + "\n")
+
+def leer_figuras_jsonl(archivo):
+    # Generador que lee las figuras de un archivo de guardar_figuras_jsonl a medida que se piden,
+    # sin cargar el archivo completo. Las líneas vacías se ignoran.
+    with open(archivo) as entrada:
+        for linea in entrada:
+            if linea.strip():
+                yield figura_desde_dict(json.loads(linea))
+
+def leer_figuras(archivo):
+    # Lee todas las figuras de un archivo de escena, .npz (guardar_escena) o .jsonl (guardar_figuras_jsonl).
+    if str(archivo).endswith(".jsonl"):
+        return list(leer_figuras_jsonl(archivo))
+    return cargar_escena(archivo)
+
+def _bloque_png(tipo, datos):
+    return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(">I", zlib.crc32(tipo + datos))
+
+def escribir_imagen(archivo, imagen):
+    # """
+    # Escribe una imagen RGB uint8 (alto, ancho, 3) como PNG o PPM binario, según la extensión del
+    # archivo. El PNG se arma a mano con zlib para no depender de bibliotecas de imágenes.
+
+    # :param archivo: Ruta terminada en .png o .ppm.
+    # :param imagen: Arreglo como el que devuelve MotorRaster.imagen.
+    # """
+    alto, ancho = imagen.shape[:2]
+    if str(archivo).endswith(".ppm"):
+        contenido = "P6 {} {} 255 ".format(ancho, alto).encode() + np.ascontiguousarray(imagen).tobytes()
+    elif str(archivo).endswith(".png"):
+        # Cada fila va precedida del tipo de filtro, 0 (sin filtro)
+        filas = np.concatenate([np.zeros((alto, 1), dtype=np.uint8), imagen.reshape(alto, ancho * 3)], axis=1)
+        contenido = (b"\x89PNG\r\n\x1a\n"
+                     + _bloque_png(b"IHDR", struct.pack(">IIBBBBB", ancho, alto, 8, 2, 0, 0, 0))
+                     + _bloque_png(b"IDAT", zlib.compress(filas.tobytes(), 6))
+                     + _bloque_png(b"IEND", b""))
+    else:
+        raise ValueError("Formato de imagen no soportado: {}".format(archivo))
+    with open(archivo, "wb") as salida:
+        salida.write(contenido)
+
+def renderizar_archivo(tarea):
+    # """
+    # Dibuja sin Tk la escena de un archivo y escribe la imagen. Recibe una sola tupla para poder
+    # usarse directamente con Pool.imap_unordered.
+
+    # :param tarea: (entrada, salida, ancho, alto, tamano_celda).
+    # :return: (entrada, salida, número de figuras, segundos).
+    # """
+    entrada, salida, ancho, alto, tamano_celda = tarea
+    inicio = time.perf_counter()
+    fijar_tamano_celda(tamano_celda)
+    figuras = leer_figuras(entrada)
+    escribir_imagen(salida, renderizar_figuras(figuras, ancho, alto))
+    return entrada, salida, len(figuras), time.perf_counter() - inicio
+
+# Estado de cada proceso de RasterizadorParalelo: vistas de la memoria compartida y una caché propia
+_trabajador = {}
+
+def _iniciar_trabajador(nombre_pixeles, nombre_indices, filas, columnas, tamano_celda, memoria_cache_raster):
+    memoria_pixeles = shared_memory.SharedMemory(name=nombre_pixeles)
+    memoria_indices = shared_memory.SharedMemory(name=nombre_indices)
+    _trabajador["memorias"] = (memoria_pixeles, memoria_indices)
+    _trabajador["pixeles"] = np.ndarray((filas, columnas, 3), dtype=np.uint8, buffer=memoria_pixeles.buf)
+    _trabajador["indices"] = np.ndarray((filas, columnas), dtype=np.int32, buffer=memoria_indices.buf)
+    _trabajador["tamano_celda"] = tamano_celda
+    # Con el método spawn el proceso no hereda el tamaño de celda del que lo creó
+    fijar_tamano_celda(tamano_celda)
+    _trabajador["cache"] = CacheRaster(memoria_cache_raster)
+
+def _pintar_tesela(tarea):
+    # Rasteriza en orden las figuras de una tesela y escribe sólo las celdas que caen dentro de ella.
+    caja, figuras, colores, (origen_x, origen_y) = tarea
+    pixeles, indices, tamano = _trabajador["pixeles"], _trabajador["indices"], _trabajador["tamano_celda"]
+    x0, y0, x1, y1 = caja
+    for figura in figuras:
+        for color, xs, ys in _trabajador["cache"].raster(figura):
+            dentro = (xs >= x0) & (xs < x1) & (ys >= y0) & (ys < y1)
+            filas, columnas, validas = indices_de_celdas(xs[dentro], ys[dentro], tamano, *indices.shape, origen_x, origen_y)
+            rgb, posicion = colores[color]
+            pixeles[filas[validas], columnas[validas]] = rgb
+            indices[filas[validas], columnas[validas]] = posicion
+
+class RasterizadorParalelo:
+    # """
+    # Redibujado completo de un MotorRaster repartido entre varios procesos. El canvas se divide en
+    # teselas y a cada una se le asignan, en orden, las figuras cuya caja la toca; cada proceso
+    # rasteriza sus teselas directamente en el framebuffer y la rejilla de colores del motor, que pasan
+    # a vivir en memoria compartida (multiprocessing.shared_memory). Como cada celda pertenece a una
+    # sola tesela y ahí las figuras se pintan en el orden de la escena, el resultado es idéntico al de
+    # MotorRaster.renderizar. Una figura que toca varias teselas se rasteriza una vez por tesela.
+
+    # :param motor: MotorRaster con framebuffer cuyo contenido se va a calcular en paralelo.
+    # :param procesos: Número de procesos; por defecto, los núcleos disponibles.
+    # :param tamano_tesela: (ancho, alto) en píxeles de cada tesela, múltiplos del tamaño de celda.
+    # :param memoria_cache_raster: Bytes de la caché de rasters de cada proceso.
+    # """
+    def __init__(self, motor, procesos=None, tamano_tesela=(200, 150), memoria_cache_raster=16 * 1024 * 1024):
+        if motor.framebuffer is None:
+            raise ValueError("RasterizadorParalelo necesita un motor con framebuffer")
+        self.motor = motor
+        self.procesos = procesos or multiprocessing.cpu_count()
+        self.tamano_tesela = tamano_tesela
+        framebuffer, rejilla = motor.framebuffer, motor.rejilla
+        self._memoria_pixeles = shared_memory.SharedMemory(create=True, size=framebuffer.pixeles.nbytes)
+        self._memoria_indices = shared_memory.SharedMemory(create=True, size=rejilla.indices.nbytes)
+        # El motor pasa a usar las vistas de memoria compartida, así que sus lecturas ven lo que escriben los procesos
+        pixeles = np.ndarray(framebuffer.pixeles.shape, dtype=np.uint8, buffer=self._memoria_pixeles.buf)
+        indices = np.ndarray(rejilla.indices.shape, dtype=np.int32, buffer=self._memoria_indices.buf)
+        pixeles[...] = framebuffer.pixeles
+        indices[...] = rejilla.indices
+        framebuffer.pixeles = pixeles
+        rejilla.indices = indices
+        self._pool = multiprocessing.Pool(self.procesos, _iniciar_trabajador,
+                                          (self._memoria_pixeles.name, self._memoria_indices.name, framebuffer.filas,
+                                           framebuffer.columnas, framebuffer.tamano_celda, memoria_cache_raster))
+
+    def teselas(self):
+        # Cajas (x0, y0, x1, y1) de las teselas que cubren la ventana del motor.
+        ancho_tesela, alto_tesela = self.tamano_tesela
+        x0, y0, x1, y1 = self.motor.ventana()
+        return [(x, y, x + ancho_tesela, y + alto_tesela)
+                for y in range(y0, y1, alto_tesela) for x in range(x0, x1, ancho_tesela)]
+
+    def renderizar(self, figuras):
+        # Dibuja desde cero las figuras, igual que MotorRaster.renderizar, y devuelve la imagen.
+        self.dibujar(figuras)
+        return self.motor.imagen()
+
+    def dibujar(self, figuras):
+        # Dibuja desde cero las figuras en el framebuffer y la rejilla del motor.
+        motor = self.motor
+        motor.limpiar()
+        transformar_figuras(figuras)
+        cajas = []
+        colores = {}
+        for figura in figuras:
+            caja = figura.caja_delimitadora()
+            motor.guardar_caja(figura, caja)
+            cajas.append(caja)
+            for color in (figura.color, "black", "#dddfef"):
+                if color not in colores:
+                    colores[color] = (motor.rgb(color), motor.rejilla.posicion_color(color))
+
+        dibujables = [posicion for posicion, caja in enumerate(cajas) if caja is not None]
+        if dibujables:
+            limites = np.array([cajas[posicion] for posicion in dibujables], dtype=float)
+            tareas = []
+            for tesela in self.teselas():
+                x0, y0, x1, y1 = tesela
+                tocan = ((limites[:, 0] < x1) & (x0 < limites[:, 2]) & (limites[:, 1] < y1) & (y0 < limites[:, 3]))
+                if tocan.any():
+                    tareas.append((tesela, [figuras[dibujables[posicion]] for posicion in np.flatnonzero(tocan)], colores,
+                                   (motor.origen_x, motor.origen_y)))
+            # Varias teselas por tarea para no pagar la comunicación con los procesos por cada una
+            self._pool.map(_pintar_tesela, tareas, chunksize=max(1, len(tareas) // (self.procesos * 4)))
+
+    def cerrar(self):
+        # Termina los procesos y devuelve al motor arreglos propios con el último contenido.
+        if self._pool is None:
+            return
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+        self.motor.framebuffer.pixeles = self.motor.framebuffer.pixeles.copy()
+        self.motor.rejilla.indices = self.motor.rejilla.indices.copy()
+        for memoria in (self._memoria_pixeles, self._memoria_indices):
+            memoria.close()
+            memoria.unlink()
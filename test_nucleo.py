@@ -0,0 +1,264 @@
+import io
+import math
+import random
+
+import numpy as np
+import pytest
+
+from nucleo import (Figura, Cuadrado, Triangulo, Circunferencia, Poligono, MotorRaster, CacheRaster, EscenaColumnar,
+                    RasterizadorParalelo, bresenham, bresenham_lote, circunferencia_punto_medio, spans_disco,
+                    spans_scanline, celdas_de_spans, transformar_figuras, rasterizar_figura, guardar_escena,
+                    cargar_escena, guardar_figuras_jsonl, leer_figuras_jsonl, IndiceEspacial, unir_cajas,
+                    cajas_se_intersectan)
+
+# Pruebas de regresión de nucleo: cada versión vectorizada o en lote se compara con la versión
+# escalar de la que salió (el ciclo original de v9.py o el método de cada figura), sobre entradas
+# generadas con semillas fijas. Se ejecutan con python -m pytest desde la raíz del repositorio.
+
+def escena(cantidad, semilla, ancho=800, alto=600):
+    # Escena aleatoria con los mismos tipos, escalas y rotaciones que usa la aplicación.
+    rnd = random.Random(semilla)
+    figuras = []
+    for _ in range(cantidad):
+        x, y = rnd.randrange(0, ancho, 10), rnd.randrange(0, alto, 10)
+        tipo = rnd.choice(("cuadrado", "circulo", "triangulo", "poligono"))
+        if tipo == "cuadrado":
+            figura = Cuadrado(x, y, x + 90, y, x + 90, y + 90, x, y + 90, color="Blue")
+        elif tipo == "circulo":
+            figura = Circunferencia(x, y, 45, "Yellow")
+        elif tipo == "triangulo":
+            figura = Triangulo(x - 50, y + 80, x, y - 10, x + 50, y + 80, "Green")
+        else:
+            figura = Poligono([(x, y), (x + 60, y - 20), (x + 90, y + 40), (x + 30, y + 20), (x - 10, y + 70)], "Purple")
+        figura.escalar(rnd.choice((0.6, 1, 1.4, 2.2)))
+        figura.rotar(rnd.choice((0, 15, 45, 90)))
+        figura.tipo_linea = rnd.choice(("solid", "dashed"))
+        figuras.append(figura)
+    return figuras
+
+def capas_como_listas(capas):
+    return [(color, np.asarray(xs).tolist(), np.asarray(ys).tolist()) for color, xs, ys in capas]
+
+def punto_medio_original(x0, y0, radio, tamano=10):
+    # El ciclo del punto medio tal como estaba en v9.py.
+    radio_en_pixeles = math.ceil(radio / tamano)
+    x, y, d = 0, radio_en_pixeles, 1 - radio_en_pixeles
+    puntos = []
+    while x <= y:
+        for dx, dy in ((x, y), (y, x), (-y, x), (-x, y), (-x, -y), (-y, -x), (y, -x), (x, -y)):
+            puntos.append((x0 + dx * tamano, y0 + dy * tamano))
+        if d < 0:
+            d += 2 * x + 3
+        else:
+            d += 2 * (x - y) + 5
+            y -= 1
+        x += 1
+    return puntos
+
+def relleno_por_difusion(borde, x0, y0, tamano=10):
+    # Relleno por difusión desde el centro hasta el borde, como hacía colorear con flood_fill_puntos.
+    borde = set(borde)
+    pendientes, rellenas = [(x0, y0)], set()
+    while pendientes:
+        celda = pendientes.pop()
+        if celda in borde or celda in rellenas:
+            continue
+        rellenas.add(celda)
+        x, y = celda
+        pendientes.extend(((x - tamano, y), (x + tamano, y), (x, y - tamano), (x, y + tamano)))
+    return rellenas
+
+def tramos_por_fila(puntos, tamano=10):
+    # Scanline escalar: por cada fila, intersección con cada arista que la cruza (regla semiabierta),
+    # orden y emparejamiento de las intersecciones.
+    puntos = [tuple(map(float, punto)) for punto in puntos]
+    ys = [y for _, y in puntos]
+    celdas = set()
+    for fila in range(math.ceil(min(ys) / tamano), math.ceil(max(ys) / tamano)):
+        y = fila * tamano
+        cruces = []
+        for (x1, y1), (x2, y2) in zip(puntos, puntos[1:] + puntos[:1]):
+            if y1 == y2:
+                continue
+            if y1 > y2:
+                x1, y1, x2, y2 = x2, y2, x1, y1
+            if y1 <= y < y2:
+                cruces.append(x1 + (y - y1) * (x2 - x1) / (y2 - y1))
+        cruces.sort()
+        for inicio, fin in zip(cruces[0::2], cruces[1::2]):
+            for columna in range(math.ceil(inicio / tamano - 1e-9), math.floor(fin / tamano + 1e-9) + 1):
+                celdas.add((columna * tamano, y))
+    return celdas
+
+@pytest.mark.parametrize("line_style", ["solid", "dashed"])
+@pytest.mark.parametrize("tamano", [10, 5, 1])
+def test_bresenham_lote_igual_a_bresenham(line_style, tamano):
+    rnd = random.Random(tamano)
+    segmentos = [tuple(rnd.randrange(0, 400, tamano) for _ in range(4)) for _ in range(200)]
+    segmentos += [(50, 50, 50, 50), (0, 0, 3 * tamano, 0), (0, 0, 0, -3 * tamano)]
+    esperado = [punto for segmento in segmentos for punto in bresenham(*segmento, line_style=line_style, tamano=tamano)]
+    xs, ys, colores = bresenham_lote(np.array(segmentos), line_style, tamano)
+    assert list(zip(xs.tolist(), ys.tolist(), colores.tolist())) == esperado
+
+@pytest.mark.parametrize("radio", [0, 10, 45, 90, 455, 2000])
+def test_circunferencia_punto_medio_igual_al_ciclo(radio):
+    xs, ys = circunferencia_punto_medio(400, 300, radio)
+    assert list(zip(xs.tolist(), ys.tolist())) == punto_medio_original(400, 300, radio)
+
+@pytest.mark.parametrize("radio", [10, 20, 45, 90, 180, 450])
+def test_spans_disco_igual_al_relleno_por_difusion(radio):
+    esperado = relleno_por_difusion(punto_medio_original(400, 300, radio), 400, 300)
+    xs, ys = celdas_de_spans(*spans_disco(400, 300, radio))
+    assert set(zip(xs.tolist(), ys.tolist())) == esperado
+    assert len(xs) == len(esperado)
+
+def test_circunferencia_con_radio_negativo_no_dibuja_nada():
+    # Una escala negativa deja el radio negativo: punto_medio no traza nada y no hay relleno
+    assert punto_medio_original(400, 300, -45) == []
+    assert all(len(arreglo) == 0 for arreglo in circunferencia_punto_medio(400, 300, -45))
+    assert all(len(arreglo) == 0 for arreglo in spans_disco(400, 300, -45))
+    figura = Circunferencia(400, 300, 45, "Yellow")
+    figura.escalar(-0.2)
+    assert all(len(xs) == 0 for _, xs, _ in rasterizar_figura(figura))
+    motor = MotorRaster(800, 600)
+    motor.renderizar([figura])
+    assert motor.obtener_color_pixel(400, 300) is None
+
+def test_spans_scanline_igual_al_scanline_escalar():
+    for figura in escena(200, 1):
+        if isinstance(figura, Circunferencia):
+            continue
+        vertices = figura.vertices_transformados()
+        xs, ys = celdas_de_spans(*spans_scanline(vertices))
+        assert set(zip(xs.tolist(), ys.tolist())) == tramos_por_fila(vertices.tolist())
+
+def test_colorear_igual_al_relleno_de_rasterizar_figura():
+    for figura in escena(100, 9):
+        coloreado, rasterizado = MotorRaster(800, 600), MotorRaster(800, 600)
+        figura.colorear(coloreado)
+        color, xs, ys = rasterizar_figura(figura)[0]
+        rasterizado.pintar_celdas(xs, ys, color)
+        assert np.array_equal(coloreado.rejilla.paleta[coloreado.rejilla.indices],
+                              rasterizado.rejilla.paleta[rasterizado.rejilla.indices])
+
+def test_transformar_figuras_igual_a_cada_figura():
+    figuras = escena(500, 2)
+    esperado = [figura._calcular_vertices() for figura in figuras]
+    transformar_figuras(figuras)
+    for figura, vertices in zip(figuras, esperado):
+        assert np.array_equal(figura.vertices_transformados(), vertices)
+
+def test_cache_raster_igual_a_rasterizar_y_acotada():
+    figuras = escena(300, 3)
+    cache = CacheRaster()
+    for _ in range(2):
+        for figura in figuras:
+            assert capas_como_listas(cache.raster(figura)) == capas_como_listas(rasterizar_figura(figura))
+    assert cache.aciertos > 0
+
+    # Trasladar la figura reutiliza el raster guardado, corrido
+    figura = Cuadrado(100, 100, 190, 100, 190, 190, 100, 190)
+    cache.raster(figura)
+    aciertos = cache.aciertos
+    figura.trasladar(30, -20)
+    assert capas_como_listas(cache.raster(figura)) == capas_como_listas(rasterizar_figura(figura))
+    assert cache.aciertos == aciertos + 1
+
+    pequena = CacheRaster(memoria_maxima=20000)
+    for figura in figuras:
+        pequena.raster(figura)
+    assert pequena.memoria <= pequena.memoria_maxima
+    assert pequena.desalojos > 0
+
+def test_rasterizador_paralelo_igual_a_renderizar():
+    figuras = escena(300, 4)
+    esperado = MotorRaster(800, 600).renderizar(figuras)
+    rasterizador = RasterizadorParalelo(MotorRaster(800, 600), procesos=2)
+    try:
+        assert np.array_equal(rasterizador.renderizar(figuras), esperado)
+    finally:
+        rasterizador.cerrar()
+
+def test_npz_conserva_las_figuras():
+    figuras = escena(200, 5)
+    archivo = io.BytesIO()
+    guardar_escena(archivo, figuras)
+    archivo.seek(0)
+    cargadas = cargar_escena(archivo)
+    assert [type(figura) for figura in cargadas] == [type(figura) for figura in figuras]
+    assert np.array_equal(MotorRaster(800, 600).renderizar(cargadas), MotorRaster(800, 600).renderizar(figuras))
+
+def test_jsonl_conserva_las_figuras(tmp_path):
+    figuras = escena(200, 6)
+    archivo = tmp_path / "escena.jsonl"
+    guardar_figuras_jsonl(archivo, figuras)
+    cargadas = list(leer_figuras_jsonl(archivo))
+    assert [type(figura) for figura in cargadas] == [type(figura) for figura in figuras]
+    assert np.array_equal(MotorRaster(800, 600).renderizar(cargadas), MotorRaster(800, 600).renderizar(figuras))
+
+def test_poligono_cuadrado_igual_a_cuadrado():
+    cuadrado = Cuadrado(100, 100, 190, 100, 190, 190, 100, 190, color="Blue", tipo_linea="dashed")
+    poligono = Poligono(cuadrado.vertices_transformados(), "Blue", tipo_linea="dashed")
+    assert capas_como_listas(rasterizar_figura(poligono)) == capas_como_listas(rasterizar_figura(cuadrado))
+
+def test_poligono_colision_igual_al_ray_casting_de_cuadrado():
+    rnd = random.Random(7)
+    for figura in escena(200, 7):
+        if not isinstance(figura, Poligono):
+            continue
+        referencia = object.__new__(Cuadrado)
+        referencia._vertices = figura.vertices_transformados()
+        for _ in range(50):
+            x, y = rnd.uniform(-50, 850), rnd.uniform(-50, 650)
+            assert figura.colisiona_con_punto(x, y) == Cuadrado.colisiona_con_punto(referencia, x, y)
+
+def test_escena_columnar_igual_a_colisiona_con_punto():
+    figuras = escena(300, 9)
+    columnar = EscenaColumnar(figuras)
+    rnd = random.Random(9)
+    xs = [rnd.uniform(-50, 850) for _ in range(2000)]
+    ys = [rnd.uniform(-50, 650) for _ in range(2000)]
+    choques = columnar.contiene(xs, ys)
+    esperado = [[figura.colisiona_con_punto(x, y) for figura in figuras] for x, y in zip(xs, ys)]
+    assert choques.tolist() == esperado
+    assert choques[:, [isinstance(figura, Poligono) for figura in figuras]].any()
+
+    # Después de actualizar una figura que cambió, las respuestas siguen coincidiendo
+    for figura in figuras[:20]:
+        figura.trasladar(30, 10)
+        figura.rotar(figura.rotacion + 15)
+        columnar.actualizar(figura)
+    esperado = [[figura.colisiona_con_punto(x, y) for figura in figuras] for x, y in zip(xs, ys)]
+    assert columnar.contiene(xs, ys).tolist() == esperado
+    primeras = [next((indice for indice, choque in enumerate(fila) if choque), -1) for fila in esperado]
+    assert columnar.primera_figura(xs, ys).tolist() == primeras
+
+def test_escena_columnar_rechaza_tipos_desconocidos():
+    with pytest.raises(TypeError):
+        EscenaColumnar([Figura(0, 0)])
+
+def test_repintar_region_igual_a_renderizar():
+    figuras = escena(400, 10)
+    motor = MotorRaster(800, 600)
+    motor.renderizar(figuras)
+    for figura in figuras[::40]:
+        anterior = motor.cajas[id(figura)]
+        figura.trasladar(40, -30)
+        figura.rotar(figura.rotacion + 45)
+        nueva = figura.caja_delimitadora()
+        motor.guardar_caja(figura, nueva)
+        motor.repintar_region(unir_cajas(anterior, nueva))
+    assert np.array_equal(motor.imagen(), MotorRaster(800, 600).renderizar(figuras))
+
+def test_apiladas_encima_igual_al_recorrido_de_la_escena():
+    figuras = escena(400, 11)
+    indice = IndiceEspacial()
+    for figura in figuras:
+        indice.actualizar(figura, figura.caja_delimitadora())
+    for posicion in range(0, len(figuras), 37):
+        # Recorrido lineal: sube cada figura posterior que toca a otra que ya quedó encima
+        encima = [figuras[posicion]]
+        for otra in figuras[posicion + 1:]:
+            if any(cajas_se_intersectan(otra.caja_delimitadora(), figura.caja_delimitadora()) for figura in encima):
+                encima.append(otra)
+        assert indice.apiladas_encima([figuras[posicion]]) == encima
@@ -0,0 +1,159 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip("tkinter")
+
+import v9
+from nucleo import Cuadrado, Circunferencia, Triangulo, MotorRaster, guardar_escena, guardar_figuras_jsonl
+
+# Pruebas de FigurasCanvas sin pantalla: LienzoFalso reemplaza los métodos de tk.Canvas que usa el
+# editor por una lista de rectángulos, así que se puede comprobar qué quedaría a la vista en modo Tk.
+
+class LienzoFalso(v9.FigurasCanvas):
+    # FigurasCanvas en modo Tk que guarda los rectángulos en self.elementos (del fondo hacia arriba)
+    # en lugar de crearlos en Tk.
+    def __init__(self, ancho=400, alto=300):
+        self._iniciar_estado(MotorRaster(ancho, alto, "#dde0ef", con_framebuffer=False))
+        self.elementos = []
+        self.agendadas = {}
+
+    def create_rectangle(self, x0, y0, x1, y1, fill=None, tags=None, **opciones):
+        self.elementos.append([x0, y0, x1, y1, fill, tags])
+
+    def delete(self, etiqueta):
+        self.elementos = [e for e in self.elementos if etiqueta != "all" and e[5] != etiqueta]
+
+    def tag_raise(self, etiqueta):
+        self.elementos = [e for e in self.elementos if e[5] != etiqueta] + [e for e in self.elementos if e[5] == etiqueta]
+
+    def move(self, etiqueta, dx, dy):
+        for elemento in self.elementos:
+            if elemento[5] == etiqueta:
+                elemento[0:4] = elemento[0] + dx, elemento[1] + dy, elemento[2] + dx, elemento[3] + dy
+
+    def after_idle(self, funcion):
+        pass
+
+    def after(self, milisegundos, funcion):
+        clave = len(self.agendadas) + 1
+        while clave in self.agendadas:
+            clave += 1
+        self.agendadas[clave] = funcion
+        return clave
+
+    def after_cancel(self, clave):
+        del self.agendadas[clave]
+
+    def correr_agendadas(self):
+        # Hace las veces del ciclo de eventos hasta que no queda nada agendado.
+        while self.agendadas:
+            clave = min(self.agendadas)
+            self.agendadas.pop(clave)()
+
+    def visibles(self):
+        # Color que se ve en cada celda: el del último rectángulo que la cubre.
+        tamano = self.rejilla.tamano_celda
+        celdas = {}
+        for x0, y0, x1, y1, color, _ in self.elementos:
+            for x in range(int(x0), int(x1), tamano):
+                for y in range(int(y0), int(y1), tamano):
+                    celdas[(x, y)] = color
+        return celdas
+
+def lienzo_con(figuras):
+    lienzo = LienzoFalso()
+    lienzo.figuras = list(figuras)
+    lienzo.redibujar()
+    return lienzo
+
+def figuras_superpuestas():
+    return [Cuadrado(100, 100, 190, 100, 190, 190, 100, 190, color="Blue"),
+            Circunferencia(180, 150, 45, "Yellow"),
+            Triangulo(150, 230, 200, 140, 250, 230, "Green")]
+
+def test_trasladar_figura_modo_tk_conserva_apilamiento():
+    figuras = figuras_superpuestas()
+    lienzo = lienzo_con(figuras)
+    lienzo.trasladar_figura(figuras[0], 20, -10)
+    esperado = lienzo_con(figuras)
+    assert lienzo.visibles() == esperado.visibles()
+    assert np.array_equal(lienzo.rejilla.paleta[lienzo.rejilla.indices], esperado.rejilla.paleta[esperado.rejilla.indices])
+
+def test_arrastre_izquierdo_mide_cada_evento_desde_el_anterior_con_zoom():
+    figuras = figuras_superpuestas()
+    lienzo = lienzo_con(figuras)
+    lienzo.zoom = 2
+    lienzo.estado = "mover"
+    lienzo.figura_seleccionada = figuras[0]
+    x, y = figuras[0].x, figuras[0].y
+    # Cada evento se mide desde el anterior y se ajusta a celdas del mundo (20 píxeles de pantalla):
+    # 40 píxeles son dos celdas y 12 píxeles, más de media celda, son una
+    for pantalla_x, pantalla_y in ((100, 100), (140, 100), (152, 120), (164, 100)):
+        lienzo.on_arrastre_izquierdo(SimpleNamespace(x=pantalla_x, y=pantalla_y))
+    lienzo.on_suelta_izquierdo(SimpleNamespace(x=164, y=100))
+    assert (figuras[0].x, figuras[0].y) == (x + 40, y)
+    assert not hasattr(lienzo, "prev_x")
+
+def test_cargar_escena_cancela_la_carga_progresiva(tmp_path):
+    figuras = figuras_superpuestas()
+    archivo = str(tmp_path / "escena.npz")
+    guardar_escena(archivo, figuras[:1])
+    lienzo = LienzoFalso()
+    terminadas = []
+    primera = lienzo.cargar_progresivo(figuras * 20, presupuesto=0, al_terminar=terminadas.append)
+    lienzo.agendadas.pop(min(lienzo.agendadas))()
+    segunda = lienzo.cargar_progresivo(figuras, presupuesto=0, al_terminar=terminadas.append)
+    # La primera termina (cancelada) antes de que empiece la segunda
+    assert primera.cancelada and terminadas == [primera]
+    lienzo.cargar_escena(archivo)
+    assert segunda.cancelada and terminadas == [primera, segunda]
+    lienzo.correr_agendadas()
+    assert len(lienzo.figuras) == 1 and lienzo._carga is None
+
+class AplicacionFalsa:
+    # Lo que Aplicacion.abrir usa de la ventana: el título, los atajos de teclado y el canvas.
+    def __init__(self):
+        self.canvas = LienzoFalso()
+        self.titulo = "Editor"
+        self.atajos = {}
+
+    def title(self, titulo=None):
+        if titulo is None:
+            return self.titulo
+        self.titulo = titulo
+
+    def bind(self, secuencia, funcion):
+        self.atajos[secuencia] = funcion
+
+    def unbind(self, secuencia):
+        del self.atajos[secuencia]
+
+def test_abrir_cancela_la_carga_anterior_sin_perder_escape(tmp_path, monkeypatch):
+    figuras = figuras_superpuestas()
+    primero, segundo = str(tmp_path / "primero.jsonl"), str(tmp_path / "segundo.jsonl")
+    guardar_figuras_jsonl(primero, figuras * 20)
+    guardar_figuras_jsonl(segundo, figuras)
+    aplicacion = AplicacionFalsa()
+    # Una figura por paso, para que la segunda carga siga en curso después de su primer paso
+    cargar_progresivo = aplicacion.canvas.cargar_progresivo
+    monkeypatch.setattr(aplicacion.canvas, "cargar_progresivo", lambda *args, **opciones: cargar_progresivo(*args, presupuesto=0, **opciones))
+    for archivo in (primero, segundo):
+        monkeypatch.setattr(v9.filedialog, "askopenfilename", lambda **opciones: archivo)
+        v9.Aplicacion.abrir(aplicacion)
+        aplicacion.canvas.agendadas.pop(min(aplicacion.canvas.agendadas))()
+    # El fin de la primera carga no quita el Escape de la segunda ni deja su título
+    assert "<Escape>" in aplicacion.atajos
+    assert aplicacion.titulo.startswith("Editor - cargando")
+    aplicacion.canvas.correr_agendadas()
+    assert "<Escape>" not in aplicacion.atajos and aplicacion.titulo == "Editor"
+    assert len(aplicacion.canvas.figuras) == len(figuras)
+
+@pytest.mark.parametrize("opcion", ["--celda", "--procesos", "--ancho", "--alto"])
+@pytest.mark.parametrize("valor", ["0", "-2", "tres"])
+def test_renderizar_lote_rechaza_valores_no_positivos(opcion, valor, tmp_path, capsys):
+    with pytest.raises(SystemExit) as salida:
+        v9.renderizar_lote([str(tmp_path), opcion, valor])
+    assert salida.value.code == 2
+    assert opcion in capsys.readouterr().err
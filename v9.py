@@ -1,614 +1,583 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import colorchooser
-import math
+from tkinter import filedialog
+import argparse
+import functools
+import glob
+import multiprocessing
+import os
+import sys
+import time
 import numpy as np
+from nucleo import (Cuadrado, Triangulo, Circunferencia, Poligono, MotorRaster, EstadisticasDibujo,
+                    intersectar_cajas, unir_cajas, guardar_escena, cargar_escena, leer_figuras_jsonl, RasterizadorParalelo,
+                    renderizar_archivo, transformar_figuras, TAMANO_CELDA, fijar_tamano_celda)
+
+def medir_redibujado(operacion):
+    # Decorador para los métodos de FigurasCanvas que redibujan: si hay estadísticas activas, todo el
+    # método queda registrado como un redibujado con ese nombre; si no, sólo cuesta una comparación.
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envoltura(self, *args, **kwargs):
+            estadisticas = self.motor.estadisticas
+            if estadisticas is None:
+                return metodo(self, *args, **kwargs)
+            estadisticas.iniciar_redibujado(operacion)
+            try:
+                return metodo(self, *args, **kwargs)
+            finally:
+                estadisticas.terminar_redibujado()
+        return envoltura
+    return decorador
 
-def flood_fill_puntos(canvas, x, y, color_reemplazo, color_borde1="#dddfef", color_borde2="black"):
-    # Implementa el algoritmo de relleno por difusión (flood fill) para pintar un área delimitada por
-    # un color de borde en un objeto canvas. La función toma como entrada un objeto canvas, las
-    # coordenadas (x, y) del punto de inicio, el color de reemplazo para llenar el área y dos colores
-    # de borde.
-    
-    # canvas: El objeto canvas en el que se realizará el relleno.
-    # x: Coordenada x del punto de inicio.
-    # y: Coordenada y del punto de inicio.
-    # color_reemplazo: Color con el que se llenará el área.
-    # color_borde1: Primer color de borde del área a rellenar.
-    # color_borde2: Segundo color de borde del área a rellenar.
-    color_inicial = canvas.obtener_color_pixel(x, y)
-    
-    pila = [(x, y)]
-    visitados = set()
-    en_pila = set([(x, y)])
-    
-    while pila:
-        x, y = pila.pop()
-        en_pila.remove((x, y))
-    
-        if (x, y) in visitados:
-            continue
-    
-        # Pinta el rectángulo actual
-        canvas.create_rectangle(x-5, y-5, x + 5, y+5, outline=color_reemplazo, fill=color_reemplazo)
-    
-        visitados.add((x, y))
-    
-        # Recorre los vecinos del punto actual
-        for dx, dy in [(-5, 0), (5, 0), (0, -5), (0, 5)]:
-            nx, ny = x + dx, y + dy
-            pixel_color = canvas.obtener_color_pixel(nx, ny)
-    
-            # Verifica si el vecino no es un borde y no ha sido visitado ni agregado a la pila
-            if pixel_color != color_borde1 and pixel_color != color_borde2:
-                if (nx, ny) not in visitados and (nx, ny) not in en_pila:
-                    pila.append((nx, ny))
-                    en_pila.add((nx, ny))
-    return
-
-def bresenham(x1, y1, x2, y2, line_style='dashed'):
-    
-    # Implementa el algoritmo de Bresenham para trazar una línea entre dos puntos en un espacio discreto
-    # de coordenadas. La función toma como entrada las coordenadas de los puntos inicial y final, y un
-    # estilo de línea opcional (línea continua o discontinua).
-
-    # :param x1: Coordenada x del punto inicial.
-    # :param y1: Coordenada y del punto inicial.
-    # :param x2: Coordenada x del punto final.
-    # :param y2: Coordenada y del punto final.
-    # :param line_style: Estilo de línea, 'dashed' para línea discontinua o cualquier otro valor para línea continua.
-    # :return: Lista de puntos que forman la línea trazada.
-    
-    dx = abs(x2 - x1)
-    dy = abs(y2 - y1)
-    sx = 10 if x1 < x2 else -10
-    sy = 10 if y1 < y2 else -10
-    err = dx - dy
-    x, y = x1, y1
-    puntos = []
-
-    segment_length = 1
-    current_length = 0
-    current_color = "black"
-
-    while True:
-        color = current_color if line_style == 'dashed' else 'black'
-        puntos.append((x, y, color))
-
-        if x == x2 and y == y2:
-            break
-
-        e2 = 2 * err
-        # Mueve el punto en el eje x
-        if e2 > -dy:
-            err -= dy
-            x += sx
-        # Mueve el punto en el eje y
-        if e2 < dx:
-            err += dx
-            y += sy
-
-        # Cambia el color para simular una línea discontinua
-        if line_style == 'dashed':
-            current_length += 1
-            if current_length % 4 == 1 or current_length % 4 == 2 or current_length % 4 == 3:
-                current_color = "black"
-            else:
-                current_color = "#dddfef"
-
-    return puntos
-
-# !
-def line(x1, y1, x2, y2, color='black', segment_length=1, line_style='solid'):
-    puntos = []
-    square_size = 10
-
-    x1, y1, x2, y2 = int(x1), int(y1), int(x2), int(y2)
-
-    a = y2 - y1
-    b = x1 - x2
-    c = x2*y1 - x1*y2
-
-    if abs(b) > abs(a):
-        if x2 < x1:
-            x1, x2 = x2, x1
-        current_length = 0
-        current_color = color
-        for x in range(x1, x2+1, square_size):
-            y = round((-a*x - c) / b)
-            y = (y // square_size) * square_size + square_size // 2
-            if line_style == 'dashed':
-                if current_length == 0:
-                    current_color = color if current_color != color else 'white'
-                    current_length = segment_length
-                else:
-                    current_length -= 1
-            puntos.append((x, y, current_color))
-        if x2 % square_size != 0:
-            y = round((-a*x2 - c) / b)
-            y = (y // square_size) * square_size + square_size // 2
-            puntos.append((x2, y, current_color))
-    else:
-        if y2 < y1:
-            y1, y2 = y2, y1
-        current_length = 0
-        current_color = color
-        for y in range(y1, y2+1, square_size):
-            x = round((-b*y - c) / a)
-            x = (x // square_size) * square_size + square_size // 2
-            if line_style == 'dashed':
-                if current_length == 0:
-                    current_color = color if current_color != color else 'white'
-                    current_length = segment_length
-                else:
-                    current_length -= 1
-            puntos.append((x, y, current_color))
-        if y2 % square_size != 0:
-            x = round((-b*y2 - c) / a)
-            x = (x // square_size) * square_size + square_size // 2
-            puntos.append((x, y2, current_color))
-
-    return puntos
-# !
-# !
-def punto_medio(x0, y0, radio):
-    radio_en_pixeles = math.ceil(radio / 10)
-    x = 0
-    y = radio_en_pixeles
-    d = 1 - radio_en_pixeles
-    puntos = []
-    while x <= y:
-        puntos.append((x0 + x * 10, y0 + y * 10))
-        puntos.append((x0 + y * 10, y0 + x * 10))
-        puntos.append((x0 - y * 10, y0 + x * 10))
-        puntos.append((x0 - x * 10, y0 + y * 10))
-        puntos.append((x0 - x * 10, y0 - y * 10))
-        puntos.append((x0 - y * 10, y0 - x * 10))
-        puntos.append((x0 + y * 10, y0 - x * 10))
-        puntos.append((x0 + x * 10, y0 - y * 10))
-        if d < 0:
-            d += 2 * x + 3
+class CargaProgresiva:
+    # """
+    # Carga de figuras en segundo plano sobre el ciclo de eventos de Tk. En cada paso se sacan figuras
+    # del iterador y se dibujan hasta agotar el presupuesto de tiempo, y el siguiente paso se agenda
+    # con after(), así que entre pasos Tk sigue atendiendo clics y teclas. La crea
+    # FigurasCanvas.cargar_progresivo.
+
+    # :param canvas: FigurasCanvas donde se agregan las figuras.
+    # :param figuras: Iterador de figuras a cargar.
+    # :param presupuesto: Segundos de dibujo por paso.
+    # :param al_avanzar: Función llamada con la carga después de cada paso, o None.
+    # :param al_terminar: Función llamada con la carga al terminar o cancelarse, o None.
+    # """
+    def __init__(self, canvas, figuras, presupuesto=0.015, al_avanzar=None, al_terminar=None):
+        self.canvas = canvas
+        self.presupuesto = presupuesto
+        self.al_avanzar = al_avanzar
+        self.al_terminar = al_terminar
+        self.cargadas = 0
+        self.terminada = False
+        self.cancelada = False
+        self._figuras = iter(figuras)
+        self._pendiente = None
+
+    def iniciar(self):
+        self._pendiente = self.canvas.after(0, self._paso)
+
+    def _paso(self):
+        self._pendiente = None
+        limite = time.perf_counter() + self.presupuesto
+        for figura in self._figuras:
+            self.canvas.figuras.append(figura)
+            self.canvas.dibujar_figura(figura)
+            self.cargadas += 1
+            if time.perf_counter() >= limite:
+                break
         else:
-            d += 2 * (x - y) + 5
-            y -= 1
-        x += 1
-    return puntos
-# !
-def area(x1, y1, x2, y2, x3, y3):
-    return abs((x1 * (y2 - y3) + x2 * (y3 - y1) + x3 * (y1 - y2)) / 2.0)
-
-class Figura:
-    # Clase base para representar figuras geométricas en un espacio bidimensional. Esta clase contiene
-    # atributos comunes a todas las figuras, como coordenadas, color, grosor, tipo de línea, escala y rotación.
-
-    # :param x: Coordenada x de la figura.
-    # :param y: Coordenada y de la figura.
-    # :param color: Color de la figura.
-    # :param grosor: Grosor del borde de la figura.
-    # :param tipo_linea: Tipo de línea para el borde de la figura ('solid' u otros).
-    
-    def __init__(self, x, y, color='White', grosor=10, tipo_linea='solid'):
-        self.x = x
-        self.y = y
-        self.color = color
-        self.grosor = grosor
-        self.tipo_linea = tipo_linea
-        self.escala = 1
-        self.borde_seleccionado = False
-        self.rotacion = 0
-
-    def set_rotacion(self, angulo):
-        # Establece la rotación de la figura en grados.
-        self.rotacion = angulo % 360
-
-    def escalar(self, factor):
-        # Establece el factor de escala de la figura.
-        self.escala = factor
-
-    def get_escala(self):
-        # Obtiene el factor de escala de la figura.
-        return self.escala
-
-    def get_rotacion(self):
-        # Obtiene la rotación de la figura en grados.
-        return self.rotacion
-
-    def rotar(self, rotacion):
-        # Rota la figura en grados.
-        self.rotacion = rotacion
-
-    def cambiar_color(self, color):
-        # Cambia el color de la figura.
-        self.color = color
-
-    def trasladar(self, dx, dy):
-        # Traslada la figura en el eje x e y.
-        self.x += dx
-        self.y += dy
-
-    def imprimir_atributos(self):
-        # Imprime los atributos de la figura.
-        pass
-
-    def colorear(self, canvas):
-        # Método para colorear la figura en un objeto canvas.
-        pass
-      
-class Cuadrado(Figura):
-    
-    # Clase que representa un cuadrado en un espacio bidimensional. Hereda de la clase Figura.
+            self._terminar()
+            return
+        if self.al_avanzar is not None:
+            self.al_avanzar(self)
+        self._pendiente = self.canvas.after(1, self._paso)
+
+    def cancelar(self):
+        # Detiene la carga; las figuras ya cargadas se quedan en el canvas.
+        if self.terminada:
+            return
+        if self._pendiente is not None:
+            self.canvas.after_cancel(self._pendiente)
+            self._pendiente = None
+        self.cancelada = True
+        self._terminar()
+
+    def _terminar(self):
+        self.terminada = True
+        if self.canvas._carga is self:
+            self.canvas._carga = None
+        # Cierra el archivo si las figuras venían de leer_figuras_jsonl
+        cerrar = getattr(self._figuras, "close", None)
+        if cerrar is not None:
+            cerrar()
+        if self.al_avanzar is not None:
+            self.al_avanzar(self)
+        if self.al_terminar is not None:
+            self.al_terminar(self)
 
-    # :param color: Color del cuadrado.
-    # :param grosor: Grosor del borde del cuadrado.
-    # :param tipo_linea: Tipo de línea para el borde del cuadrado ('solid' u otros).
-    
-    def __init__(self, x1, y1, x2, y2, x3, y3, x4, y4, color='black', grosor=1, tipo_linea='solid'):
-        super().__init__(x1, y1, color, grosor, tipo_linea)
-        self.x1 = x1
-        self.y1 = y1
-        self.x2 = x2
-        self.y2 = y2
-        self.x3 = x3
-        self.y3 = y3
-        self.x4 = x4
-        self.y4 = y4
-        self.escala = 1
-        self.rotacion = 0
-
-    def colisiona_con_punto(self, x, y):
-        # """
-        # Determina si un punto dado (x, y) colisiona con la figura utilizando el algoritmo de ray casting.
-        # Este algoritmo traza un rayo horizontal desde el punto (x, y) hacia la derecha y cuenta cuántas
-        # veces cruza los bordes de la figura. Si el número de cruces es impar, el punto está dentro de la
-        # figura, de lo contrario, está fuera.
-
-        # :param x: Coordenada x del punto.
-        # :param y: Coordenada y del punto.
-        # :return: Verdadero (True) si el punto colisiona con la figura, Falso (False) en caso contrario.
-        # """
-        x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado = self.coordenadas_escaladas()
-        x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado, x4_rotado, y4_rotado = self.puntos_rotados(x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado)
-
-        puntos = [(x1_rotado, y1_rotado), (x2_rotado, y2_rotado), (x3_rotado, y3_rotado), (x4_rotado, y4_rotado)]
-        n_puntos = len(puntos)
-
-        intersecciones = 0
-        p1_x, p1_y = puntos[0]
-
-        # Recorre los lados de la figura
-        for i in range(1, n_puntos + 1):
-            p2_x, p2_y = puntos[i % n_puntos]
+class FigurasCanvas(tk.Canvas):
+    # Niveles de zoom de la vista. Sólo se ofrecen aquellos con los que una celda ocupa un número
+    # entero de píxeles de la pantalla (con celdas de 10 píxeles, todos).
+    niveles_zoom = (0.2, 0.5, 1, 2, 4)
+    # Con celdas más chicas, el modo Tk crearía demasiados rectángulos; cambiar_tamano_celda pasa
+    # entonces a modo raster.
+    tamano_minimo_tk = 10
 
-            # Verifica si el punto está dentro de la región acotada por el par de puntos (lado) actual
-            if y > min(p1_y, p2_y) and y <= max(p1_y, p2_y) and x <= max(p1_x, p2_x):
-                if p1_y != p2_y:
-                    x_intersect = (y - p1_y) * (p2_x - p1_x) / (p2_y - p1_y) + p1_x
-                if p1_x == p2_x or x <= x_intersect:
-                    intersecciones += 1
+    # def borrar_figura(self, figura):
+    #     if figura is not None:
+    #         items = self.find_all()
+    #         for item in items:
+    #             if self.gettags(item) == (str(id(figura)),):
+    #                 self.delete(item)
+    def borrar_figura(self, figura):
+        if figura is not None:
+            self.delete(figura.id)
+    def obtener_color_pixel(self, x, y):
+        # Devuelve el color dibujado en la coordenada (x, y) leyendo la rejilla de colores, o None si
+        # en ese punto sólo está el fondo.
+        return self.motor.obtener_color_pixel(x, y)
+
+    def obtener_colores_pixeles(self, xs, ys):
+        # Versión por lotes de obtener_color_pixel para muchos puntos a la vez.
+        return self.motor.obtener_colores_pixeles(xs, ys)
+
+    def __init__(self, parent, *args, modo_raster=False, memoria_cache_raster=16 * 1024 * 1024, procesos_raster=1, **kwargs):
+        # modo_raster: si es True, las figuras se rasterizan en un Framebuffer de NumPy y se muestran
+        # como una sola PhotoImage por cuadro en lugar de un rectángulo de Tk por celda.
+        # memoria_cache_raster: bytes máximos de la caché de rasters de figuras (ver CacheRaster).
+        # procesos_raster: en modo raster, con más de un proceso los redibujados completos se reparten
+        # en teselas entre procesos (ver RasterizadorParalelo).
+        # Todo lo que no es Tk (rejilla de colores, framebuffer, cajas, índice y caché) vive en un
+        # MotorRaster; este canvas sólo muestra el resultado y, en modo Tk, crea los rectángulos.
+        # Las figuras viven en un mundo sin límites; el canvas muestra la ventana del motor, que se
+        # desplaza arrastrando con el botón derecho y se amplía o reduce con la rueda del ratón.
+        super().__init__(parent, *args, **kwargs)
+        self.bind("<Button-1>", self.on_click_izquierdo)
+        self.bind("<B1-Motion>", self.on_arrastre_izquierdo)
+        self.bind("<ButtonRelease-1>", self.on_suelta_izquierdo)
+        self.bind("<ButtonPress-3>", self.on_click_derecho)
+        self.bind("<B3-Motion>", self.on_arrastre_derecho)
+        self.bind("<MouseWheel>", self.on_rueda)
+        self.bind("<Button-4>", self.on_rueda)
+        self.bind("<Button-5>", self.on_rueda)
+        self._iniciar_estado(MotorRaster(int(self["width"]), int(self["height"]), self["bg"],
+                                         con_framebuffer=modo_raster, memoria_cache_raster=memoria_cache_raster,
+                                         convertir_color=self._rgb))
+        if modo_raster and procesos_raster > 1:
+            self.rasterizador = RasterizadorParalelo(self.motor, procesos_raster)
+            self.bind("<Destroy>", self._cerrar_rasterizador)
+
+    def _iniciar_estado(self, motor):
+        # Estado del editor que no depende de Tk, con la vista del tamaño de la ventana del motor.
+        # Lo llama __init__ después de crear el widget; así también se puede armar un canvas sin
+        # pantalla para pruebas y mediciones.
+        self.figuras = []
+        self.figura_seleccionada = None
+        self.estado = "dibujar"
+        self.figura_actual = "cuadrado"
+        self.motor = motor
+        self.rejilla = self.motor.rejilla
+        self.framebuffer = self.motor.framebuffer
+        self.indice = self.motor.indice
+        self.cache_raster = self.motor.cache_raster
+        self.rasterizador = None
+        self._imagen = None
+        self._presentacion_pendiente = False
+        # Desplazamiento de arrastre acumulado que todavía no se aplicó (ver on_arrastre_izquierdo)
+        self._arrastre_dx = 0
+        self._arrastre_dy = 0
+        self._arrastre_pendiente = False
+        # Figura que se está editando en la capa superpuesta, y su caja al levantarla (ver levantar_figura)
+        self._figura_superpuesta = None
+        self._caja_levantada = None
+        # Tamaño en pantalla y zoom de la vista; la ventana del motor es el trozo del mundo que se ve
+        self.zoom = 1
+        self.niveles_zoom = self._niveles_zoom_validos()
+        self._ancho_vista = self.motor.ancho
+        self._alto_vista = self.motor.alto
+        # Desplazamiento de la vista acumulado que todavía no se aplicó (ver on_arrastre_derecho)
+        self._vista_dx = 0
+        self._vista_dy = 0
+        self._vista_pendiente = False
+        # Carga progresiva en curso, que se cancela antes de reemplazar la escena (ver cargar_progresivo)
+        self._carga = None
+
+    def activar_estadisticas(self):
+        # Empieza a medir las fases del dibujo y devuelve el EstadisticasDibujo donde se acumulan.
+        if self.motor.estadisticas is None:
+            self.motor.estadisticas = EstadisticasDibujo()
+        return self.motor.estadisticas
+
+    def desactivar_estadisticas(self):
+        # Deja de medir y devuelve las estadísticas acumuladas hasta ahora (o None).
+        estadisticas = self.motor.estadisticas
+        self.motor.estadisticas = None
+        return estadisticas
+
+    def _cerrar_rasterizador(self, event=None):
+        if self.rasterizador is not None:
+            self.rasterizador.cerrar()
+            self.rasterizador = None
+
+    def _rgb(self, color):
+        # Convierte un nombre de color de Tk a una tupla RGB de 8 bits usando el propio Tk.
+        return tuple(c >> 8 for c in self.winfo_rgb(color))
+
+    def presentar(self):
+        # Muestra el framebuffer en el canvas como una única PhotoImage ampliada al tamaño de celda.
+        self._presentacion_pendiente = False
+        if self.framebuffer is None:
+            return
+        inicio = time.perf_counter() if self.motor.estadisticas is not None else 0
+        imagen = tk.PhotoImage(data=self.framebuffer.a_ppm(), format="PPM")
+        factor = int(round(self.framebuffer.tamano_celda * self.zoom))
+        if factor != 1:
+            imagen = imagen.zoom(factor)
+        if self.find_withtag("framebuffer"):
+            self.itemconfigure("framebuffer", image=imagen)
+        else:
+            self.create_image(0, 0, anchor="nw", image=imagen, tags="framebuffer")
+        self._imagen = imagen
+        if self.motor.estadisticas is not None:
+            self.motor.estadisticas.marcar("presentacion", "escena", inicio)
+
+    def _programar_presentacion(self):
+        # Agrupa todos los cambios de un mismo ciclo de eventos en una sola presentación.
+        if not self._presentacion_pendiente:
+            self._presentacion_pendiente = True
+            self.after_idle(self.presentar)
+
+    def pintar_celdas(self, xs, ys, color, etiqueta=None):
+        # Pinta celdas sueltas. Todo lo que se dibuja pasa por aquí o por pintar_spans para que la
+        # rejilla de colores quede sincronizada. En modo Tk las celdas contiguas de una misma fila
+        # se unen en un solo rectángulo.
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        if len(xs) == 0:
+            return
+        if self.framebuffer is not None:
+            self.motor.pintar_celdas(xs, ys, color)
+            self._programar_presentacion()
+            return
+        orden = np.lexsort((xs, ys))
+        xs, ys = xs[orden], ys[orden]
+        corte = np.flatnonzero((np.diff(ys) != 0) | (np.diff(xs) != self.rejilla.tamano_celda)) + 1
+        inicio = np.concatenate(([0], corte))
+        fin = np.concatenate((corte, [len(xs)])) - 1
+        self.pintar_spans(ys[inicio], xs[inicio], xs[fin], color, etiqueta)
+
+    def pintar_spans(self, ys, xs_inicio, xs_fin, color, etiqueta=None):
+        # Pinta tramos horizontales de celdas: un solo rectángulo de Tk por tramo, o una escritura
+        # en el framebuffer en modo raster. Los tramos están en coordenadas del mundo; los
+        # rectángulos se crean en las de la pantalla.
+        self.motor.pintar_spans(ys, xs_inicio, xs_fin, color)
+        if self.framebuffer is not None:
+            self._programar_presentacion()
+            return
+        origen_x, origen_y, zoom = self.motor.origen_x, self.motor.origen_y, self.zoom
+        tamano = self.rejilla.tamano_celda
+        for y, x_inicio, x_fin in zip(ys.tolist(), xs_inicio.tolist(), xs_fin.tolist()):
+            self.create_rectangle((x_inicio - origen_x) * zoom, (y - origen_y) * zoom, (x_fin + tamano - origen_x) * zoom,
+                                  (y + tamano - origen_y) * zoom, width=1, outline=color, fill=color, tags=etiqueta)
+
+    @medir_redibujado("redibujar")
+    def redibujar(self):
+        # Borra el canvas y vuelve a dibujar todas las figuras. Todas guardan su caja, pero sólo se
+        # rasterizan las que tocan la ventana.
+        self._figura_superpuesta = None
+        if self.rasterizador is not None:
+            self.rasterizador.dibujar(self.figuras)
+            self._programar_presentacion()
+            return
+        self.motor.limpiar()
+        if self.framebuffer is None:
+            self.delete("all")
+        # Los vértices de las figuras que cambiaron se calculan todos juntos antes de dibujar
+        transformar_figuras(self.figuras)
+        for figura in self.figuras:
+            self.dibujar_figura(figura)
 
-            p1_x, p1_y = p2_x, p2_y
+    def etiqueta_de(self, figura):
+        # Etiqueta de Tk que llevan todos los elementos dibujados por una figura.
+        return self.motor.etiqueta_de(figura)
 
-        return intersecciones % 2 == 1
-    
-    def coordenadas_escaladas(self):
+    def dibujar_figura(self, figura):
+        # Rasteriza la figura (relleno y borde), pasando por la caché de rasters, y la pinta con
+        # pintar_celdas, tanto en modo Tk como en modo raster. Si queda fuera de la ventana sólo se
+        # guarda su caja.
+        self.fusionar_capas()
+        caja = figura.caja_delimitadora()
+        if self.motor.visible(caja):
+            self._emitir(figura, self.motor.raster(figura))
+        self.motor.guardar_caja(figura, caja)
+
+    def _emitir(self, figura, capas):
+        # Pinta las capas de una figura con su etiqueta; con estadísticas cuenta como fase "emision_tk".
+        inicio = time.perf_counter() if self.motor.estadisticas is not None else 0
+        for color, xs, ys in capas:
+            self.pintar_celdas(xs, ys, color, self.etiqueta_de(figura))
+        if self.motor.estadisticas is not None:
+            self.motor.estadisticas.marcar("emision_tk", type(figura).__name__, inicio)
+
+    @medir_redibujado("actualizar_figura")
+    def actualizar_figura(self, figura):
         # """
-        # Calcula y devuelve las coordenadas escaladas de la figura en función del factor de escala.
-        # La función escala la figura alrededor del punto superior izquierdo, es decir, el punto con la
-        # coordenada x más pequeña y la coordenada y más pequeña.
+        # Vuelve a dibujar una figura que cambió (se movió, escaló, rotó o cambió de color) o que se
+        # quitó de self.figuras. Sólo se redibuja la unión de su caja anterior y su caja nueva, con
+        # las figuras que la intersectan, en lugar de toda la escena. Los cambios de la figura
+        # seleccionada sólo la redibujan a ella, en la capa superpuesta (ver levantar_figura).
 
-        # :return: Las 8 coordenadas escaladas de la figura.
+        # :param figura: Figura modificada o eliminada.
         # """
-        x1, y1, x2, y2, x3, y3, x4, y4 = self.x1, self.y1, self.x2, self.y2, self.x3, self.y3, self.x4, self.y4
-
-        # Identifica el punto superior izquierdo (el que tiene la coordenada x más pequeña y la coordenada y más pequeña)
-        puntos = np.array([[x1, y1], [x2, y2], [x3, y3], [x4, y4]])
-        punto_superior_izquierdo = np.argmin(puntos, axis=0)[0]
-
-        # Calcula la matriz de escalado
-        escala_matriz = np.array([[self.escala, 0], [0, self.escala]])
-
-        # Escala las coordenadas
-        puntos_escalados = puntos - puntos[punto_superior_izquierdo]  # Resta el punto superior izquierdo
-        puntos_escalados = np.dot(puntos_escalados, escala_matriz)    # Multiplica por la matriz de escalado
-        puntos_escalados = puntos_escalados + puntos[punto_superior_izquierdo]  # Suma el punto superior izquierdo
-
-        # Redondea las coordenadas escaladas
-        puntos_escalados = np.round(puntos_escalados / 10) * 10
-
-        # Devuelve las 8 coordenadas escaladas
-        x1_escalado, y1_escalado = puntos_escalados[0]
-        x2_escalado, y2_escalado = puntos_escalados[1]
-        x3_escalado, y3_escalado = puntos_escalados[2]
-        x4_escalado, y4_escalado = puntos_escalados[3]
-        return x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado
-    
-    def puntos_rotados(self, x1, y1, x2, y2, x3, y3, x4, y4):
+        anterior = self.motor.cajas.get(id(figura))
+        if self._levantar_si_seleccionada(figura):
+            self._actualizar_superpuesta(figura, anterior)
+            return
+        self.fusionar_capas()
+        nueva = None
+        if figura in self.figuras:
+            nueva = figura.caja_delimitadora()
+        self.motor.guardar_caja(figura, nueva)
+        if self.framebuffer is None:
+            self.delete(self.etiqueta_de(figura))
+        region = unir_cajas(anterior, nueva)
+        if region is not None:
+            self.redibujar_region(region)
+
+    def redibujar_region(self, caja):
         # """
-        # Calcula y devuelve las coordenadas de los puntos de la figura después de aplicar la rotación.
-        # La función rota la figura alrededor de su centro. El centro se calcula como el punto medio
-        # entre las coordenadas (x1, y1) y (x3, y3).
-
-        # :return: Las 8 coordenadas de los puntos rotados.
+        # Borra y vuelve a rasterizar sólo la región indicada, respetando el orden de las figuras.
+        # En modo raster se limpian las celdas de la caja y cada figura que la toca se pinta
+        # recortada a ella. En modo Tk no se pueden recortar los rectángulos ya creados, así que las
+        # figuras que tocan la caja se vuelven a emitir completas y las que estaban encima de ellas
+        # (directa o indirectamente) se suben con tag_raise para conservar el orden de apilamiento.
+        # Sólo cuenta la parte de la caja que cae dentro de la ventana.
+
+        # :param caja: Región (x0, y0, x1, y1) en píxeles del mundo, con x1 e y1 exclusivos.
         # """
-        puntos = np.array([[x1, y1], [x2, y2], [x3, y3], [x4, y4]])
-
-        # Calcula el centro de la figura
-        centro_x = (x1 + x3) / 2
-        centro_y = (y1 + y3) / 2
-
-        # Calcula el ángulo de rotación en radianes
-        rad = math.radians(self.rotacion)
-        cos_rad = math.cos(rad)
-        sin_rad = math.sin(rad)
-
-        # Crea la matriz de rotación
-        rotacion_matriz = np.array([[cos_rad, sin_rad], [-sin_rad, cos_rad]])
-
-        # Aplica la rotación a los puntos
-        puntos_rotados = puntos - np.array([centro_x, centro_y])  # Resta el centro de la figura
-        puntos_rotados = np.dot(puntos_rotados, rotacion_matriz)  # Multiplica por la matriz de rotación
-        puntos_rotados = puntos_rotados + np.array([centro_x, centro_y])  # Suma el centro de la figura
-
-        # Redondea las coordenadas de los puntos rotados
-        puntos_rotados = np.round(puntos_rotados / 10) * 10
-
-        x1_rotado, y1_rotado = puntos_rotados[0]
-        x2_rotado, y2_rotado = puntos_rotados[1]
-        x3_rotado, y3_rotado = puntos_rotados[2]
-        x4_rotado, y4_rotado = puntos_rotados[3]
-
-        return x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado, x4_rotado, y4_rotado
-   
-    def colorear(self, canvas):
+        caja = intersectar_cajas(caja, self.motor.ventana())
+        if caja is None:
+            return
+        rasters = {}
+        if self.framebuffer is None:
+            # Las figuras que tocan la caja, y las que deben quedar encima de ellas, salen del
+            # índice espacial en orden
+            indice = self.motor.indice
+            afectadas = indice.en_caja(caja)
+            if afectadas:
+                ids_afectadas = set(id(figura) for figura in afectadas)
+                zona = caja
+                for figura in afectadas:
+                    self.delete(self.etiqueta_de(figura))
+                    zona = unir_cajas(zona, self.motor.cajas[id(figura)])
+                for figura in indice.apiladas_encima(afectadas):
+                    if id(figura) in ids_afectadas:
+                        rasters[id(figura)] = self.motor.raster(figura)
+                        self._emitir(figura, rasters[id(figura)])
+                    else:
+                        self.tag_raise(self.etiqueta_de(figura))
+                # Los rectángulos emitidos completos también pintaron la rejilla fuera de la caja
+                caja = zona
+        self._repintar_celdas(caja, rasters)
+
+    def _repintar_celdas(self, caja, rasters=None):
+        # Limpia la caja en la rejilla (y en el framebuffer en modo raster) y vuelve a pintar, en
+        # orden y recortadas a la caja, las figuras que la intersectan. No crea elementos de Tk.
+        self.motor.repintar_region(caja, rasters)
+        if self.framebuffer is not None:
+            self._programar_presentacion()
+
+    @medir_redibujado("trasladar_figura")
+    def trasladar_figura(self, figura, dx, dy):
         # """
-        # Colorea el cuadrado en el objeto canvas proporcionado. Este método escala y rota el cuadrado
-        # antes de colorearlo utilizando el algoritmo flood fill, que rellena el área delimitada por los
-        # bordes del cuadrado con el color especificado.
-
-        # :param canvas: Objeto canvas donde se dibujará el cuadrado.
+        # Traslada una figura ya dibujada. Si sus vértices transformados se desplazan exactamente
+        # (dx, dy), su raster no cambia, así que en modo Tk basta con un canvas.move sobre su etiqueta
+        # y actualizar la rejilla de colores, sin volver a rasterizar nada en Tk. Para conservar el
+        # orden de las figuras, la trasladada se sube y luego se suben encima las posteriores que la
+        # tocan. El redondeo al par más cercano de puntos_rotados hace que algunas figuras rotadas
+        # cambien al moverse un número impar de celdas; en ese caso, en modo raster o con
+        # desplazamientos fuera de la cuadrícula se usa actualizar_figura, igual que si la figura
+        # estaba fuera de la ventana y no tiene rectángulos. La figura seleccionada se traslada en la
+        # capa superpuesta (ver levantar_figura).
+
+        # :param figura: Figura a trasladar (debe estar en self.figuras).
+        # :param dx: Desplazamiento en el eje x.
+        # :param dy: Desplazamiento en el eje y.
         # """
-        # Calcula las coordenadas escaladas y rotadas del cuadrado
-        x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado = self.coordenadas_escaladas()
-        x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado, x4_rotado, y4_rotado = self.puntos_rotados(x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado)
-
-        # Calcula el centro del cuadrado rotado y escalado
-        centro_x = (x1_rotado + x3_rotado) / 2
-        centro_y = (y1_rotado + y3_rotado) / 2
-
-        # Redondea las coordenadas del centro a múltiplos de 5
-        semilla_x = round(centro_x / 10) * 10
-        semilla_y = round(centro_y / 10) * 10
-
-        # Realiza el relleno utilizando las coordenadas de la semilla
-        flood_fill_puntos(canvas, semilla_x, semilla_y, self.color)
-
-    def trasladar(self, dx, dy):
-        self.x1 += dx
-        self.y1 += dy
-        self.x2 += dx
-        self.y2 += dy
-        self.x3 += dx
-        self.y3 += dy
-        self.x4 += dx
-        self.y4 += dy
-
-
-
-class Triangulo(Figura):
-    # """
-    # Clase Triangulo que hereda de Figura. Representa un triángulo en un plano 2D con
-    # puntos (x1, y1), (x2, y2) y (x3, y3). Permite cambiar el color, el grosor y
-    # el tipo de línea, así como realizar transformaciones de escala y traslación.
-
-    # :param color: Color del triángulo (por defecto 'black').
-    # :param grosor: Grosor de la línea del triángulo (por defecto 1).
-    # :param tipo_linea: Tipo de línea del triángulo (por defecto 'solid').
-    # """
-    def __init__(self, x1, y1, x2, y2, x3, y3, color='black', grosor=1, tipo_linea='solid'):
-        super().__init__(x1, y1, color, grosor, tipo_linea)
-        self.x1 = x1
-        self.y1 = y1
-        self.x2 = x2
-        self.y2 = y2
-        self.x3 = x3
-        self.y3 = y3
-        self.escala = 1
-    
-    def coordenadas_escaladas(self):
+        if dx == 0 and dy == 0:
+            return
+        anterior = self.motor.cajas.get(id(figura))
+        if self._levantar_si_seleccionada(figura):
+            vertices = figura.vertices_transformados()
+            figura.trasladar(dx, dy)
+            tamano = self.rejilla.tamano_celda
+            intacta = dx % tamano == 0 and dy % tamano == 0 and np.array_equal(figura.vertices_transformados(), vertices + (dx, dy))
+            self._actualizar_superpuesta(figura, anterior, (dx, dy) if intacta else None)
+            return
+        self.fusionar_capas()
+        tamano = self.rejilla.tamano_celda
+        if self.framebuffer is not None or not self.motor.visible(anterior) or dx % tamano != 0 or dy % tamano != 0:
+            figura.trasladar(dx, dy)
+            self.actualizar_figura(figura)
+            return
+        vertices = figura.vertices_transformados()
+        figura.trasladar(dx, dy)
+        if not np.array_equal(figura.vertices_transformados(), vertices + (dx, dy)):
+            self.actualizar_figura(figura)
+            return
+
+        nueva = (anterior[0] + dx, anterior[1] + dy, anterior[2] + dx, anterior[3] + dy)
+        self.motor.guardar_caja(figura, nueva)
+        self.move(self.etiqueta_de(figura), dx * self.zoom, dy * self.zoom)
+
+        self.tag_raise(self.etiqueta_de(figura))
+        self._subir_posteriores(figura)
+        self._repintar_celdas(unir_cajas(anterior, nueva))
+
+    def fijar_vista(self, origen_x, origen_y):
         # """
-        # Calcula las coordenadas escaladas del triángulo, manteniendo la proporción
-        # original y escalándolo desde el punto superior (el vértice con la coordenada y más pequeña).
+        # Muestra el trozo del mundo que empieza en (origen_x, origen_y) con el zoom actual. Sólo se
+        # rasterizan las figuras que el índice espacial ubica dentro de la nueva ventana, así que el
+        # costo no depende de cuántas figuras haya fuera de ella.
 
-        # :return: Seis coordenadas escaladas (x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado).
+        # :param origen_x: Coordenada x del mundo que queda en el borde izquierdo del canvas.
+        # :param origen_y: Coordenada y del mundo que queda en el borde superior del canvas.
         # """
-        x1, y1, x2, y2, x3, y3 = self.x1, self.y1, self.x2, self.y2, self.x3, self.y3
-
-        # Identifica el punto superior (el que tiene la coordenada y más pequeña)
-        puntos = np.array([[x1, y1], [x2, y2], [x3, y3]])
-        punto_superior = np.argmin(puntos, axis=0)[1]
-
-        # Calcula la matriz de escalado
-        escala_matriz = np.array([[self.escala, 0], [0, self.escala]])
+        self.fusionar_capas()
+        tamano = self.rejilla.tamano_celda
+        pixeles_celda = int(round(tamano * self.zoom))
+        ancho = -(-self._ancho_vista // pixeles_celda) * tamano
+        alto = -(-self._alto_vista // pixeles_celda) * tamano
+        if self.motor.fijar_ventana(origen_x, origen_y, ancho, alto):
+            self.rejilla = self.motor.rejilla
+            self.framebuffer = self.motor.framebuffer
+            if self.rasterizador is not None:
+                # Los procesos escriben en la memoria compartida de los arreglos anteriores
+                procesos = self.rasterizador.procesos
+                self.rasterizador.cerrar()
+                self.rasterizador = RasterizadorParalelo(self.motor, procesos)
+        if self.framebuffer is not None:
+            self.motor.dibujar_visibles()
+            self._programar_presentacion()
+            return
+        self.delete("all")
+        self.rejilla.limpiar()
+        for figura in self.motor.indice.en_caja(self.motor.ventana()):
+            self._emitir(figura, self.motor.raster(figura))
 
-        # Escala las coordenadas
-        puntos_escalados = puntos - puntos[punto_superior]
-        puntos_escalados = np.dot(puntos_escalados, escala_matriz)
-        puntos_escalados = puntos_escalados + puntos[punto_superior]
+    def mover_vista(self, dx, dy):
+        # Desplaza la vista (dx, dy) píxeles del mundo.
+        self.fijar_vista(self.motor.origen_x + dx, self.motor.origen_y + dy)
 
-        # Redondea las coordenadas escaladas
-        puntos_escalados = np.round(puntos_escalados / 10) * 10
+    def cambiar_zoom(self, zoom, x=0, y=0):
+        # """
+        # Cambia el zoom de la vista dejando fijo el punto del mundo que está bajo (x, y).
 
-        # Devuelve las 6 coordenadas escaladas
-        x1_escalado, y1_escalado = puntos_escalados[0]
-        x2_escalado, y2_escalado = puntos_escalados[1]
-        x3_escalado, y3_escalado = puntos_escalados[2]
-        return x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado
+        # :param zoom: Uno de niveles_zoom.
+        # :param x: Coordenada x en la pantalla del punto que no se mueve.
+        # :param y: Coordenada y en la pantalla del punto que no se mueve.
+        # """
+        if zoom not in self.niveles_zoom:
+            raise ValueError("zoom no soportado: {}".format(zoom))
+        mundo_x = self.motor.origen_x + x / self.zoom
+        mundo_y = self.motor.origen_y + y / self.zoom
+        self.zoom = zoom
+        self.fijar_vista(round(mundo_x - x / zoom), round(mundo_y - y / zoom))
+
+    def a_mundo(self, x, y):
+        # Convierte una posición de la pantalla a coordenadas del mundo ajustadas a la cuadrícula.
+        tamano = self.rejilla.tamano_celda
+        return (round((self.motor.origen_x + x / self.zoom) / tamano) * tamano,
+                round((self.motor.origen_y + y / self.zoom) / tamano) * tamano)
+
+    def _niveles_zoom_validos(self):
+        tamano = self.rejilla.tamano_celda
+        return tuple(zoom for zoom in FigurasCanvas.niveles_zoom if tamano * zoom >= 1 and abs(tamano * zoom - round(tamano * zoom)) < 1e-9)
+
+    def cambiar_tamano_celda(self, tamano):
+        # """
+        # Cambia el tamaño de celda de toda la cuadrícula (ver nucleo.fijar_tamano_celda) y vuelve a
+        # dibujar la escena. Con celdas más chicas que tamano_minimo_tk el canvas pasa a modo raster.
 
-    def puntos_rotados(self, x1, y1, x2, y2, x3, y3):
+        # :param tamano: Tamaño en píxeles de cada celda; 1 dibuja a resolución completa.
         # """
-        # Rota los puntos del triángulo alrededor de su centroide según el ángulo de rotación.
-
-        # :param x1: Coordenada x del primer vértice del triángulo.
-        # :param y1: Coordenada y del primer vértice del triángulo.
-        # :param x2: Coordenada x del segundo vértice del triángulo.
-        # :param y2: Coordenada y del segundo vértice del triángulo.
-        # :param x3: Coordenada x del tercer vértice del triángulo.
-        # :param y3: Coordenada y del tercer vértice del triángulo.
-        # :return: Coordenadas rotadas de los vértices del triángulo.
+        self.fusionar_capas()
+        fijar_tamano_celda(tamano, self.figuras)
+        con_framebuffer = self.framebuffer is not None or tamano < self.tamano_minimo_tk
+        if self.framebuffer is None:
+            self.delete("all")
+        procesos = self.rasterizador.procesos if self.rasterizador is not None else 1
+        self._cerrar_rasterizador()
+        self.motor.cambiar_tamano_celda(con_framebuffer)
+        self.rejilla = self.motor.rejilla
+        self.framebuffer = self.motor.framebuffer
+        if procesos > 1:
+            self.rasterizador = RasterizadorParalelo(self.motor, procesos)
+        self.niveles_zoom = self._niveles_zoom_validos()
+        if self.zoom not in self.niveles_zoom:
+            self.zoom = 1
+        # Ajusta el tamaño de la ventana del mundo al nuevo tamaño de celda antes de redibujar
+        self.fijar_vista(self.motor.origen_x, self.motor.origen_y)
+        self.redibujar()
+
+    def _subir_posteriores(self, figura):
+        # En modo Tk, sube encima de la figura las figuras posteriores que la tocan,
+        # directa o indirectamente, para que el apilamiento respete el orden de self.figuras.
+        for otra in self.motor.indice.apiladas_encima([figura]):
+            if otra is not figura:
+                self.tag_raise(self.etiqueta_de(otra))
+
+    def levantar_figura(self, figura):
         # """
-        puntos = [[x1, y1], [x2, y2], [x3, y3]]
-
-        # Calcular el centroide del triángulo
-        centro_x, centro_y = Triangulo.punto_medio_triangulo(x1, y1, x2, y2, x3, y3)
-
-        # Convertir el ángulo de rotación en radianes y calcular sus valores de seno y coseno
-        rad = math.radians(self.rotacion)
-        cos_rad = math.cos(rad)
-        sin_rad = math.sin(rad)
-
-        puntos_rotados = []
-        for punto in puntos:
-            x, y = punto
-            # Aplicar la matriz de rotación a las coordenadas
-            x_rotado = cos_rad * (x - centro_x) - sin_rad * (y - centro_y) + centro_x
-            y_rotado = sin_rad * (x - centro_x) + cos_rad * (y - centro_y) + centro_y
-            # Redondear las coordenadas a múltiplos de 10
-            x_rounded = round(x_rotado / 10) * 10
-            y_rounded = round(y_rotado / 10) * 10
-            puntos_rotados.append([x_rounded, y_rounded])
-
-        x1_rotado, y1_rotado = puntos_rotados[0]
-        x2_rotado, y2_rotado = puntos_rotados[1]
-        x3_rotado, y3_rotado = puntos_rotados[2]
-
-        return x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado
-
-
-    def punto_medio_triangulo(x1, y1, x2, y2, x3, y3):
-        x_medio = (x1 + x2 + x3) / 3
-        y_medio = (y1 + y2 + y3) / 3
-        return x_medio, y_medio   
-    def colisiona_con_punto(self, x, y):
-        x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado = self.coordenadas_escaladas()
-        x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado = self.puntos_rotados(x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado)
-
-        area_total = area(x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado)
-        area1 = area(x, y, x2_rotado, y2_rotado, x3_rotado, y3_rotado)
-        area2 = area(x1_rotado, y1_rotado, x, y, x3_rotado, y3_rotado)
-        area3 = area(x1_rotado, y1_rotado, x2_rotado, y2_rotado, x, y)
-        return abs(area_total - (area1 + area2 + area3)) < 0.1
-    def trasladar(self, dx, dy):
-        self.x1 += dx
-        self.y1 += dy
-        self.x2 += dx
-        self.y2 += dy
-        self.x3 += dx
-        self.y3 += dy
-    def imprimir_atributos(self):
-        super().imprimir_atributos()
-    def colorear(self, canvas):
-        x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado = self.coordenadas_escaladas()
-        semilla_x, semilla_y = Triangulo.punto_medio_triangulo(x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado)
-        flood_fill_puntos(canvas, round(semilla_x/10)*10, round(semilla_y/10)*10, self.color)#cambio
-class Circunferencia(Figura):
-    def __init__(self, x, y, radio, color='yellow', grosor=1, tipo_linea='solid'):
-        super().__init__(x, y, color, grosor, tipo_linea)
-        self.radio = radio
-    def colisiona_con_punto(self, x, y):
-        distancia_centro = math.sqrt((x - self.x) ** 2 + (y - self.y) ** 2)
-        return distancia_centro <= self.radio * self.escala
-    def imprimir_atributos(self):
-        super().imprimir_atributos()
-        print(f"Radio: {self.radio}")
-    def colorear(self, canvas):
-        flood_fill_puntos(canvas, self.x, self.y, self.color)
-class FigurasCanvas(tk.Canvas):
-    # def borrar_figura(self, figura):
-    #     if figura is not None:
-    #         items = self.find_all()
-    #         for item in items:
-    #             if self.gettags(item) == (str(id(figura)),):
-    #                 self.delete(item)
-    def borrar_figura(self, figura):
-        if figura is not None:
-            self.delete(figura.id)
-    def obtener_color_pixel(self, x, y):
-    # Encuentra los elementos en la coordenada (x, y)
-        elementos = self.find_overlapping(x, y, x+1, y+1)
+        # Separa la escena en dos capas mientras se edita una figura: todas las demás quedan
+        # congeladas como fondo (una copia de la rejilla y del framebuffer en el motor; en modo Tk,
+        # además, sus rectángulos no se vuelven a tocar) y la figura pasa a una capa superpuesta,
+        # dibujada encima de todo. Mientras dure, moverla, escalarla o rotarla sólo rasteriza esa
+        # figura. fusionar_capas la devuelve a su lugar en el orden de la escena.
 
-        # Si hay elementos en la coordenada
-        if elementos:
-            # Obtén el color del fondo del Canvas
-            color_fondo = self["bg"]
-            
-            # Itera sobre los elementos superpuestos
-            for elemento in elementos:
-                color = self.itemcget(elemento, "fill")
-                
-                # Si el color del elemento es diferente al fondo, devuélvelo
-                if color != color_fondo:
-                    return color
+        # :param figura: Figura ya dibujada de self.figuras.
+        # """
+        if self._figura_superpuesta is figura:
+            return
+        self.fusionar_capas()
+        self._figura_superpuesta = figura
+        self._caja_levantada = self.motor.cajas.get(id(figura))
+        self.motor.fijar_fondo(figura)
+        capas = self.motor.raster(figura)
+        if self.framebuffer is None:
+            self.tag_raise(self.etiqueta_de(figura))
+            for color, xs, ys in capas:
+                self.motor.pintar_celdas(xs, ys, color)
+        else:
+            self._emitir(figura, capas)
+
+    def fusionar_capas(self):
+        # Devuelve la figura superpuesta a su lugar en el orden de la escena y descarta el fondo congelado.
+        figura = self._figura_superpuesta
+        if figura is None:
+            return
+        self._figura_superpuesta = None
+        self.motor.soltar_fondo()
+        caja = self.motor.cajas.get(id(figura))
+        if self.framebuffer is None and caja is not None and figura in self.figuras:
+            self._subir_posteriores(figura)
+        region = unir_cajas(self._caja_levantada, caja)
+        if region is not None:
+            self._repintar_celdas(region)
+
+    def _levantar_si_seleccionada(self, figura):
+        # Los cambios de la figura seleccionada se hacen en la capa superpuesta; devuelve True si la
+        # figura quedó en ella.
+        if figura is not self.figura_seleccionada or id(figura) not in self.motor.cajas or figura not in self.figuras:
+            return False
+        self.levantar_figura(figura)
+        return True
+
+    def _actualizar_superpuesta(self, figura, anterior, desplazamiento=None):
+        # """
+        # Vuelve a dibujar sólo la figura superpuesta: repone el fondo congelado en su caja anterior
+        # y en la nueva y pinta la figura encima, sin rasterizar ninguna otra.
 
-        # Si no se encontró un elemento con color diferente al fondo, devuelve None
-        return None
-    def __init__(self, parent, *args, **kwargs):
-        super().__init__(parent, *args, **kwargs)
-        self.figuras = []
-        self.figura_seleccionada = None
-        self.bind("<Button-1>", self.on_click_izquierdo)
-        self.bind("<B1-Motion>", self.on_arrastre_izquierdo)
-        self.bind("<ButtonRelease-1>", self.on_suelta_izquierdo)
-        self.estado = "dibujar"
-        self.figura_actual = "cuadrado"
-          
-    def dibujar_figura(self, figura):
-        escala = figura.escala
-        if isinstance(figura, Cuadrado):
-            # x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado = figura.coordenadas_escaladas()
-            # x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado, x4_rotado, y4_rotado = figura.puntos_rotados(x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado)
-
-            # # Dibuja las líneas del cuadrado con las coordenadas rotadas
-            # puntos_linea1 = bresenham(x1_rotado, y1_rotado, x2_rotado, y2_rotado)
-            # puntos_linea2 = bresenham(x2_rotado, y2_rotado, x3_rotado, y3_rotado)
-            # puntos_linea3 = bresenham(x3_rotado, y3_rotado, x4_rotado, y4_rotado)
-            # puntos_linea4 = bresenham(x4_rotado, y4_rotado, x1_rotado, y1_rotado)
-            # for punto in puntos_linea1 + puntos_linea2 + puntos_linea3 + puntos_linea4:
-            #     x, y = punto
-            #     self.create_rectangle(x, y, x+10, y+10, width=1, outline="Black", fill="Ghostwhite")
-            # figura.colorear(self)
-            #...................
-            x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado = figura.coordenadas_escaladas()
-            x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado, x4_rotado, y4_rotado = figura.puntos_rotados(x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado, x4_escalado, y4_escalado)
-
-            # Dibuja las líneas del cuadrado con las coordenadas rotadas
-            puntos_linea1 = bresenham(x1_rotado, y1_rotado, x2_rotado, y2_rotado, line_style=figura.tipo_linea)
-            puntos_linea2 = bresenham(x2_rotado, y2_rotado, x3_rotado, y3_rotado, line_style=figura.tipo_linea)
-            puntos_linea3 = bresenham(x3_rotado, y3_rotado, x4_rotado, y4_rotado, line_style=figura.tipo_linea)
-            puntos_linea4 = bresenham(x4_rotado, y4_rotado, x1_rotado, y1_rotado, line_style=figura.tipo_linea)
-            for punto in puntos_linea1 + puntos_linea2 + puntos_linea3 + puntos_linea4:
-                x, y, color = punto
-                self.create_rectangle(x, y, x+10, y+10, width=1, outline=color, fill=color)
-            figura.colorear(self)
-        elif isinstance(figura, Circunferencia):
-            radio  = (round(figura.radio * escala/10)*10)
-            puntos_circunferencia = punto_medio(figura.x, figura.y, radio)
-            for punto in puntos_circunferencia:
-                x, y = punto
-                self.create_rectangle(x, y, x+10, y+10, width=1,outline="Black",fill="black")
-            figura.colorear(self)
-        elif isinstance(figura, Triangulo):
-            x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado = figura.coordenadas_escaladas()
-            x1_rotado, y1_rotado, x2_rotado, y2_rotado, x3_rotado, y3_rotado = figura.puntos_rotados(x1_escalado, y1_escalado, x2_escalado, y2_escalado, x3_escalado, y3_escalado)
-
-            # Dibuja las líneas del triángulo con las coordenadas rotadas
-            puntos_linea1 = bresenham(x1_rotado, y1_rotado, x2_rotado, y2_rotado, line_style=figura.tipo_linea)
-            puntos_linea2 = bresenham(x2_rotado, y2_rotado, x3_rotado, y3_rotado, line_style=figura.tipo_linea)
-            puntos_linea3 = bresenham(x3_rotado, y3_rotado, x1_rotado, y1_rotado, line_style=figura.tipo_linea)
-            for punto in puntos_linea1 + puntos_linea2 + puntos_linea3:
-                x, y, color = punto
-                self.create_rectangle(x, y, x+10, y+10, width=1, outline=color, fill=color)
-            figura.colorear(self)
-            
+        # :param anterior: Caja que ocupaba la figura antes del cambio.
+        # :param desplazamiento: (dx, dy) si la figura sólo se trasladó y su raster no cambió; en
+        #                        modo Tk basta entonces con mover sus rectángulos, si los tiene.
+        # """
+        nueva = figura.caja_delimitadora()
+        self.motor.guardar_caja(figura, nueva)
+        region = unir_cajas(anterior, nueva)
+        if region is not None:
+            self.motor.restaurar_fondo(region)
+        if self.framebuffer is None and desplazamiento is not None and self.motor.visible(anterior):
+            dx, dy = desplazamiento
+            self.move(self.etiqueta_de(figura), dx * self.zoom, dy * self.zoom)
+            for color, xs, ys in self.motor.raster(figura):
+                self.motor.pintar_celdas(xs, ys, color)
+            return
+        if self.framebuffer is None:
+            self.delete(self.etiqueta_de(figura))
+        if self.motor.visible(nueva):
+            self._emitir(figura, self.motor.raster(figura))
             
         # self.dibujar_segundo_borde(figura, "Black", 0)
 
@@ -643,11 +612,7 @@ class FigurasCanvas(tk.Canvas):
         #         x, y = punto
         #         self.create_rectangle(x, y, x+10, y+10, width=grosor, outline=color, fill=color)
     def get_pixel_color(self, x, y):
-        items = self.find_overlapping(x, y, x, y)
-        if items:
-            return self.itemcget(items[0], "fill")
-        else:
-            return None
+        return self.rejilla.color_en(x, y)
 
     def set_pixel_color(self, x, y, color):
         self.itemconfig(self.find_closest(x, y), fill=color)
@@ -675,9 +640,18 @@ class FigurasCanvas(tk.Canvas):
         figura = Triangulo(x - 50, y + 80, x, y-10, x + 50, y + 80, "Green", 2, "solid")
         self.figuras.append(figura)
         self.dibujar_figura(figura)
+
+    def agregar_poligono(self, x, y, lados=6, radio=50):
+        # Polígono regular centrado en (x, y), con los vértices ajustados a la cuadrícula.
+        tamano = self.rejilla.tamano_celda
+        angulos = np.arange(lados) * 2 * np.pi / lados
+        vertices = np.column_stack((x + radio * np.cos(angulos), y + radio * np.sin(angulos)))
+        figura = Poligono(np.round(vertices / tamano) * tamano, "Purple", 2, "solid")
+        self.figuras.append(figura)
+        self.dibujar_figura(figura)
         
     def on_click_izquierdo(self, event):
-        x, y = (round(event.x/10)*10), (round(event.y/10)*10)
+        x, y = self.a_mundo(event.x, event.y)
         # x, y = event.x, event.y
          
         
@@ -688,6 +662,8 @@ class FigurasCanvas(tk.Canvas):
                 self.agregar_circulo(x, y)
             elif self.figura_actual == "triangulo":
                 self.agregar_triangulo(x, y)
+            elif self.figura_actual == "poligono":
+                self.agregar_poligono(x, y)
         elif self.estado == "mover":
             self.seleccionar_figura(x, y)
         print("Color del píxel en ({}, {}): {}".format(x, y, self.obtener_color_pixel(x, y)))
@@ -701,52 +677,113 @@ class FigurasCanvas(tk.Canvas):
                 self.prev_y = event.y
             # dx = event.x - self.prev_x
             # dy = event.y - self.prev_y
-            dx = round((event.x - self.prev_x) / 10) * 10
-            dy = round((event.y - self.prev_y) / 10) * 10   
+            tamano = self.rejilla.tamano_celda
+            dx = round((event.x - self.prev_x) / self.zoom / tamano) * tamano
+            dy = round((event.y - self.prev_y) / self.zoom / tamano) * tamano
             self.prev_x = event.x
             self.prev_y = event.y
-            if isinstance(self.figura_seleccionada, Triangulo):
-                self.figura_seleccionada.x1 += dx
-                self.figura_seleccionada.y1 += dy
-                self.figura_seleccionada.x2 += dx
-                self.figura_seleccionada.y2 += dy
-                self.figura_seleccionada.x3 += dx
-                self.figura_seleccionada.y3 += dy
-            else:
-                self.figura_seleccionada.trasladar(dx, dy)
-            # self.borrar_figura(self.figura_seleccionada)
-            # self.dibujar_figura(self.figura_seleccionada)
-            
-            self.delete("all")
-            for figura in self.figuras:
-                self.dibujar_figura(figura)
+            # Tk puede entregar cientos de eventos de movimiento por segundo; se acumulan y se
+            # aplican en una sola traslación cuando la cola de eventos queda vacía
+            self._arrastre_dx += dx
+            self._arrastre_dy += dy
+            if not self._arrastre_pendiente:
+                self._arrastre_pendiente = True
+                self.after_idle(self._aplicar_arrastre)
+    def _aplicar_arrastre(self):
+        # Aplica de una vez el desplazamiento acumulado por los eventos de arrastre.
+        self._arrastre_pendiente = False
+        dx, dy = self._arrastre_dx, self._arrastre_dy
+        self._arrastre_dx = self._arrastre_dy = 0
+        if self.figura_seleccionada is not None and (dx != 0 or dy != 0):
+            self.trasladar_figura(self.figura_seleccionada, dx, dy)
     def on_suelta_izquierdo(self, event):
+        self._aplicar_arrastre()
+        self.fusionar_capas()
         if hasattr(self, 'prev_x'):
             del self.prev_x
             del self.prev_y
+    def on_click_derecho(self, event):
+        self._vista_x = event.x
+        self._vista_y = event.y
+    def on_arrastre_derecho(self, event):
+        # Arrastrar con el botón derecho desplaza la vista por celdas enteras; igual que el arrastre
+        # de figuras, los eventos se acumulan y se aplican cuando la cola de eventos queda vacía.
+        tamano = self.rejilla.tamano_celda
+        dx = round((self._vista_x - event.x) / self.zoom / tamano) * tamano
+        dy = round((self._vista_y - event.y) / self.zoom / tamano) * tamano
+        self._vista_x -= dx * self.zoom
+        self._vista_y -= dy * self.zoom
+        self._vista_dx += dx
+        self._vista_dy += dy
+        if not self._vista_pendiente:
+            self._vista_pendiente = True
+            self.after_idle(self._aplicar_desplazamiento_vista)
+    def _aplicar_desplazamiento_vista(self):
+        self._vista_pendiente = False
+        dx, dy = self._vista_dx, self._vista_dy
+        self._vista_dx = self._vista_dy = 0
+        if dx != 0 or dy != 0:
+            self.mover_vista(dx, dy)
+    def on_rueda(self, event):
+        # Rueda hacia arriba (o botón 4 en X11) acerca la vista y hacia abajo la aleja.
+        posicion = self.niveles_zoom.index(self.zoom)
+        if event.num == 4 or event.delta > 0:
+            posicion = min(posicion + 1, len(self.niveles_zoom) - 1)
+        else:
+            posicion = max(posicion - 1, 0)
+        if self.niveles_zoom[posicion] != self.zoom:
+            self.cambiar_zoom(self.niveles_zoom[posicion], event.x, event.y)
     
     def seleccionar_figura(self, x, y):
+        # Sólo se prueban las figuras que el índice espacial ubica cerca del punto.
+        self.fusionar_capas()
         self.figura_seleccionada = None
-        for figura in self.figuras:
+        for figura in self.indice.candidatos(x, y):
             if figura.colisiona_con_punto(x, y):
                 figura.borde_seleccionado = not figura.borde_seleccionado
                 self.figura_seleccionada = figura
                 break
     def borrar_figura_seleccionada(self):
         if self.figura_seleccionada is not None:
-            self.figuras.remove(self.figura_seleccionada)
+            figura = self.figura_seleccionada
+            self.fusionar_capas()
+            self.figuras.remove(figura)
             self.figura_seleccionada = None
-            self.delete("all")
-            for figura in self.figuras:
-                self.dibujar_figura(figura)
+            self.actualizar_figura(figura)
+    def guardar_escena(self, archivo):
+        # Guarda todas las figuras del canvas en un archivo .npz (ver nucleo.guardar_escena).
+        guardar_escena(archivo, self.figuras)
+    def cargar_progresivo(self, fuente, presupuesto=0.015, al_avanzar=None, al_terminar=None):
+        # """
+        # Agrega figuras al canvas por partes sin bloquear el ciclo de eventos (ver CargaProgresiva).
+
+        # :param fuente: Ruta de un archivo de una figura por línea (guardar_figuras_jsonl) o un
+        #                iterable de figuras.
+        # :return: La CargaProgresiva en curso, para consultar su avance o cancelarla.
+        # """
+        self.cancelar_carga()
+        if isinstance(fuente, str):
+            fuente = leer_figuras_jsonl(fuente)
+        carga = CargaProgresiva(self, fuente, presupuesto, al_avanzar, al_terminar)
+        self._carga = carga
+        carga.iniciar()
+        return carga
+    def cancelar_carga(self):
+        # Cancela la carga progresiva en curso, si hay una; sus figuras ya cargadas se quedan.
+        if self._carga is not None:
+            self._carga.cancelar()
+    def cargar_escena(self, archivo):
+        # Reemplaza las figuras del canvas por las del archivo y redibuja una sola vez.
+        self.cancelar_carga()
+        self.figuras = cargar_escena(archivo)
+        self.figura_seleccionada = None
+        self.redibujar()
     def cambiar_color_figura_seleccionada(self, event):
         if self.canvas.figura_seleccionada is not None:
             color_seleccionado = self.color_var.get()
             colores = {'Negro': 'black', 'Rojo': 'red', 'Verde': 'green', 'Azul': 'blue', 'Amarillo': 'yellow', 'Naranja': 'orange', 'Morado': 'purple'}
             self.canvas.figura_seleccionada.cambiar_color(colores[color_seleccionado])
-            self.canvas.delete("all")
-            for figura in self.canvas.figuras:
-                self.canvas.dibujar_figura(figura)
+            self.canvas.redibujar()
                 
     def cambiar_color_seleccionado(self, color):
         if self.figura_seleccionada is not None:
@@ -756,39 +793,20 @@ class FigurasCanvas(tk.Canvas):
             # self.borrar_figura(self.figura_seleccionada)
             # self.dibujar_figura(self.figura_seleccionada)
             
-            self.delete("all")
-            for figura in self.figuras:
-                self.dibujar_figura(figura)
+            self.actualizar_figura(self.figura_seleccionada)
     def mover_figura(self, dx, dy):
-        figura = self.figura_seleccionada
-        if isinstance(figura, Triangulo):
-            figura.x1 += dx
-            figura.y1 += dy
-            figura.x2 += dx
-            figura.y2 += dy
-            figura.x3 += dx
-            figura.y3 += dy
-        else:
-            figura.trasladar(dx, dy)
-
-        self.delete("all")
-        for fig in self.figuras:
-            self.dibujar_figura(fig) 
+        self.trasladar_figura(self.figura_seleccionada, dx, dy)
     def escalar_figura(self, factor):
         if self.figura_seleccionada is not None:
             self.figura_seleccionada.escalar(factor)
-            self.delete("all")
-            for figura in self.figuras:
-                self.dibujar_figura(figura)   
+            self.actualizar_figura(self.figura_seleccionada)
     def rotar_figura(self, rotacion):
         if self.figura_seleccionada is not None:
             self.figura_seleccionada.rotar(rotacion)
-            self.delete("all")
-            for figura in self.figuras:
-                self.dibujar_figura(figura)         
+            self.actualizar_figura(self.figura_seleccionada)
                        
 class Aplicacion(tk.Tk):
-    def __init__(self):
+    def __init__(self, modo_raster=False):
         # bg1 = "#67747f"
         bg1 = "#171c3b"
         col2 = "#787c9f"
@@ -797,8 +815,8 @@ class Aplicacion(tk.Tk):
         super().__init__()
         self.title("Dibujo de figuras geométricas")
         self.configure(bg="#d9dee2")
-        self.canvas = FigurasCanvas(self, width=800, height=600)
-        self.canvas.configure(bg="#dde0ef", highlightthickness=0)
+        self.canvas = FigurasCanvas(self, width=800, height=600, bg="#dde0ef", highlightthickness=0,
+                                    modo_raster=modo_raster)
         self.canvas.pack()
 
         self.frame_controles = tk.Frame(self)
@@ -811,7 +829,7 @@ class Aplicacion(tk.Tk):
 
         self.figura_var = tk.StringVar()
         self.seleccion_figura = ttk.Combobox(self.frame_figura, textvariable=self.figura_var, state='readonly',width=20)
-        self.seleccion_figura['values'] = ('Cuadrado', 'Círculo', 'Triángulo')
+        self.seleccion_figura['values'] = ('Cuadrado', 'Círculo', 'Triángulo', 'Polígono')
         self.seleccion_figura.current(0)
         self.seleccion_figura.grid(row=1, column=0, columnspan=2, padx=0, pady=5, sticky="W")
         self.seleccion_figura.bind("<<ComboboxSelected>>", self.actualizar_figura_actual)
@@ -921,12 +939,30 @@ class Aplicacion(tk.Tk):
         self.boton_segmentado.grid(row=1, column=0, padx=0, pady=2)
         self.boton_segmentado.configure(bg=col2)
         self.boton_segmentado.configure(fg="White")
+
+        # Tamaño de celda de la cuadrícula; 1 dibuja a resolución completa (en modo raster)
+        self.celda_var = tk.StringVar()
+        self.seleccion_celda = ttk.Combobox(self.frame_linea, textvariable=self.celda_var, state='readonly', width=10)
+        self.seleccion_celda['values'] = ('Celda 10', 'Celda 5', 'Celda 2', 'Celda 1')
+        self.seleccion_celda.current(0)
+        self.seleccion_celda.grid(row=2, column=0, padx=0, pady=2)
+        self.seleccion_celda.bind("<<ComboboxSelected>>", self.cambiar_tamano_celda)
         
         
         self.boton_borrar = tk.Button(self.frame_controles, text="Borrar",font=("Arial", 8, "bold"), command=self.borrar, width=6, height=2)
         self.boton_borrar.pack(side=tk.LEFT, padx=5)
         self.boton_borrar.configure(bg=col2)
         self.boton_borrar.configure(fg="White")
+
+        self.boton_guardar = tk.Button(self.frame_controles, text="Guardar",font=("Arial", 8, "bold"), command=self.guardar, width=7, height=2)
+        self.boton_guardar.pack(side=tk.LEFT, padx=5)
+        self.boton_guardar.configure(bg=col2)
+        self.boton_guardar.configure(fg="White")
+
+        self.boton_abrir = tk.Button(self.frame_controles, text="Abrir",font=("Arial", 8, "bold"), command=self.abrir, width=6, height=2)
+        self.boton_abrir.pack(side=tk.LEFT, padx=5)
+        self.boton_abrir.configure(bg=col2)
+        self.boton_abrir.configure(fg="White")
         #########
         
 
@@ -963,9 +999,7 @@ class Aplicacion(tk.Tk):
             try:
                 factor = float(self.escala_var.get())
                 self.canvas.figura_seleccionada.escalar(factor)
-                self.canvas.delete("all")
-                for figura in self.canvas.figuras:
-                    self.canvas.dibujar_figura(figura)
+                self.canvas.actualizar_figura(self.canvas.figura_seleccionada)
             except ValueError:
                 messagebox.showerror("Error", "Ingrese un valor numérico válido.")
     
@@ -974,17 +1008,16 @@ class Aplicacion(tk.Tk):
         fig = self.canvas.figura_seleccionada
         if fig is not None:
             fig.tipo_linea = 'solid'
-            self.canvas.delete("all")
-            for figura in self.canvas.figuras:
-                self.canvas.dibujar_figura(figura)
+            self.canvas.actualizar_figura(fig)
 
     def cambiar_a_segmentado(self):
         fig = self.canvas.figura_seleccionada
         if fig is not None:
             fig.tipo_linea = 'dashed'
-            self.canvas.delete("all")
-            for figura in self.canvas.figuras:
-                self.canvas.dibujar_figura(figura)
+            self.canvas.actualizar_figura(fig)
+
+    def cambiar_tamano_celda(self, event=None):
+        self.canvas.cambiar_tamano_celda(int(self.celda_var.get().split()[-1]))
         
     
     
@@ -1021,6 +1054,37 @@ class Aplicacion(tk.Tk):
             self.boton_mover.config(bg="#3d3f51", relief=tk.SUNKEN)  # Botón presionado
     def borrar(self):
         self.canvas.borrar_figura_seleccionada()
+
+    def guardar(self):
+        archivo = filedialog.asksaveasfilename(defaultextension=".npz", filetypes=[("Escena", "*.npz")])
+        if archivo:
+            self.canvas.guardar_escena(archivo)
+
+    def abrir(self):
+        # Las escenas .npz se cargan de una vez; las de una figura por línea (.jsonl) se cargan por
+        # partes mostrando el avance en el título, y Escape cancela la carga.
+        archivo = filedialog.askopenfilename(filetypes=[("Escena", "*.npz"), ("Figuras por línea", "*.jsonl")])
+        if not archivo:
+            return
+        # Una carga anterior que siga en curso se cancela antes de leer el título que restaura
+        self.canvas.cancelar_carga()
+        if not archivo.endswith(".jsonl"):
+            self.canvas.cargar_escena(archivo)
+            return
+        self.canvas.figuras = []
+        self.canvas.figura_seleccionada = None
+        self.canvas.redibujar()
+        titulo = self.title()
+
+        def al_avanzar(carga):
+            self.title("{} - cargando {} figuras...".format(titulo, carga.cargadas))
+
+        def al_terminar(carga):
+            self.unbind("<Escape>")
+            self.title(titulo)
+
+        carga = self.canvas.cargar_progresivo(archivo, al_avanzar=al_avanzar, al_terminar=al_terminar)
+        self.bind("<Escape>", lambda event: carga.cancelar())
     
     # Agregar la función actualizar_figura_actual para manejar la selección de figura
     def actualizar_figura_actual(self, event):
@@ -1031,12 +1095,92 @@ class Aplicacion(tk.Tk):
             self.canvas.figura_actual = "circulo"
         elif figura_seleccionada == "Triángulo":
             self.canvas.figura_actual = "triangulo"
+        elif figura_seleccionada == "Polígono":
+            self.canvas.figura_actual = "poligono"
     def cambiar_color_figura_seleccionada(self, event):
         color_seleccionado = self.color_var.get()#.lower()
         print(color_seleccionado)
         self.canvas.cambiar_color_seleccionado(color_seleccionado)
                        
+def archivos_de_escena(rutas):
+    # Expande directorios (todos sus .npz y .jsonl) y patrones glob a una lista ordenada de archivos.
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            archivos += glob.glob(os.path.join(ruta, "*.npz")) + glob.glob(os.path.join(ruta, "*.jsonl"))
+        else:
+            archivos += glob.glob(ruta)
+    return sorted(set(archivos))
+
+def entero_positivo(texto):
+    # Tipo de argparse para tamaños y cantidades: un entero mayor que cero.
+    try:
+        valor = int(texto)
+    except ValueError:
+        raise argparse.ArgumentTypeError("{!r} no es un entero".format(texto))
+    if valor <= 0:
+        raise argparse.ArgumentTypeError("debe ser mayor que cero: {}".format(valor))
+    return valor
+
+def renderizar_lote(argumentos=None):
+    # """
+    # Línea de comandos para dibujar escenas sin abrir la ventana:
+    #
+    #     python v9.py escenas/ --salida imagenes/ --formato png
+    #     python v9.py "escenas/*.npz" --procesos 4
+    #
+    # Cada archivo se dibuja con MotorRaster (los mismos algoritmos de la aplicación) en un proceso
+    # del pool y se escribe una imagen con el mismo nombre. Si dos entradas darían la misma imagen
+    # (a.npz y a.jsonl, o x/a.npz e y/a.npz) no se dibuja nada y se informa el conflicto. Informa el
+    # tiempo de cada archivo y el total de escenas y figuras por segundo.
+
+    # :param argumentos: Lista de argumentos; por defecto, los de sys.argv.
+    # :return: Código de salida del proceso.
+    # """
+    parser = argparse.ArgumentParser(description="Dibuja escenas .npz o .jsonl como imágenes, sin Tk.")
+    parser.add_argument("entradas", nargs="+", help="Directorios o patrones glob con archivos de escena.")
+    parser.add_argument("--salida", default=".", help="Directorio donde escribir las imágenes.")
+    parser.add_argument("--formato", choices=("png", "ppm"), default="png")
+    parser.add_argument("--ancho", type=entero_positivo, default=800)
+    parser.add_argument("--alto", type=entero_positivo, default=600)
+    parser.add_argument("--celda", type=entero_positivo, default=TAMANO_CELDA, help="Tamaño de celda en píxeles; 1 es resolución completa.")
+    parser.add_argument("--procesos", type=entero_positivo, default=None, help="Por defecto, los núcleos disponibles.")
+    opciones = parser.parse_args(argumentos)
+
+    archivos = archivos_de_escena(opciones.entradas)
+    if not archivos:
+        print("No se encontraron archivos de escena", file=sys.stderr)
+        return 1
+    salidas = [os.path.join(opciones.salida, os.path.splitext(os.path.basename(archivo))[0] + "." + opciones.formato)
+               for archivo in archivos]
+    # Dos procesos escribiendo la misma imagen dejarían sólo una de las escenas, sin avisar
+    entradas_por_salida = {}
+    for archivo, salida in zip(archivos, salidas):
+        entradas_por_salida.setdefault(os.path.normcase(os.path.abspath(salida)), []).append(archivo)
+    repetidas = [entradas for entradas in entradas_por_salida.values() if len(entradas) > 1]
+    if repetidas:
+        for entradas in repetidas:
+            print("Estas escenas se escribirían en la misma imagen: {}".format(", ".join(entradas)), file=sys.stderr)
+        return 1
+    os.makedirs(opciones.salida, exist_ok=True)
+    tareas = [(archivo, salida, opciones.ancho, opciones.alto, opciones.celda) for archivo, salida in zip(archivos, salidas)]
+
+    inicio = time.perf_counter()
+    total_figuras = 0
+    procesos = min(opciones.procesos or multiprocessing.cpu_count(), len(tareas))
+    with multiprocessing.Pool(procesos) as pool:
+        for entrada, salida, figuras, segundos in pool.imap_unordered(renderizar_archivo, tareas):
+            total_figuras += figuras
+            print("{:<40} {:>8} figuras {:>10.3f} s -> {}".format(entrada, figuras, segundos, salida))
+    transcurrido = time.perf_counter() - inicio
+    print("{} escenas, {} figuras en {:.3f} s con {} procesos ({:.1f} escenas/s, {:.0f} figuras/s)".format(
+        len(tareas), total_figuras, transcurrido, procesos, len(tareas) / transcurrido, total_figuras / transcurrido))
+    return 0
+
 if __name__ == "__main__":
+    # Con argumentos se dibujan escenas por lotes; sin ellos se abre la aplicación
+    if len(sys.argv) > 1:
+        sys.exit(renderizar_lote())
     app = Aplicacion()
     app.mainloop()
     